@@ -0,0 +1,20 @@
+# agent/simulator/__init__.py
+"""
+Ferme d'équipements simulés pour le banc de charge des drivers de l'agent.
+
+- PJLink (TCP 4352): handshake "PJLINK 0" / "PJLINK 1 <salt>", %1POWR ?, etc.
+- SNMP v2c (UDP): sysDescr / sysUpTime (+ OIDs additionnels)
+- Zigbee: injection d'états dans MQTTClientManager sans broker
+
+Chaque équipement a un profil (latence, perte, authentification).
+Les équipements IP écoutent sur des adresses loopback distinctes (127.77.x.y),
+ce qui garde des IP uniques côté config (l'agent indexe ses résultats par IP).
+
+Usage:
+    cd agent
+    python -m simulator.bench --sizes 10,100,1000
+    python -m simulator.mqtt_replay --devices 2000 --rate 5000   # chemin MQTT seul
+"""
+from simulator.farm import DeviceProfile, SimulatorFarm
+
+__all__ = ["DeviceProfile", "SimulatorFarm"]
@@ -0,0 +1,183 @@
+# agent/simulator/bench.py
+"""
+Banc de charge: temps de cycle et probes/s de collector._collect_once
+face à une ferme simulée de N équipements.
+
+Usage (depuis agent/):
+    python -m simulator.bench
+    python -m simulator.bench --sizes 10,100,1000 --mix pjlink,snmp,zigbee
+    python -m simulator.bench --sizes 100 --latency-ms 20 --loss 0.02 --cycles 3
+    python -m simulator.bench --sizes 1000 --auth-ratio 0.5 --json
+    python -m simulator.bench --sizes 100 --mix snmp,pjlink --ping-overlay --max-icmp 0
+
+Les équipements en perte coûtent un timeout complet (--timeout-s): c'est
+précisément ce que ce banc permet de mesurer.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+from src import metrics as agent_metrics
+from src.collector import _collect_once
+
+from simulator.farm import DRIVERS, SimulatorFarm
+
+
+def _raise_nofile_limit(needed: int) -> None:
+    """Chaque équipement IP ouvre un socket serveur: relever la limite si possible."""
+    try:
+        import resource
+
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        target = hard if hard != resource.RLIM_INFINITY else max(soft, needed)
+        if soft < needed and soft < target:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (min(target, max(needed, soft)), hard))
+    except Exception:
+        pass
+
+
+def _probe_histograms() -> Dict[str, Dict[str, float]]:
+    snap = agent_metrics.snapshot().get("agent_probe_duration_seconds", {})
+    out: Dict[str, Dict[str, float]] = {}
+    for labels, v in snap.items():
+        driver = labels.split('driver="', 1)[-1].split('"', 1)[0] if "driver=" in labels else labels
+        out[driver] = {"count": float(v["count"]), "sum": float(v["sum"])}
+    return out
+
+
+def _per_driver_mean_ms(before: Dict[str, Dict[str, float]], after: Dict[str, Dict[str, float]]) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for driver, a in after.items():
+        b = before.get(driver, {"count": 0.0, "sum": 0.0})
+        n = a["count"] - b["count"]
+        if n > 0:
+            out[driver] = round((a["sum"] - b["sum"]) / n * 1000.0, 2)
+    return out
+
+
+def run_size(size: int, args: argparse.Namespace) -> Dict[str, Any]:
+    farm = SimulatorFarm(
+        size,
+        mix=args.mix,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        loss=args.loss,
+        auth_ratio=args.auth_ratio,
+        bad_auth_ratio=args.bad_auth_ratio,
+        timeout_s=args.timeout_s,
+        seed=args.seed,
+    )
+    cfg: Dict[str, Any] = {
+        "site_name": "simulator",
+        "timezone": "Europe/Paris",
+        "doubt_after_days": 2,
+        "devices": farm.devices_config(),
+    }
+    if args.ping_overlay:
+        # Entrée ping en plus sur chaque IP SNMP/PJLink (affichage surveillé deux fois)
+        cfg["devices"] += [
+            {"ip": d["ip"], "name": f"{d.get('name') or d['ip']} (ping)", "driver": "ping"}
+            for d in cfg["devices"]
+            if d.get("driver") in ("snmp", "pjlink")
+        ]
+
+    cycle_times: List[float] = []
+    statuses: Dict[str, int] = {}
+    before = _probe_histograms()
+
+    with farm:
+        for _ in range(max(1, args.cycles)):
+            t0 = time.perf_counter()
+            result = _collect_once(cfg)
+            cycle_times.append(time.perf_counter() - t0)
+            statuses = {}
+            for d in result["devices"]:
+                statuses[d["status"]] = statuses.get(d["status"], 0) + 1
+        stats = farm.stats()
+
+    median = statistics.median(cycle_times)
+    after = _probe_histograms()
+    return {
+        "devices": size,
+        "cycles": len(cycle_times),
+        "cycle_s_median": round(median, 3),
+        "cycle_s_min": round(min(cycle_times), 3),
+        "cycle_s_max": round(max(cycle_times), 3),
+        "probes_per_s": round(size / median, 1) if median > 0 else None,
+        "statuses": statuses,
+        "probe_ms_mean": _per_driver_mean_ms(before, after),
+        # Probes ping réellement envoyés (hors réponses reprises d'un autre driver)
+        "icmp_probes": int(after.get("ping", {}).get("count", 0.0) - before.get("ping", {}).get("count", 0.0)),
+        "farm": stats,
+    }
+
+
+def _print_table(rows: List[Dict[str, Any]]) -> None:
+    header = f"{'devices':>8} {'cycle_s':>9} {'min':>8} {'max':>8} {'probes/s':>9}  statuses / mean probe ms"
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        st = " ".join(f"{k}={v}" for k, v in sorted(r["statuses"].items()))
+        pm = " ".join(f"{k}={v}" for k, v in sorted(r["probe_ms_mean"].items()))
+        print(
+            f"{r['devices']:>8} {r['cycle_s_median']:>9.3f} {r['cycle_s_min']:>8.3f} "
+            f"{r['cycle_s_max']:>8.3f} {r['probes_per_s'] or 0:>9.1f}  {st} | {pm}"
+        )
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark _collect_once contre une ferme simulée")
+    parser.add_argument("--sizes", default="10,100,1000", help="tailles de ferme (ex: 10,100,1000)")
+    parser.add_argument("--mix", default=",".join(DRIVERS), help="drivers répartis en round-robin")
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--jitter-ms", type=float, default=1.0)
+    parser.add_argument("--loss", type=float, default=0.0, help="probabilité de non-réponse (0..1)")
+    parser.add_argument("--auth-ratio", type=float, default=0.0, help="part des équipements avec auth")
+    parser.add_argument("--bad-auth-ratio", type=float, default=0.0, help="part des auth mal configurées côté agent")
+    parser.add_argument("--timeout-s", type=int, default=1)
+    parser.add_argument("--cycles", type=int, default=1, help="cycles par taille (médiane rapportée)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ping-overlay", action="store_true", help="ajoute une entrée ping sur chaque IP SNMP/PJLink")
+    parser.add_argument("--max-icmp", type=int, help="échec si plus de probes ICMP que ce seuil (par taille)")
+    parser.add_argument("--json", action="store_true", help="sortie JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    except ValueError:
+        parser.error(f"invalid --sizes: {args.sizes}")
+    args.mix = [m.strip().lower() for m in args.mix.split(",") if m.strip()]
+
+    # Logs de l'agent: uniquement les warnings pendant le bench (sauf LOG_LEVEL explicite)
+    if not os.getenv("LOG_LEVEL"):
+        logging.getLogger("avmonitoring-agent").setLevel(logging.WARNING)
+    # Etat runtime en mémoire: le banc ne touche pas à celui de l'agent installé
+    os.environ.setdefault("AGENT_STATE_DB", ":memory:")
+
+    _raise_nofile_limit(max(sizes, default=0) * 2 + 256)
+
+    rows = [run_size(n, args) for n in sizes]
+
+    if args.json:
+        json.dump(rows, sys.stdout, indent=2)
+        print()
+    else:
+        _print_table(rows)
+
+    if args.max_icmp is not None:
+        failures = [f"{r['devices']} devices: icmp {r['icmp_probes']} > {args.max_icmp}" for r in rows if r["icmp_probes"] > args.max_icmp]
+        for f in failures:
+            print(f"FAIL {f}", file=sys.stderr)
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
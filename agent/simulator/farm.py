@@ -0,0 +1,222 @@
+# agent/simulator/farm.py
+"""
+Ferme de N équipements simulés + génération de la config agent correspondante.
+
+Tous les serveurs tournent dans une seule boucle asyncio (thread dédié), ce qui
+permet de simuler un millier d'équipements sans un thread par équipement.
+
+Adressage: 127.77.<i // 250>.<i % 250 + 1> (tout 127.0.0.0/8 est routé sur lo
+sous Linux). PJLink écoute sur le port standard 4352, SNMP sur 1161 (non
+privilégié); les ports sont reportés dans la config générée.
+"""
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from simulator.pjlink_server import PJLinkDevice
+from simulator.snmp_agent import SNMPDevice
+from simulator.zigbee_injector import ZigbeeInjector
+
+DRIVERS = ("pjlink", "snmp", "zigbee")
+
+
+@dataclass
+class DeviceProfile:
+    """
+    Profil de comportement d'un équipement simulé.
+
+    - latency_ms / jitter_ms: délai avant chaque réponse (uniforme ± jitter)
+    - loss: probabilité de ne jamais répondre (0.0 à 1.0)
+    - password (PJLink) / community (SNMP): authentification côté équipement
+    - power: état POWR PJLink (0 off, 1 on, 2 cooling, 3 warm-up)
+    """
+    name: str = ""
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    loss: float = 0.0
+    password: str = ""
+    community: str = "public"
+    power: int = 1
+    extra_oids: Dict[str, Any] = field(default_factory=dict)
+
+    def delay_s(self) -> float:
+        d = self.latency_ms
+        if self.jitter_ms:
+            d += random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, d) / 1000.0
+
+
+def sim_ip(index: int, base: str = "127.77") -> str:
+    if index < 0 or index >= 250 * 256:
+        raise ValueError(f"index out of range: {index}")
+    return f"{base}.{index // 250}.{index % 250 + 1}"
+
+
+class SimulatorFarm:
+    """
+    Démarre/arrête la ferme et expose la liste des devices au format config agent.
+
+    Exemple:
+        farm = SimulatorFarm(100, latency_ms=5, loss=0.01)
+        farm.start()
+        cfg = {"devices": farm.devices_config(), "timezone": "Europe/Paris"}
+        ...
+        farm.stop()
+    """
+
+    def __init__(
+        self,
+        size: int,
+        mix: Sequence[str] = DRIVERS,
+        latency_ms: float = 2.0,
+        jitter_ms: float = 1.0,
+        loss: float = 0.0,
+        auth_ratio: float = 0.0,
+        bad_auth_ratio: float = 0.0,
+        timeout_s: int = 1,
+        base_ip: str = "127.77",
+        pjlink_port: int = 4352,
+        snmp_port: int = 1161,
+        zigbee_period_s: float = 30.0,
+        seed: Optional[int] = 42,
+    ) -> None:
+        unknown = [d for d in mix if d not in DRIVERS]
+        if unknown or not mix:
+            raise ValueError(f"invalid driver mix: {list(mix)}")
+
+        self.size = max(0, int(size))
+        self.mix = list(mix)
+        self.timeout_s = timeout_s
+        self.base_ip = base_ip
+        self.pjlink_port = pjlink_port
+        self.snmp_port = snmp_port
+        self.zigbee_period_s = zigbee_period_s
+
+        self._rng = random.Random(seed)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._zigbee_task: Optional[asyncio.Task] = None
+
+        self.pjlink: List[PJLinkDevice] = []
+        self.snmp: List[SNMPDevice] = []
+        self.zigbee = ZigbeeInjector()
+        self._devices_cfg: List[Dict[str, Any]] = []
+
+        self._build(latency_ms, jitter_ms, loss, auth_ratio, bad_auth_ratio)
+
+    # --------------------------------------------------------------
+    # Construction
+    # --------------------------------------------------------------
+    def _build(self, latency_ms: float, jitter_ms: float, loss: float, auth_ratio: float, bad_auth_ratio: float) -> None:
+        for i in range(self.size):
+            driver = self.mix[i % len(self.mix)]
+            name = f"sim-{driver}-{i:04d}"
+            with_auth = self._rng.random() < auth_ratio
+            bad_auth = with_auth and self._rng.random() < bad_auth_ratio
+
+            profile = DeviceProfile(name=name, latency_ms=latency_ms, jitter_ms=jitter_ms, loss=loss)
+            dev: Dict[str, Any] = {
+                "name": name,
+                "building": "Simulator",
+                "room": f"Room {i // 10:03d}",
+                "driver": driver,
+                "expectations": {"always_on": True},
+            }
+
+            if driver == "pjlink":
+                ip = sim_ip(i, self.base_ip)
+                profile.password = f"pw{i}" if with_auth else ""
+                self.pjlink.append(PJLinkDevice(ip, self.pjlink_port, profile))
+                dev.update(ip=ip, type="projector", pjlink={
+                    "port": self.pjlink_port,
+                    "password": ("wrong" if bad_auth else profile.password),
+                    "timeout_s": self.timeout_s,
+                })
+            elif driver == "snmp":
+                ip = sim_ip(i, self.base_ip)
+                profile.community = f"c{i}" if with_auth else "public"
+                self.snmp.append(SNMPDevice(ip, self.snmp_port, profile))
+                dev.update(ip=ip, type="switch", snmp={
+                    "community": ("wrong" if bad_auth else profile.community),
+                    "port": self.snmp_port,
+                    "timeout_s": self.timeout_s,
+                    "retries": 0,
+                })
+            else:
+                self.zigbee.add_device(name, profile)
+                dev.update(ip=f"zigbee:{name}", type="sensor")
+
+            self._devices_cfg.append(dev)
+
+    def devices_config(self) -> List[Dict[str, Any]]:
+        """Copie des devices au format config.json de l'agent."""
+        return [dict(d) for d in self._devices_cfg]
+
+    # --------------------------------------------------------------
+    # Cycle de vie
+    # --------------------------------------------------------------
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="simulator-farm", daemon=True)
+        self._thread.start()
+
+        fut = asyncio.run_coroutine_threadsafe(self._start_servers(), self._loop)
+        fut.result(timeout=60)
+
+        if self.zigbee.devices:
+            self.zigbee.install()
+            self.zigbee.bridge_devices_message()
+            self.zigbee.publish_all()  # cache chaud dès le premier cycle
+            self._zigbee_task = asyncio.run_coroutine_threadsafe(self._zigbee_loop(), self._loop)
+
+    async def _start_servers(self) -> None:
+        await asyncio.gather(*(d.start() for d in self.pjlink), *(d.start() for d in self.snmp))
+
+    async def _zigbee_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.zigbee_period_s)
+            self.zigbee.publish_all(asyncio.get_running_loop())
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+        if self._zigbee_task is not None:
+            self._zigbee_task.cancel()
+            self._zigbee_task = None
+        self.zigbee.uninstall()
+
+        async def _stop_all() -> None:
+            await asyncio.gather(*(d.stop() for d in self.pjlink), *(d.stop() for d in self.snmp))
+
+        try:
+            asyncio.run_coroutine_threadsafe(_stop_all(), self._loop).result(timeout=30)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            if self._thread is not None:
+                self._thread.join(timeout=5)
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pjlink_connections": sum(d.connections for d in self.pjlink),
+            "pjlink_commands": sum(d.commands for d in self.pjlink),
+            "snmp_requests": sum(d.requests for d in self.snmp),
+            "snmp_dropped": sum(d.dropped for d in self.snmp),
+            "zigbee_delivered": self.zigbee.delivered,
+            "zigbee_dropped": self.zigbee.dropped,
+        }
+
+    def __enter__(self) -> "SimulatorFarm":
+        self.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
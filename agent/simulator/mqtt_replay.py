@@ -0,0 +1,326 @@
+# agent/simulator/mqtt_replay.py
+"""
+Banc du chemin d'ingestion MQTT: rejoue du trafic zigbee2mqtt (synthétique ou
+enregistré) dans MQTTClientManager._on_message, sans broker, à débit réglable.
+
+Mesures:
+- débit: messages/s acceptés par le thread réseau et appliqués au cache
+- durée de _on_message (thread réseau paho) et temps de détention du lock du cache
+- croissance mémoire du cache d'état (enregistrements + historique)
+- latence de drivers.zigbee.probe() pendant la charge
+
+Usage (depuis agent/):
+    python -m simulator.mqtt_replay
+    python -m simulator.mqtt_replay --devices 2000 --rate 5000 --duration-s 10
+    python -m simulator.mqtt_replay --file capture.jsonl --speed 4
+    python -m simulator.mqtt_replay --max-on-message-p99-ms 0.5 --min-applied-per-s 20000
+
+Capture (--file): une ligne JSON par message, {"t": secondes, "topic": "...", "payload": ...}
+(payload objet JSON ou chaîne). Sans "t", rejoué au débit --rate.
+
+Avec des seuils (--max-*/--min-*), le code de sortie vaut 1 si l'un est dépassé:
+c'est le garde-fou de non-régression des changements sur ce chemin.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.drivers import zigbee
+from src.zigbee_cache import ZigbeeStateCache
+
+from simulator.zigbee_injector import FakeMessage, ZigbeeInjector
+
+# (décalage en secondes ou None, topic, payload encodé)
+Message = Tuple[Optional[float], str, bytes]
+
+
+class _TimedLock:
+    """Lock qui mesure la durée de chaque détention (remplace celui du cache pendant le banc)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._t0 = 0.0
+        self.holds = array("d")
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        ok = self._lock.acquire(blocking, timeout)
+        if ok:
+            self._t0 = time.perf_counter()
+        return ok
+
+    def release(self) -> None:
+        self.holds.append(time.perf_counter() - self._t0)
+        self._lock.release()
+
+    def __enter__(self) -> bool:
+        return self.acquire()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.release()
+
+
+def _percentiles_ms(samples: Any) -> Dict[str, float]:
+    if not samples:
+        return {"p50": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+    n = len(ordered)
+    return {
+        "p50": round(ordered[n // 2] * 1000.0, 4),
+        "p99": round(ordered[min(n - 1, int(n * 0.99))] * 1000.0, 4),
+        "max": round(ordered[-1] * 1000.0, 4),
+    }
+
+
+def _cache_bytes(cache: ZigbeeStateCache) -> int:
+    """Estimation de l'empreinte du cache (enregistrements, valeurs, anneaux)."""
+    total = sys.getsizeof(cache._records) + sys.getsizeof(cache._history)
+    with cache._lock:
+        for key, rec in cache._records.items():
+            total += sys.getsizeof(key) + sys.getsizeof(rec)
+            for name in rec.__slots__:
+                value = getattr(rec, name, None)
+                if value is not None and not isinstance(value, (bool, int)):
+                    total += sys.getsizeof(value)
+        for rings in cache._history.values():
+            total += sys.getsizeof(rings)
+            for ring in rings.values():
+                total += sys.getsizeof(ring) + sys.getsizeof(ring.ts) + sys.getsizeof(ring.values)
+    return total
+
+
+# ------------------------------------------------------------
+# Trafic
+# ------------------------------------------------------------
+def synthetic_traffic(
+    devices: int,
+    count: int,
+    base_topic: str,
+    bridge_every: int,
+    seed: int,
+) -> Tuple[List[str], List[Message]]:
+    """
+    count messages d'état sur devices équipements, entrecoupés de bridge/devices
+    (liste complète) et bridge/state tous les bridge_every messages.
+    """
+    rnd = random.Random(seed)
+    names = [f"sensor_{i:05d}" for i in range(devices)]
+    bridge = json.dumps([
+        {
+            "friendly_name": name,
+            "ieee_address": f"0x{i:016x}",
+            "type": "EndDevice",
+            "supported": True,
+            "definition": {"model": "SIM-ZB", "vendor": "Simulator", "description": "Capteur simulé"},
+        }
+        for i, name in enumerate(names, start=1)
+    ]).encode("utf-8")
+    bridge_state = b'{"state": "online"}'
+    last_seen = datetime.now(timezone.utc).isoformat()
+
+    out: List[Message] = [(None, f"{base_topic}/bridge/devices", bridge)]
+    for i in range(count):
+        if bridge_every and i and i % bridge_every == 0:
+            out.append((None, f"{base_topic}/bridge/devices", bridge))
+            out.append((None, f"{base_topic}/bridge/state", bridge_state))
+            continue
+        name = names[rnd.randrange(devices)]
+        payload = {
+            "last_seen": last_seen,
+            "linkquality": rnd.randint(40, 255),
+            "battery": rnd.randint(20, 100),
+            "temperature": round(rnd.uniform(18.0, 26.0), 1),
+            "humidity": round(rnd.uniform(30.0, 60.0), 1),
+            "co2": rnd.randint(400, 1500),
+            "contact": rnd.random() < 0.5,
+        }
+        out.append((None, f"{base_topic}/{name}", json.dumps(payload).encode("utf-8")))
+    return names, out
+
+
+def load_capture(path: str) -> Tuple[List[str], List[Message]]:
+    """Charge une capture JSONL ({"t", "topic", "payload"} par ligne)."""
+    names: Dict[str, None] = {}
+    out: List[Message] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            topic = str(entry["topic"])
+            payload = entry.get("payload")
+            raw = payload.encode("utf-8") if isinstance(payload, str) else json.dumps(payload).encode("utf-8")
+            t = entry.get("t")
+            out.append((float(t) if t is not None else None, topic, raw))
+            rest = topic.split("/", 1)[-1]
+            if "/" not in rest and rest not in ("bridge", "coordinator"):
+                names[rest] = None
+    # Horodatages relatifs au premier message (captures en temps absolu acceptées)
+    t0 = min((t for t, _, _ in out if t is not None), default=0.0)
+    return list(names), [(t - t0 if t is not None else None, topic, raw) for t, topic, raw in out]
+
+
+# ------------------------------------------------------------
+# Rejeu
+# ------------------------------------------------------------
+def _probe_loop(names: List[str], stop: threading.Event, latencies: "array[float]", seed: int) -> None:
+    rnd = random.Random(seed)
+    while not stop.is_set() and names:
+        device = {"ip": f"zigbee:{names[rnd.randrange(len(names))]}", "driver": "zigbee"}
+        t0 = time.perf_counter()
+        zigbee.probe(device)
+        latencies.append(time.perf_counter() - t0)
+        time.sleep(0.001)
+
+
+def replay(names: List[str], messages: List[Message], args: argparse.Namespace) -> Dict[str, Any]:
+    injector = ZigbeeInjector(base_topic=args.base_topic)
+    manager = injector.manager
+    cache = manager._state_cache
+    mem_before = _cache_bytes(cache)
+    timed = _TimedLock()
+    cache._lock = timed
+    injector.install()
+
+    stop = threading.Event()
+    probe_latencies = array("d")
+    prober = threading.Thread(target=_probe_loop, args=(names, stop, probe_latencies, args.seed), daemon=True)
+
+    on_message = array("d")
+    period = 1.0 / args.rate if args.rate > 0 else 0.0
+
+    try:
+        prober.start()
+        t_start = time.perf_counter()
+        for i, (t, topic, raw) in enumerate(messages):
+            # Cadence: horodatage de la capture (accéléré par --speed), sinon --rate
+            due = t / args.speed if t is not None else i * period
+            if due:
+                delay = t_start + due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            t0 = time.perf_counter()
+            manager._on_message(None, None, FakeMessage(topic, raw))
+            on_message.append(time.perf_counter() - t0)
+        fed_s = time.perf_counter() - t_start
+        drained = manager.wait_idle(timeout=max(30.0, fed_s * 10))
+        applied_s = time.perf_counter() - t_start
+    finally:
+        stop.set()
+        prober.join(timeout=2)
+        injector.uninstall()
+
+    health = manager.get_health()
+    n = len(messages)
+    return {
+        "messages": n,
+        "devices": len(names),
+        "fed_per_s": round(n / fed_s, 1) if fed_s > 0 else None,
+        "applied_per_s": round(n / applied_s, 1) if applied_s > 0 else None,
+        "drained": drained,
+        "dropped": health.get("parse_dropped", 0),
+        "json_backend": health.get("json_backend"),
+        "on_message_ms": _percentiles_ms(on_message),
+        "lock_hold_ms": _percentiles_ms(timed.holds),
+        "lock_acquisitions": len(timed.holds),
+        "probe_ms": _percentiles_ms(probe_latencies),
+        "probes": len(probe_latencies),
+        "devices_in_cache": len(cache),
+        "cache_bytes_before": mem_before,
+        "cache_bytes_after": _cache_bytes(cache),
+    }
+
+
+def _check_gates(result: Dict[str, Any], args: argparse.Namespace) -> List[str]:
+    failures: List[str] = []
+    if args.max_on_message_p99_ms is not None and result["on_message_ms"]["p99"] > args.max_on_message_p99_ms:
+        failures.append(f"on_message p99 {result['on_message_ms']['p99']} ms > {args.max_on_message_p99_ms}")
+    if args.max_lock_p99_ms is not None and result["lock_hold_ms"]["p99"] > args.max_lock_p99_ms:
+        failures.append(f"lock hold p99 {result['lock_hold_ms']['p99']} ms > {args.max_lock_p99_ms}")
+    if args.max_probe_p99_ms is not None and result["probe_ms"]["p99"] > args.max_probe_p99_ms:
+        failures.append(f"probe p99 {result['probe_ms']['p99']} ms > {args.max_probe_p99_ms}")
+    if args.min_applied_per_s is not None and (result["applied_per_s"] or 0) < args.min_applied_per_s:
+        failures.append(f"applied {result['applied_per_s']} msg/s < {args.min_applied_per_s}")
+    if args.max_dropped is not None and result["dropped"] > args.max_dropped:
+        failures.append(f"dropped {result['dropped']} > {args.max_dropped}")
+    if not result["drained"]:
+        failures.append("parse queue not drained")
+    return failures
+
+
+def _print_report(r: Dict[str, Any]) -> None:
+    def pct(d: Dict[str, float]) -> str:
+        return f"p50={d['p50']:.4f} p99={d['p99']:.4f} max={d['max']:.4f}"
+
+    print(f"messages        {r['messages']} ({r['devices']} devices, json={r['json_backend']})")
+    print(f"fed             {r['fed_per_s']} msg/s (thread réseau)")
+    print(f"applied         {r['applied_per_s']} msg/s (cache à jour), dropped={r['dropped']}")
+    print(f"_on_message ms  {pct(r['on_message_ms'])}")
+    print(f"lock hold ms    {pct(r['lock_hold_ms'])} ({r['lock_acquisitions']} acquisitions)")
+    print(f"probe ms        {pct(r['probe_ms'])} ({r['probes']} probes)")
+    growth = r["cache_bytes_after"] - r["cache_bytes_before"]
+    print(f"cache           {r['devices_in_cache']} devices, ~{r['cache_bytes_after'] / 1024:.0f} KiB (+{growth / 1024:.0f} KiB)")
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Rejeu de trafic zigbee2mqtt dans MQTTClientManager (sans broker)")
+    parser.add_argument("--file", help="capture JSONL à rejouer (sinon trafic synthétique)")
+    parser.add_argument("--devices", type=int, default=500, help="équipements (trafic synthétique)")
+    parser.add_argument("--rate", type=float, default=0.0, help="messages/s (0 = au plus vite)")
+    parser.add_argument("--duration-s", type=float, default=5.0, help="durée à --rate (trafic synthétique)")
+    parser.add_argument("--messages", type=int, default=0, help="nombre de messages (prioritaire sur --duration-s)")
+    parser.add_argument("--bridge-every", type=int, default=5000, help="bridge/devices tous les N messages (0 = jamais)")
+    parser.add_argument("--speed", type=float, default=1.0, help="accélération des horodatages de --file")
+    parser.add_argument("--base-topic", default="zigbee2mqtt")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-on-message-p99-ms", type=float)
+    parser.add_argument("--max-lock-p99-ms", type=float)
+    parser.add_argument("--max-probe-p99-ms", type=float)
+    parser.add_argument("--min-applied-per-s", type=float)
+    parser.add_argument("--max-dropped", type=int)
+    parser.add_argument("--json", action="store_true", help="sortie JSON")
+    args = parser.parse_args(argv)
+    if args.speed <= 0:
+        parser.error("--speed must be > 0")
+
+    # Logs de l'agent: erreurs seulement (les messages abandonnés sont comptés dans le rapport)
+    if not os.getenv("LOG_LEVEL"):
+        logging.getLogger("avmonitoring-agent").setLevel(logging.ERROR)
+
+    if args.file:
+        names, messages = load_capture(args.file)
+    else:
+        if args.messages:
+            count = args.messages
+        elif args.rate > 0:
+            count = int(args.rate * args.duration_s)
+        else:
+            count = 50000
+        names, messages = synthetic_traffic(args.devices, count, args.base_topic, args.bridge_every, args.seed)
+
+    result = replay(names, messages, args)
+    failures = _check_gates(result, args)
+    result["failures"] = failures
+
+    if args.json:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    else:
+        _print_report(result)
+        for failure in failures:
+            print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+# agent/simulator/pjlink_server.py
+"""
+Serveur PJLink classe 1/2 simulé (asyncio, une instance par équipement).
+
+Comportement calqué sur un vidéoprojecteur:
+- à la connexion: "PJLINK 0\\r" (sans auth) ou "PJLINK 1 <salt>\\r" (auth MD5)
+- avec auth: la première commande est préfixée par md5(salt + password),
+  sinon "PJLINK ERRA\\r" puis fermeture
+- fermeture après 30 s d'inactivité (comme la plupart des firmwares)
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import random
+import secrets
+from typing import TYPE_CHECKING, Dict, Optional, Set
+
+if TYPE_CHECKING:
+    from simulator.farm import DeviceProfile
+
+IDLE_TIMEOUT_S = 30.0
+
+
+def _answers(profile: "DeviceProfile") -> Dict[str, str]:
+    """Réponses statiques (hors POWR qui suit l'état courant)."""
+    return {
+        "ERST": "000000",
+        "LAMP": "1234 1" if profile.power == 1 else "1234 0",
+        "INPT": "31",
+        "INST": "11 31 32",
+        "AVMT": "30",
+        "NAME": profile.name or "SIM-PJ",
+        "INF1": "SIMULATOR",
+        "INF2": "PJ-SIM-1000",
+        "INFO": "agent simulator",
+        "CLSS": "2",
+        "SNUM": f"SIM{abs(hash(profile.name)) % 10**8:08d}",
+        "SVER": "1.0.0",
+        "FILT": "120",
+    }
+
+
+class PJLinkDevice:
+    """
+    Un équipement PJLink écoutant sur (host, port).
+    """
+
+    def __init__(self, host: str, port: int, profile: "DeviceProfile") -> None:
+        self.host = host
+        self.port = port
+        self.profile = profile
+        self.connections = 0
+        self.commands = 0
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, reuse_address=True)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        # Connexions en cours (clients lents, pertes simulées)
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _delay(self) -> None:
+        d = self.profile.delay_s()
+        if d > 0:
+            await asyncio.sleep(d)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        task = asyncio.current_task()
+        if task is not None:
+            self._tasks.add(task)
+        p = self.profile
+        try:
+            # Perte: on accepte la connexion mais on ne répond jamais (timeout client)
+            if p.loss > 0 and random.random() < p.loss:
+                await asyncio.sleep(IDLE_TIMEOUT_S)
+                return
+
+            salt: Optional[str] = None
+            await self._delay()
+            if p.password:
+                salt = secrets.token_hex(4)
+                writer.write(f"PJLINK 1 {salt}\r".encode("ascii"))
+            else:
+                writer.write(b"PJLINK 0\r")
+            await writer.drain()
+
+            expected = hashlib.md5((salt + p.password).encode("ascii")).hexdigest() if salt else None
+            answers = _answers(p)
+
+            while True:
+                try:
+                    raw = await asyncio.wait_for(reader.readuntil(b"\r"), timeout=IDLE_TIMEOUT_S)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    return
+
+                line = raw.decode("ascii", errors="ignore").strip()
+                if expected is not None:
+                    # Auth: le digest n'est exigé que sur la première commande
+                    if not line.startswith(expected):
+                        writer.write(b"PJLINK ERRA\r")
+                        await writer.drain()
+                        return
+                    line = line[len(expected):]
+                    expected = None
+
+                self.commands += 1
+                await self._delay()
+                writer.write((self._respond(line, answers) + "\r").encode("ascii"))
+                await writer.drain()
+        except (ConnectionError, OSError):
+            return
+        except asyncio.CancelledError:
+            # Arrêt du banc avec des sessions client encore ouvertes (réutilisation agent)
+            return
+        finally:
+            if task is not None:
+                self._tasks.discard(task)
+            try:
+                writer.close()
+            except Exception:
+                pass
+
+    def _respond(self, line: str, answers: Dict[str, str]) -> str:
+        # Format: %<class><CMD4> <param>
+        if len(line) < 7 or line[0] != "%" or line[1] not in "12":
+            return "%1ERR1"  # commande inconnue / mal formée
+        cls = line[1]
+        cmd = line[2:6].upper()
+        param = line[7:].strip() if len(line) > 7 else ""
+        prefix = f"%{cls}{cmd}="
+
+        if cmd == "POWR":
+            if param == "?":
+                return f"{prefix}{self.profile.power}"
+            if param in ("0", "1"):
+                self.profile.power = int(param)
+                return f"{prefix}OK"
+            return f"{prefix}ERR2"
+
+        if param != "?":
+            return f"{prefix}ERR2"
+        value = answers.get(cmd)
+        if value is None:
+            return f"{prefix}ERR1"
+        return f"{prefix}{value}"
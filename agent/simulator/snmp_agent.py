@@ -0,0 +1,169 @@
+# agent/simulator/snmp_agent.py
+"""
+Agent SNMP v1/v2c simulé (asyncio UDP, une instance par équipement).
+
+- GET / GETNEXT / GETBULK sur une table d'OIDs statique + sysUpTime dynamique
+- community invalide => datagramme ignoré (comme un agent réel: le client timeout)
+- perte: la requête est ignorée avec la probabilité du profil
+"""
+from __future__ import annotations
+
+import asyncio
+import bisect
+import random
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from src.drivers import snmp_ber as ber
+
+if TYPE_CHECKING:
+    from simulator.farm import DeviceProfile
+
+SYS_DESCR = "1.3.6.1.2.1.1.1.0"
+SYS_OBJECT_ID = "1.3.6.1.2.1.1.2.0"
+SYS_UPTIME = "1.3.6.1.2.1.1.3.0"
+SYS_NAME = "1.3.6.1.2.1.1.5.0"
+
+
+def default_oids(profile: "DeviceProfile") -> Dict[str, Any]:
+    """Table MIB-2 minimale (system + 2 interfaces)."""
+    oids: Dict[str, Any] = {
+        SYS_DESCR: f"Simulated AV device {profile.name}",
+        SYS_OBJECT_ID: (ber.OID, "1.3.6.1.4.1.99999.1"),
+        SYS_NAME: profile.name or "sim",
+        "1.3.6.1.2.1.2.1.0": 2,  # ifNumber
+    }
+    for idx in (1, 2):
+        oids[f"1.3.6.1.2.1.2.2.1.1.{idx}"] = idx  # ifIndex
+        oids[f"1.3.6.1.2.1.2.2.1.2.{idx}"] = f"eth{idx - 1}"  # ifDescr
+        oids[f"1.3.6.1.2.1.2.2.1.8.{idx}"] = 1  # ifOperStatus up
+        oids[f"1.3.6.1.2.1.2.2.1.10.{idx}"] = (ber.COUNTER32, 0)  # ifInOctets
+        oids[f"1.3.6.1.2.1.2.2.1.16.{idx}"] = (ber.COUNTER32, 0)  # ifOutOctets
+    oids.update(profile.extra_oids or {})
+    return oids
+
+
+class SNMPDevice(asyncio.DatagramProtocol):
+    """
+    Un agent SNMP écoutant sur (host, port).
+    """
+
+    def __init__(self, host: str, port: int, profile: "DeviceProfile") -> None:
+        self.host = host
+        self.port = port
+        self.profile = profile
+        self.requests = 0
+        self.dropped = 0
+        self._started = time.monotonic()
+        self._oids = default_oids(profile)
+        self._keys: List[Tuple[int, ...]] = []
+        self._sorted: List[str] = []
+        self._reindex()
+        self._transport: Optional[asyncio.DatagramTransport] = None
+
+    def _reindex(self) -> None:
+        self._sorted = sorted(self._oids, key=ber.oid_key)
+        self._keys = [ber.oid_key(o) for o in self._sorted]
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: self, local_addr=(self.host, self.port)
+        )
+
+    async def stop(self) -> None:
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    # --------------------------------------------------------------
+    # MIB
+    # --------------------------------------------------------------
+    def _value(self, oid: str) -> Any:
+        if oid == SYS_UPTIME:
+            return (ber.TIMETICKS, int((time.monotonic() - self._started) * 100))
+        v = self._oids.get(oid)
+        if isinstance(v, tuple) and v[0] == ber.COUNTER32:
+            # Compteurs d'octets: progression linéaire (~1 Mo/s)
+            return (ber.COUNTER32, int((time.monotonic() - self._started) * 1_000_000) & 0xFFFFFFFF)
+        return v
+
+    def _next(self, oid: str) -> Optional[str]:
+        i = bisect.bisect_right(self._keys, ber.oid_key(oid))
+        return self._sorted[i] if i < len(self._sorted) else None
+
+    def _get(self, oid: str, version: int) -> Any:
+        if oid == SYS_UPTIME or oid in self._oids:
+            return self._value(oid)
+        return (ber.NO_SUCH_OBJECT, None) if version else None
+
+    # --------------------------------------------------------------
+    # Protocole
+    # --------------------------------------------------------------
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+        self.requests += 1
+        p = self.profile
+        if p.loss > 0 and random.random() < p.loss:
+            self.dropped += 1
+            return
+        try:
+            version, community, pdu, rid, f1, f2, varbinds = ber.decode_message(data)
+        except ber.BERError:
+            self.dropped += 1
+            return
+        if community != p.community:
+            self.dropped += 1
+            return
+
+        out: List[Tuple[str, Any]] = []
+        error_status = 0
+        error_index = 0
+
+        if pdu == ber.GET_REQUEST:
+            for i, (oid, _) in enumerate(varbinds, start=1):
+                v = self._get(oid, version)
+                if v is None:  # v1: noSuchName
+                    error_status, error_index = 2, i
+                    out = varbinds
+                    break
+                out.append((oid, v))
+        elif pdu == ber.GET_NEXT_REQUEST:
+            for oid, _ in varbinds:
+                nxt = self._next(oid)
+                out.append((nxt, self._value(nxt)) if nxt else (oid, (ber.END_OF_MIB_VIEW, None)))
+        elif pdu == ber.GET_BULK_REQUEST and version:
+            non_repeaters, max_rep = max(0, f1), max(0, f2)
+            for oid, _ in varbinds[:non_repeaters]:
+                nxt = self._next(oid)
+                out.append((nxt, self._value(nxt)) if nxt else (oid, (ber.END_OF_MIB_VIEW, None)))
+            cursors = [oid for oid, _ in varbinds[non_repeaters:]]
+            for _ in range(max_rep):
+                if not cursors:
+                    break
+                for j, cur in enumerate(cursors):
+                    nxt = self._next(cur) if cur else None
+                    if nxt:
+                        out.append((nxt, self._value(nxt)))
+                        cursors[j] = nxt
+                    else:
+                        out.append((cur or varbinds[non_repeaters + j][0], (ber.END_OF_MIB_VIEW, None)))
+                        cursors[j] = ""
+                if all(c == "" for c in cursors):
+                    break
+        else:
+            self.dropped += 1
+            return
+
+        reply = ber.encode_message(version, community, ber.GET_RESPONSE, rid, error_status, error_index, out)
+        delay = p.delay_s()
+        transport = self._transport
+        if transport is None:
+            return
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self._send, reply, addr)
+        else:
+            transport.sendto(reply, addr)
+
+    def _send(self, reply: bytes, addr: Tuple[str, int]) -> None:
+        if self._transport is not None:
+            self._transport.sendto(reply, addr)
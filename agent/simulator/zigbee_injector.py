@@ -0,0 +1,138 @@
+# agent/simulator/zigbee_injector.py
+"""
+Injecteur d'états Zigbee2MQTT sans broker.
+
+Installe un MQTTClientManager "connecté" comme singleton et lui délivre des
+messages via _on_message (même chemin que le callback paho), avec la latence
+et la perte du profil de chaque équipement. Les livraisons synchrones attendent
+que le thread de parsing du manager les ait appliquées.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from src.mqtt_client import MQTTClientManager
+
+if TYPE_CHECKING:
+    from simulator.farm import DeviceProfile
+
+
+class FakeMessage:
+    """Équivalent minimal de paho.mqtt.client.MQTTMessage."""
+
+    __slots__ = ("topic", "payload")
+
+    def __init__(self, topic: str, payload: bytes) -> None:
+        self.topic = topic
+        self.payload = payload
+
+
+class _NullClient:
+    """Client paho factice: les publications sont comptées, pas envoyées."""
+
+    def __init__(self) -> None:
+        self.published: List[Any] = []
+
+    def publish(self, topic: str, payload: Any = None, *args: Any, **kwargs: Any) -> None:
+        self.published.append((topic, payload))
+
+    def disconnect(self) -> None:
+        pass
+
+    def loop_stop(self) -> None:
+        pass
+
+
+class ZigbeeInjector:
+    """
+    Pilote un MQTTClientManager hors réseau.
+
+    - install(): remplace le singleton (get_mqtt_manager() renvoie ce manager)
+    - uninstall(): restaure le singleton précédent
+    """
+
+    def __init__(self, base_topic: str = "zigbee2mqtt") -> None:
+        self.base_topic = base_topic
+        self.manager = MQTTClientManager.__new__(MQTTClientManager)
+        self.manager._init_state()
+        self.manager._base_topic = base_topic
+        self.manager._client = _NullClient()
+        self.manager._configured = True
+        self.manager._connected = True
+        self.manager._connection_attempted = True
+        self.devices: Dict[str, "DeviceProfile"] = {}
+        self.delivered = 0
+        self.dropped = 0
+        self._previous: Optional[MQTTClientManager] = None
+
+    def install(self) -> None:
+        with MQTTClientManager._lock_instance:
+            self._previous = MQTTClientManager._instance
+            MQTTClientManager._instance = self.manager
+
+    def uninstall(self) -> None:
+        with MQTTClientManager._lock_instance:
+            if MQTTClientManager._instance is self.manager:
+                MQTTClientManager._instance = self._previous
+
+    def add_device(self, friendly_name: str, profile: "DeviceProfile") -> None:
+        self.devices[friendly_name] = profile
+
+    # --------------------------------------------------------------
+    # Messages
+    # --------------------------------------------------------------
+    def _state_payload(self, friendly_name: str, profile: "DeviceProfile") -> Dict[str, Any]:
+        return {
+            "last_seen": datetime.now(timezone.utc).isoformat(),
+            "linkquality": random.randint(40, 255),
+            "battery": random.randint(20, 100),
+            "temperature": round(random.uniform(18.0, 26.0), 1),
+            "humidity": round(random.uniform(30.0, 60.0), 1),
+            "state": "ON" if profile.power == 1 else "OFF",
+        }
+
+    def _deliver(self, topic: str, payload: Any) -> None:
+        self.manager._on_message(None, None, FakeMessage(topic, json.dumps(payload).encode("utf-8")))
+        self.delivered += 1
+
+    def bridge_devices_message(self) -> None:
+        """Publie bridge/devices (liste complète) immédiatement."""
+        payload = [
+            {
+                "friendly_name": name,
+                "ieee_address": f"0x{i:016x}",
+                "type": "EndDevice",
+                "supported": True,
+                "definition": {"model": "SIM-ZB", "vendor": "Simulator"},
+            }
+            for i, name in enumerate(sorted(self.devices), start=1)
+        ]
+        self._deliver(f"{self.base_topic}/bridge/devices", payload)
+        self.manager.wait_idle()
+
+    def publish_state(self, friendly_name: str, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """
+        Publie l'état d'un équipement en appliquant perte et latence du profil.
+        Sans loop: livraison synchrone (latence ignorée).
+        """
+        profile = self.devices[friendly_name]
+        if profile.loss > 0 and random.random() < profile.loss:
+            self.dropped += 1
+            return
+        topic = f"{self.base_topic}/{friendly_name}"
+        payload = self._state_payload(friendly_name, profile)
+        delay = profile.delay_s()
+        if loop is None or delay <= 0:
+            self._deliver(topic, payload)
+            if loop is None:
+                self.manager.wait_idle()
+        else:
+            loop.call_soon_threadsafe(loop.call_later, delay, self._deliver, topic, payload)
+
+    def publish_all(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        for name in list(self.devices):
+            self.publish_state(name, loop)
@@ -1,25 +1,44 @@
 # agent/src/collector.py
 from __future__ import annotations
 
+import copy
 import inspect
+import json
+import math
 import os
 import threading
 import time
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Set, Tuple
 
 import requests
 
-from src.storage import load_config
-from src.drivers.registry import run_driver
+from src import metrics as agent_metrics
+from src.storage import load_config, on_config_saved
+from src.drivers.registry import (
+    REACHABILITY_DRIVERS,
+    coalesce_key,
+    prune_state as prune_driver_state,
+    reachability_key,
+    reachable_ping,
+    run_batch,
+    run_driver,
+)
+from src.logs import get_logger
+from src.mqtt_client import on_device_change
+from src.runtime_state import get_store as get_state_store, state_key
 from src.scheduling import (
+    classify_batch,
     classify_observation,
     compute_next_collect_interval_s,
-    device_policy_from_config,
+    policy_for_device,
 )
 
 CONFIG_PATH = os.getenv("AGENT_CONFIG", "/var/lib/avmonitoring/config.json")
 
+log = get_logger(__name__)
+
 
 # -------------------------------------------------------------------
 # Etat exposé à l'UI (thread-safe via lock)
@@ -39,6 +58,46 @@ _last_status: Dict[str, Any] = {
 # Derniers résultats de collecte par IP
 _last_results: Dict[str, Dict[str, Any]] = {}
 
+# Version des résultats (incrémentée à chaque changement visible d'un device) et
+# version du dernier changement par IP: l'UI ne redemande que ce qui a changé
+_results_version = 0
+_result_versions: Dict[str, int] = {}
+_result_views: Dict[str, Dict[str, Any]] = {}
+
+# Prochain cycle (time.monotonic()); le compte à rebours est calculé à la lecture
+_next_collect_at: Optional[float] = None
+
+# Réveil de la boucle: start/stop, config modifiée, collecte immédiate
+_wake = threading.Condition()
+_wake_reasons: Set[str] = set()
+
+# Un seul cycle (complet ou micro-rapport) à la fois
+_cycle_lock = threading.Lock()
+
+# Micro-rapports: devices changés (MQTT) en attente, envoyés après la fenêtre de debounce
+MICRO_REPORT_DEBOUNCE_S = float(os.getenv("AGENT_MICRO_REPORT_DEBOUNCE_S", "2"))
+_micro_cond = threading.Condition()
+_micro_pending: Set[str] = set()
+_micro_thread: Optional[threading.Thread] = None
+
+
+# Abonnés (UI en push) notifiés hors lock: fn("results") / fn("status")
+_STATE_LISTENERS: List[Callable[[str], None]] = []
+
+
+def on_state_change(fn: Callable[[str], None]) -> None:
+    """Enregistre fn(kind), appelée quand les résultats ("results") ou le statut ("status") changent."""
+    if fn not in _STATE_LISTENERS:
+        _STATE_LISTENERS.append(fn)
+
+
+def _notify_state_change(kind: str) -> None:
+    for fn in list(_STATE_LISTENERS):
+        try:
+            fn(kind)
+        except Exception as e:
+            log.warning("state listener error", error=str(e), rate_key="state_listener")
+
 
 def _now_utc() -> datetime:
     return datetime.now(timezone.utc)
@@ -51,7 +110,13 @@ def _iso(dt: Optional[datetime]) -> Optional[str]:
 def get_last_status() -> Dict[str, Any]:
     # copie défensive
     with _lock:
-        return dict(_last_status)
+        out = dict(_last_status)
+        deadline = _next_collect_at
+    if deadline is not None:
+        remaining = max(0, int(math.ceil(deadline - time.monotonic())))
+        out["next_collect_in_s"] = remaining
+        out["next_send_in_s"] = remaining
+    return out
 
 
 def get_last_results() -> Dict[str, Dict[str, Any]]:
@@ -60,20 +125,126 @@ def get_last_results() -> Dict[str, Dict[str, Any]]:
         return dict(_last_results)
 
 
+def get_results_version() -> int:
+    with _lock:
+        return _results_version
+
+
+def get_results_since(since: int) -> Tuple[int, bool, List[Dict[str, Any]]]:
+    """
+    (version courante, complet, devices changés depuis since) pour le rafraîchissement
+    incrémental de l'UI. since inconnu (redémarrage de l'agent): tous les devices.
+    """
+    with _lock:
+        full = since <= 0 or since > _results_version
+        changed = [
+            _result_views[ip]
+            for ip, version in _result_versions.items()
+            if full or version > since
+        ]
+        return _results_version, full, changed
+
+
+def _ui_view(device_result: Dict[str, Any]) -> Dict[str, Any]:
+    """Champs affichés par l'UI (les métriques changent à chaque cycle, pas ceux-ci)."""
+    return {
+        "ip": device_result.get("ip"),
+        "status": device_result.get("status"),
+        "verdict": device_result.get("verdict"),
+        "detail": device_result.get("detail"),
+    }
+
+
+def _store_results(out_devices: List[Dict[str, Any]]) -> None:
+    global _results_version
+    with _lock:
+        before = _results_version
+        for device_result in out_devices:
+            ip = device_result["ip"]
+            _last_results[ip] = device_result
+            view = _ui_view(device_result)
+            if _result_views.get(ip) != view:
+                _results_version += 1
+                _result_versions[ip] = _results_version
+                _result_views[ip] = view
+        changed = _results_version != before
+    if changed:
+        _notify_state_change("results")
+
+
+def _set_next_collect(interval_s: Optional[float]) -> Optional[float]:
+    """Fixe l'échéance du prochain cycle (None = collector arrêté). Retourne l'échéance."""
+    global _next_collect_at
+    with _lock:
+        _next_collect_at = time.monotonic() + interval_s if interval_s is not None else None
+        if interval_s is None:
+            _last_status["next_collect_in_s"] = None
+            _last_status["next_send_in_s"] = None
+        deadline = _next_collect_at
+    _notify_state_change("status")
+    return deadline
+
+
+# -------------------------------------------------------------------
+# Contrôle de la boucle (sans polling)
+# -------------------------------------------------------------------
+def wake(reason: str = "wake") -> None:
+    """Réveille la boucle de collecte (à appeler après un changement de stop_flag)."""
+    with _wake:
+        _wake_reasons.add(reason)
+        _wake.notify_all()
+
+
+def request_collect_now() -> None:
+    """Déclenche un cycle immédiat (même collector arrêté: cycle unique)."""
+    wake("collect_now")
+
+
+def notify_config_changed() -> None:
+    """Config modifiée: cycle immédiat avec la nouvelle config."""
+    wake("config_changed")
+
+
+def _on_config_saved(path: str) -> None:
+    if os.path.abspath(path) == os.path.abspath(CONFIG_PATH):
+        notify_config_changed()
+
+
+on_config_saved(_on_config_saved)
+
+
+def _wait_wake(timeout_s: Optional[float]) -> Set[str]:
+    """Attend un réveil (ou timeout_s). Retourne les raisons accumulées depuis le dernier appel."""
+    with _wake:
+        if not _wake_reasons:
+            _wake.wait(timeout_s)
+        reasons = set(_wake_reasons)
+        _wake_reasons.clear()
+    return reasons
+
+
 def _set_status(**kwargs: Any) -> None:
     with _lock:
         _last_status.update(kwargs)
         # backward compat : si next_collect_in_s est set, on set aussi next_send_in_s
         if "next_collect_in_s" in kwargs and "next_send_in_s" not in kwargs:
             _last_status["next_send_in_s"] = kwargs.get("next_collect_in_s")
+    _notify_state_change("status")
 
 
 # -------------------------------------------------------------------
 # Compat helper: classify_observation signature
 # -------------------------------------------------------------------
+@lru_cache(maxsize=8)
+def _signature_params(fn: Any) -> FrozenSet[str]:
+    # Résolu une fois par fonction (plus de reflection par device et par cycle)
+    return frozenset(inspect.signature(fn).parameters)
+
+
 def _classify_with_compat(**kwargs: Any) -> str:
     """
     Appelle classify_observation() en restant compatible avec plusieurs signatures historiques.
+    (Repli du collector si classify_batch() échoue.)
 
     Nouveau (attendu):
       classify_observation(now_utc, tz_name, policy, observed_status, last_ok_utc, doubt_after_days)
@@ -82,8 +253,7 @@ def _classify_with_compat(**kwargs: Any) -> str:
       - timezone=... ou tz=...
       - ou pas de param de timezone du tout (fallback interne)
     """
-    sig = inspect.signature(classify_observation)
-    params = set(sig.parameters.keys())
+    params = _signature_params(classify_observation)
 
     call_kwargs = dict(kwargs)
 
@@ -104,12 +274,44 @@ def _classify_with_compat(**kwargs: Any) -> str:
     return classify_observation(**call_kwargs)
 
 
+# -------------------------------------------------------------------
+# Instrumentation (exposée via /metrics)
+# -------------------------------------------------------------------
+def _record_probe_metrics(
+    driver: str,
+    status: str,
+    detail: Optional[str],
+    probe_s: float,
+    driver_failed: bool,
+) -> None:
+    agent_metrics.observe("agent_probe_duration_seconds", probe_s, driver=driver)
+    agent_metrics.inc("agent_probe_total", driver=driver, status=status)
+
+    detail_l = (detail or "").lower()
+    if "timeout" in detail_l or "timed out" in detail_l or "no response" in detail_l:
+        agent_metrics.inc("agent_probe_timeouts_total", driver=driver)
+    elif driver_failed or (status == "unknown" and detail_l.startswith(("driver_", "unknown_driver"))):
+        agent_metrics.inc("agent_probe_errors_total", driver=driver)
+
+
+def _record_cycle_metrics(cycle_s: float, interval_s: int, devices_count: int) -> None:
+    agent_metrics.observe("agent_cycle_duration_seconds", cycle_s)
+    agent_metrics.set_gauge("agent_cycle_last_duration_seconds", round(cycle_s, 6))
+    agent_metrics.set_gauge("agent_cycle_interval_seconds", interval_s)
+    agent_metrics.set_gauge("agent_cycle_devices", devices_count)
+
+    overrun_s = max(0.0, cycle_s - interval_s)
+    agent_metrics.set_gauge("agent_cycle_overrun_seconds", round(overrun_s, 6))
+    if overrun_s > 0:
+        agent_metrics.inc("agent_cycle_overrun_total")
+
+
 # -------------------------------------------------------------------
 # Collect + Send
 # -------------------------------------------------------------------
-def _collect_once(cfg: Dict[str, Any]) -> Dict[str, Any]:
+def _collect_once(cfg: Dict[str, Any], only_ips: Optional[Set[str]] = None) -> Dict[str, Any]:
     """
-    Exécute une collecte sur tous les devices.
+    Exécute une collecte sur tous les devices (ou seulement only_ips: micro-rapport).
     Retourne:
       {
         "devices": [ {ip,name,building,room,type,driver,status,detail,metrics,verdict}, ... ],
@@ -119,6 +321,8 @@ def _collect_once(cfg: Dict[str, Any]) -> Dict[str, Any]:
     devices_cfg = cfg.get("devices") or []
     if not isinstance(devices_cfg, list):
         devices_cfg = []
+    if only_ips is not None:
+        devices_cfg = [d for d in devices_cfg if isinstance(d, dict) and (d.get("ip") or "").strip() in only_ips]
 
     tz_name = (cfg.get("timezone") or "Europe/Paris").strip() or "Europe/Paris"
 
@@ -131,10 +335,41 @@ def _collect_once(cfg: Dict[str, Any]) -> Dict[str, Any]:
 
     now = _now_utc()
 
+    runtime = get_state_store()
     out_devices = []
+    observations = []
     any_fault = False
 
-    for dev_cfg in devices_cfg:
+    # Drivers batch (SNMP): toutes les requêtes du cycle partent ensemble
+    try:
+        prefetched = run_batch(devices_cfg)
+    except Exception as e:
+        prefetched = {}
+        log.warning("batch probe error", error=f"{e.__class__.__name__}: {e}", rate_key="batch")
+
+    # Probes du cycle par (driver, ip, bloc driver): une entrée dupliquée reprend le résultat
+    probed: Dict[Any, Dict[str, Any]] = {}
+    # IPs vues en ligne ce cycle par un driver de REACHABILITY_DRIVERS -> ce driver:
+    # une entrée ping sur la même IP n'envoie pas d'ICMP
+    reachable: Dict[str, str] = {}
+    for idx, (obs, _elapsed) in prefetched.items():
+        dev = devices_cfg[idx]
+        dname = (dev.get("driver") or "ping").strip().lower() or "ping"
+        rkey = reachability_key(dname, dev)
+        if rkey and dname in REACHABILITY_DRIVERS and (obs.get("status") or "").strip().lower() == "online":
+            reachable.setdefault(rkey, dname)
+
+    # Entrées ping en dernier (elles peuvent reprendre une réponse PJLink du cycle);
+    # l'ordre de la config est rétabli avant les verdicts
+    def _is_ping(i: int) -> bool:
+        d = devices_cfg[i]
+        return isinstance(d, dict) and ((d.get("driver") or "ping").strip().lower() or "ping") == "ping"
+
+    order = sorted(range(len(devices_cfg)), key=_is_ping)
+    positions: List[int] = []
+
+    for idx in order:
+        dev_cfg = devices_cfg[idx]
         if not isinstance(dev_cfg, dict):
             continue
 
@@ -150,61 +385,84 @@ def _collect_once(cfg: Dict[str, Any]) -> Dict[str, Any]:
 
         # 1) run driver (ne doit jamais faire tomber toute la boucle)
         obs: Dict[str, Any]
+        driver_failed = False
+        coalesced = False
+        t_probe = time.perf_counter()
+        batch_probe_s: Optional[float] = None
+        key = coalesce_key(driver, dev_cfg) if idx not in prefetched else None
+        rkey = reachability_key(driver, dev_cfg)
         try:
-            obs = run_driver(driver, dev_cfg)  # normalisé par registry
+            if idx in prefetched:
+                obs, batch_probe_s = prefetched[idx]
+                coalesced = bool((obs.get("metrics") or {}).get("probe_coalesced"))
+            elif driver == "ping" and rkey in reachable:
+                # IP déjà en ligne via SNMP/PJLink dans ce cycle: pas d'ICMP
+                obs = reachable_ping(dev_cfg, reachable[rkey])
+                obs["metrics"]["probe_coalesced"] = True
+                coalesced = True
+            elif key is not None and key in probed:
+                # Même équipement déjà sondé dans ce cycle: résultat partagé, pas de nouveau probe
+                obs = copy.deepcopy(probed[key])
+                obs["metrics"]["probe_coalesced"] = True
+                coalesced = True
+            else:
+                obs = run_driver(driver, dev_cfg)  # normalisé par registry
+                if key is not None:
+                    probed[key] = copy.deepcopy(obs)
             if not isinstance(obs, dict):
                 obs = {"status": "unknown", "detail": "driver_return_not_dict", "metrics": {}}
+                driver_failed = True
         except Exception as e:
             obs = {
                 "status": "unknown",
                 "detail": f"{e.__class__.__name__}: {e}",
                 "metrics": {"driver_error": True},
             }
+            driver_failed = True
+            log.warning("driver error", driver=driver, ip=ip, error=obs["detail"], rate_key=driver)
+        probe_s = batch_probe_s if batch_probe_s is not None else time.perf_counter() - t_probe
 
         status = (obs.get("status") or "unknown").strip().lower()
         detail = (obs.get("detail") or "").strip() or None
         metrics = obs.get("metrics") if isinstance(obs.get("metrics"), dict) else {}
-
-        # 2) Verdict (anti-faux positifs) + last_ok_utc
-        last_ok_utc: Optional[datetime] = None
-
-        # On supporte plusieurs emplacements possibles:
-        # - metrics["_last_ok_utc"] (ce que tu utilises)
-        # - dev_cfg["_last_ok_utc"] (si déjà stocké côté config)
-        # - dev_cfg["last_ok_utc"]  (au cas où)
-        prev_last_ok = (
-            metrics.get("_last_ok_utc")
-            or dev_cfg.get("_last_ok_utc")
-            or dev_cfg.get("last_ok_utc")
-        )
-
-        if isinstance(prev_last_ok, str) and prev_last_ok.strip():
-            try:
-                last_ok_utc = datetime.fromisoformat(prev_last_ok.replace("Z", "+00:00"))
-            except Exception:
-                last_ok_utc = None
+        if rkey and driver in REACHABILITY_DRIVERS and status == "online":
+            reachable.setdefault(rkey, driver)
+
+        if coalesced:
+            agent_metrics.inc("agent_probe_coalesced_total", driver=driver)
+        else:
+            _record_probe_metrics(driver, status, detail, probe_s, driver_failed)
+
+        # 2) Etat persistant (dernier OK, panne en cours) pour le verdict (doute + anti-faux positifs)
+        # Par (ip, driver): ping et snmp d'un même équipement ont chacun leur panne en cours
+        state = runtime.get(state_key(ip, driver))
+        state.observe(status, now)
+        last_ok_utc: Optional[datetime] = state.last_ok_utc
+
+        if last_ok_utc is None:
+            # Pas encore d'état: on supporte les anciens emplacements possibles
+            # - metrics["_last_ok_utc"]
+            # - dev_cfg["_last_ok_utc"] (si déjà stocké côté config)
+            # - dev_cfg["last_ok_utc"]  (au cas où)
+            prev_last_ok = (
+                metrics.get("_last_ok_utc")
+                or dev_cfg.get("_last_ok_utc")
+                or dev_cfg.get("last_ok_utc")
+            )
+            if isinstance(prev_last_ok, str) and prev_last_ok.strip():
+                try:
+                    last_ok_utc = datetime.fromisoformat(prev_last_ok.replace("Z", "+00:00"))
+                    state.last_ok_utc = last_ok_utc
+                except Exception:
+                    last_ok_utc = None
 
         if status == "online":
-            last_ok_utc = now
             # stocke dans metrics (remonte au backend si tu veux)
             metrics["_last_ok_utc"] = now.isoformat()
             # stocke dans dev_cfg en mémoire (utile pendant le run)
             dev_cfg["_last_ok_utc"] = now.isoformat()
 
-        policy = device_policy_from_config(dev_cfg)
-
-        # compat signature scheduling
-        verdict = _classify_with_compat(
-            now_utc=now,
-            tz_name=tz_name,
-            policy=policy,
-            observed_status=status,
-            last_ok_utc=last_ok_utc,
-            doubt_after_days=doubt_after_days,
-        )
-
-        if verdict == "fault":
-            any_fault = True
+        policy = policy_for_device(dev_cfg)  # compilée, en cache tant que la config du device ne change pas
 
         device_result = {
             "ip": ip,
@@ -216,14 +474,51 @@ def _collect_once(cfg: Dict[str, Any]) -> Dict[str, Any]:
             "status": status,
             "detail": detail,
             "metrics": metrics,
-            "verdict": verdict,
+            "verdict": "unknown",
         }
-
         out_devices.append(device_result)
+        positions.append(idx)
+        observations.append({
+            "policy": policy,
+            "observed_status": status,
+            "last_ok_utc": last_ok_utc,
+            "offline_for_s": state.offline_for_s(now),
+        })
+
+    # Ordre de la config (les entrées ping ont été traitées en dernier)
+    ranked = sorted(range(len(positions)), key=positions.__getitem__)
+    out_devices = [out_devices[i] for i in ranked]
+    observations = [observations[i] for i in ranked]
+
+    # 3) Verdicts du cycle en une passe (heure locale calculée une fois par timezone)
+    try:
+        verdicts = classify_batch(observations, now, doubt_after_days=doubt_after_days)
+    except Exception as e:
+        log.warning("classify_batch error", error=f"{e.__class__.__name__}: {e}")
+        verdicts = [
+            _classify_with_compat(now_utc=now, tz_name=tz_name, doubt_after_days=doubt_after_days, **obs)
+            for obs in observations
+        ]
+
+    for device_result, verdict in zip(out_devices, verdicts):
+        device_result["verdict"] = verdict
+        if verdict == "fault":
+            any_fault = True
+        st = runtime.peek(state_key(device_result["ip"], device_result["driver"]))
+        if st is not None:
+            st.last_verdict = verdict
 
-        # Stocker le résultat pour l'UI
-        with _lock:
-            _last_results[ip] = device_result
+    # Etat persistant: une transaction par cycle (pas de purge sur un micro-rapport partiel)
+    if out_devices and only_ips is None:
+        runtime.prune(state_key(d["ip"], d["driver"]) for d in out_devices)
+        try:
+            prune_driver_state(devices_cfg)
+        except Exception as e:
+            log.warning("driver state prune error", error=f"{e.__class__.__name__}: {e}", rate_key="prune")
+    runtime.flush()
+
+    # Stocker les résultats pour l'UI
+    _store_results(out_devices)
 
     return {"devices": out_devices, "any_fault": any_fault}
 
@@ -247,6 +542,7 @@ def _send_to_backend(cfg: Dict[str, Any], devices_payload: Dict[str, Any]) -> No
     site_token = (cfg.get("site_token") or "").strip()
 
     if not api_url or not site_name or not site_token:
+        log.warning("send skipped: missing backend url or site credentials")
         _set_status(
             last_send_at=_iso(_now_utc()),
             last_send_ok=False,
@@ -264,15 +560,26 @@ def _send_to_backend(cfg: Dict[str, Any], devices_payload: Dict[str, Any]) -> No
         "X-Site-Token": site_token,
     }
 
+    # Sérialisation explicite: permet de mesurer la taille réellement envoyée
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    agent_metrics.observe("agent_send_payload_bytes", len(body))
+
+    t_send = time.perf_counter()
     try:
-        r = requests.post(api_url, json=payload, headers=headers, timeout=8)
+        r = requests.post(api_url, data=body, headers=headers, timeout=8)
         r.raise_for_status()
+        agent_metrics.observe("agent_send_duration_seconds", time.perf_counter() - t_send)
+        agent_metrics.inc("agent_send_total", result="ok")
         _set_status(
             last_send_at=_iso(_now_utc()),
             last_send_ok=True,
             last_send_error=None,
+            last_payload_size=len(body),
         )
     except Exception as e:
+        agent_metrics.observe("agent_send_duration_seconds", time.perf_counter() - t_send)
+        agent_metrics.inc("agent_send_total", result="error")
+        log.warning("send to backend failed", error=f"{e.__class__.__name__}: {e}", bytes=len(body))
         _set_status(
             last_send_at=_iso(_now_utc()),
             last_send_ok=False,
@@ -283,59 +590,142 @@ def _send_to_backend(cfg: Dict[str, Any], devices_payload: Dict[str, Any]) -> No
 # -------------------------------------------------------------------
 # Loop
 # -------------------------------------------------------------------
+def _run_cycle() -> float:
+    """Un cycle complet (config, collecte, envoi). Retourne l'échéance du suivant (time.monotonic())."""
+    t_load = time.perf_counter()
+    cfg = load_config(CONFIG_PATH)
+    agent_metrics.observe("agent_config_load_duration_seconds", time.perf_counter() - t_load)
+
+    # run
+    now = _now_utc()
+    _set_status(last_run_at=_iso(now))
+
+    with _cycle_lock:
+        # Le cycle complet couvre les changements en attente de micro-rapport
+        with _micro_cond:
+            _micro_pending.clear()
+        t_cycle = time.perf_counter()
+        collected = _collect_once(cfg)
+        cycle_s = time.perf_counter() - t_cycle
+
+    # interval adaptatif
+    reporting = cfg.get("reporting") or {}
+    try:
+        ok_interval_s = int(reporting.get("ok_interval_s") or 300)
+    except Exception:
+        ok_interval_s = 300
+    try:
+        ko_interval_s = int(reporting.get("ko_interval_s") or 60)
+    except Exception:
+        ko_interval_s = 60
+
+    next_interval = compute_next_collect_interval_s(
+        any_fault=bool(collected.get("any_fault")),
+        ok_interval_s=ok_interval_s,
+        ko_interval_s=ko_interval_s,
+    )
+
+    _record_cycle_metrics(cycle_s, int(next_interval), len(collected.get("devices") or []))
+    log.info(
+        "collect cycle done",
+        devices=len(collected.get("devices") or []),
+        any_fault=bool(collected.get("any_fault")),
+        cycle_s=round(cycle_s, 3),
+        next_in_s=int(next_interval),
+    )
+    if cycle_s > next_interval:
+        log.warning("collect cycle overrun", cycle_s=round(cycle_s, 3), interval_s=int(next_interval))
+
+    # expose UI "prochain cycle" (échéance, compte à rebours calculé à la lecture)
+    deadline = _set_next_collect(next_interval)
+
+    # send
+    with _cycle_lock:
+        _send_to_backend(cfg, collected)
+    return deadline if deadline is not None else time.monotonic() + next_interval
+
+
+# -------------------------------------------------------------------
+# Micro-rapports (changements Zigbee poussés sans attendre le cycle)
+# -------------------------------------------------------------------
+def notify_device_changed(ip: str) -> None:
+    """Device changé (appelé depuis le thread MQTT): micro-rapport après debounce."""
+    with _micro_cond:
+        _micro_pending.add(ip)
+        _micro_cond.notify()
+
+
+on_device_change(notify_device_changed)
+
+
+def _micro_report(ips: Set[str]) -> int:
+    """Collecte + envoi des seuls devices ips. Retourne le nombre de devices envoyés."""
+    cfg = load_config(CONFIG_PATH)
+    with _cycle_lock:
+        collected = _collect_once(cfg, only_ips=ips)
+        devices = collected.get("devices") or []
+        if devices:
+            _send_to_backend(cfg, collected)
+    return len(devices)
+
+
+def _micro_report_loop(stop_flag: Dict[str, bool]) -> None:
+    while True:
+        with _micro_cond:
+            while not _micro_pending:
+                _micro_cond.wait()
+        # Fenêtre de debounce: les changements arrivés entre-temps partent dans le même envoi
+        time.sleep(MICRO_REPORT_DEBOUNCE_S)
+        with _micro_cond:
+            ips = set(_micro_pending)
+            _micro_pending.clear()
+        if stop_flag.get("stop"):
+            continue
+        try:
+            sent = _micro_report(ips)
+        except Exception as e:
+            log.warning("micro report error", error=f"{e.__class__.__name__}: {e}", rate_key="micro_report")
+            continue
+        if sent:
+            agent_metrics.inc("agent_micro_reports_total")
+            agent_metrics.inc("agent_micro_report_devices_total", sent)
+            log.info("micro report sent", devices=sent)
+
+
+def _ensure_micro_reporter(stop_flag: Dict[str, bool]) -> None:
+    global _micro_thread
+    if _micro_thread is not None and _micro_thread.is_alive():
+        return
+    _micro_thread = threading.Thread(target=_micro_report_loop, args=(stop_flag,), name="micro-report", daemon=True)
+    _micro_thread.start()
+
+
 def run_forever(stop_flag: Dict[str, bool]) -> None:
     """
     Boucle de collecte:
     - collecte (drivers)
     - calcule intervalle adaptatif (OK vs KO)
     - envoie au backend
-    - dort jusqu'au prochain cycle, mais s'interrompt si stop_flag["stop"] == True
+    - attend l'échéance du prochain cycle sur une Condition: réveillée sans délai
+      par wake() (start/stop), notify_config_changed() et request_collect_now()
+    - en parallèle: micro-rapports des devices Zigbee changés (notify_device_changed)
     """
+    _ensure_micro_reporter(stop_flag)
     while True:
         if stop_flag.get("stop"):
-            _set_status(next_collect_in_s=None, next_send_in_s=None)
-            time.sleep(0.5)
-            continue
-
-        cfg = load_config(CONFIG_PATH)
-
-        # run
-        now = _now_utc()
-        _set_status(last_run_at=_iso(now))
-
-        collected = _collect_once(cfg)
-
-        # interval adaptatif
-        reporting = cfg.get("reporting") or {}
-        try:
-            ok_interval_s = int(reporting.get("ok_interval_s") or 300)
-        except Exception:
-            ok_interval_s = 300
-        try:
-            ko_interval_s = int(reporting.get("ko_interval_s") or 60)
-        except Exception:
-            ko_interval_s = 60
-
-        next_interval = compute_next_collect_interval_s(
-            any_fault=bool(collected.get("any_fault")),
-            ok_interval_s=ok_interval_s,
-            ko_interval_s=ko_interval_s,
-        )
+            _set_next_collect(None)
+            reasons = _wait_wake(None)
+            if stop_flag.get("stop") and "collect_now" not in reasons:
+                continue
+            # collect_now alors que le collector est arrêté: un cycle unique
 
-        # expose UI "prochain cycle"
-        _set_status(next_collect_in_s=int(next_interval))
+        deadline = _run_cycle()
 
-        # send
-        _send_to_backend(cfg, collected)
-
-        # sleep with countdown (UI-friendly) + stop support
-        remaining = int(next_interval)
-        while remaining > 0:
-            if stop_flag.get("stop"):
+        while not stop_flag.get("stop"):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            reasons = _wait_wake(remaining)
+            if reasons & {"collect_now", "config_changed"}:
                 break
-            time.sleep(1)
-            remaining -= 1
-            _set_status(next_collect_in_s=remaining)
-
         # si on a interrompu via stop, on repasse dans la boucle (qui mettra next_collect_in_s=None)
-        continue
\ No newline at end of file
@@ -18,16 +18,18 @@ import hashlib
 import json
 import os
 import threading
-import time
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 import requests
 
+from src.logs import get_logger
 from src.storage import save_config, load_config
 
 CONFIG_PATH = os.getenv("AGENT_CONFIG", "/var/lib/avmonitoring/config.json")
 
+log = get_logger(__name__)
+
 
 # -------------------------------------------------------------------
 # État de synchronisation (thread-safe)
@@ -42,6 +44,9 @@ _sync_status: Dict[str, Any] = {
     "config_updated_at": None,      # ISO UTC
 }
 
+# Abonnés notifiés des changements d'état (UI en push)
+_SYNC_LISTENERS: List[Callable[[], None]] = []
+
 
 def get_sync_status() -> Dict[str, Any]:
     """Retourne l'état de la dernière synchronisation."""
@@ -49,9 +54,20 @@ def get_sync_status() -> Dict[str, Any]:
         return dict(_sync_status)
 
 
+def on_sync_status_change(fn: Callable[[], None]) -> None:
+    """Enregistre fn(), appelée (hors lock) à chaque mise à jour de l'état de sync."""
+    if fn not in _SYNC_LISTENERS:
+        _SYNC_LISTENERS.append(fn)
+
+
 def _set_sync_status(**kwargs: Any) -> None:
     with _sync_lock:
         _sync_status.update(kwargs)
+    for fn in list(_SYNC_LISTENERS):
+        try:
+            fn()
+        except Exception as e:
+            log.warning("sync status listener error", error=str(e), rate_key="sync_listener")
 
 
 def _now_utc() -> datetime:
@@ -133,7 +149,7 @@ def sync_config_from_backend(cfg: Dict[str, Any]) -> bool:
             last_sync_ok=False,
             last_sync_error="missing_backend_url_or_site_token",
         )
-        print("⚠️  Config sync skipped: missing backend_url or site_token")
+        log.warning("config sync skipped: missing backend_url or site_token")
         return False
 
     # Construire l'URL de l'endpoint /config/<token>
@@ -149,7 +165,7 @@ def sync_config_from_backend(cfg: Dict[str, Any]) -> bool:
     config_url = f"{base_url}/config/{site_token}"
 
     try:
-        print(f"🔄 Fetching config from {config_url}...")
+        log.debug("fetching config", url=f"{base_url}/config/***")
         r = requests.get(config_url, timeout=10)
         r.raise_for_status()
         backend_config = r.json()
@@ -166,13 +182,11 @@ def sync_config_from_backend(cfg: Dict[str, Any]) -> bool:
         )
 
         if backend_hash == current_hash:
-            print(f"✅ Config is up-to-date (hash: {current_hash[:8]}...)")
+            log.debug("config up to date", hash=current_hash[:8])
             return False
 
         # Config a changé, on applique
-        print(f"📥 Config changed! Updating from backend...")
-        print(f"   Old hash: {current_hash[:8]}...")
-        print(f"   New hash: {backend_hash[:8]}...")
+        log.info("config changed, updating from backend", old_hash=current_hash[:8], new_hash=backend_hash[:8])
 
         # Construire la nouvelle config locale
         # Préserver backend_url locale si elle est valide, sinon reconstruire depuis base_url
@@ -251,16 +265,16 @@ def sync_config_from_backend(cfg: Dict[str, Any]) -> bool:
             if use_local and local_community and local_community != "none" and local_community.strip():
                 snmp_merged["community"] = local_community.strip()
                 snmp_merged["_community_updated_at"] = local_updated_at
-                print(f"  💾 {ip}: Using local SNMP community (modified {local_updated_at}): {snmp_merged['community']}")
+                log.debug("snmp community: using local", ip=ip, updated_at=local_updated_at)
             elif backend_community and backend_community != "none" and backend_community.strip():
                 snmp_merged["community"] = backend_community.strip()
                 if backend_updated_at:
                     snmp_merged["_community_updated_at"] = backend_updated_at
-                print(f"  📡 {ip}: Using backend SNMP community: {snmp_merged['community']}")
+                log.debug("snmp community: using backend", ip=ip, updated_at=backend_updated_at)
             else:
                 # Aucune valeur valide, fallback sur "public"
                 snmp_merged["community"] = "public"
-                print(f"  ⚠️  {ip}: No valid SNMP community, using default: public")
+                log.debug("snmp community: none valid, using default", ip=ip)
 
             # Fusionner PJLink : backend + préserver password local si modifié récemment
             pjlink_backend = d.get("pjlink") or {}
@@ -287,7 +301,7 @@ def sync_config_from_backend(cfg: Dict[str, Any]) -> bool:
             if use_local_pw and local_password is not None and local_password != "none":
                 pjlink_merged["password"] = local_password
                 pjlink_merged["_password_updated_at"] = local_pw_updated_at
-                print(f"  💾 {ip}: Using local PJLink password (modified {local_pw_updated_at})")
+                log.debug("pjlink password: using local", ip=ip, updated_at=local_pw_updated_at)
             elif backend_password is not None and backend_password != "none":
                 pjlink_merged["password"] = backend_password
                 if backend_pw_updated_at:
@@ -317,7 +331,7 @@ def sync_config_from_backend(cfg: Dict[str, Any]) -> bool:
             current_hash=backend_hash,
         )
 
-        print(f"✅ Config updated successfully! {len(new_config['devices'])} devices configured.")
+        log.info("config updated", devices=len(new_config["devices"]), hash=backend_hash[:8])
         return True
 
     except requests.exceptions.RequestException as e:
@@ -326,8 +340,7 @@ def sync_config_from_backend(cfg: Dict[str, Any]) -> bool:
             last_sync_ok=False,
             last_sync_error=f"request_error: {e.__class__.__name__}: {e}",
         )
-        print(f"⚠️  Config sync failed (network): {e.__class__.__name__}: {e}")
-        print(f"   → Continuing with local config.json")
+        log.warning("config sync failed (network), keeping local config", error=f"{e.__class__.__name__}: {e}")
         return False
 
     except Exception as e:
@@ -336,25 +349,15 @@ def sync_config_from_backend(cfg: Dict[str, Any]) -> bool:
             last_sync_ok=False,
             last_sync_error=f"{e.__class__.__name__}: {e}",
         )
-        print(f"⚠️  Config sync failed: {e.__class__.__name__}: {e}")
-        print(f"   → Continuing with local config.json")
+        log.exception("config sync failed, keeping local config")
         return False
 
 
 # -------------------------------------------------------------------
 # Push de configuration vers le backend
 # -------------------------------------------------------------------
-def push_device_config_to_backend(cfg: Dict[str, Any], device_ip: str) -> bool:
-    """
-    Pousse la configuration driver d'un device vers le backend.
-
-    Args:
-        cfg: Configuration locale complète
-        device_ip: IP du device à synchroniser
-
-    Returns:
-        True si le push a réussi, False sinon
-    """
+def _push_base_url(cfg: Dict[str, Any]) -> Tuple[Optional[str], str]:
+    """(URL de base du backend, site_token) pour les PATCH de config, (None, token) si non configuré."""
     # Support both "backend_url" (new) and "api_url" (legacy)
     backend_url = (cfg.get("backend_url") or "").strip()
     api_url_legacy = (cfg.get("api_url") or "").strip()
@@ -367,45 +370,27 @@ def push_device_config_to_backend(cfg: Dict[str, Any], device_ip: str) -> bool:
     site_token = (cfg.get("site_token") or "").strip()
 
     if not api_url or not site_token:
-        print(f"⚠️  Push config skipped for {device_ip}: missing backend_url or site_token")
-        return False
+        return None, site_token
 
-    # Construire l'URL du PATCH endpoint
     if "/ingest" in api_url:
-        base_url = api_url.replace("/ingest", "")
-    else:
-        from urllib.parse import urlparse
-        parsed = urlparse(api_url)
-        base_url = f"{parsed.scheme}://{parsed.netloc}"
-
-    patch_url = f"{base_url}/config/{site_token}/device/{device_ip}"
+        return api_url.replace("/ingest", ""), site_token
+    from urllib.parse import urlparse
+    parsed = urlparse(api_url)
+    return f"{parsed.scheme}://{parsed.netloc}", site_token
 
-    # Trouver le device dans la config
-    device = None
-    for dev in cfg.get("devices", []):
-        if dev.get("ip") == device_ip:
-            device = dev
-            break
-
-    if not device:
-        print(f"⚠️  Device {device_ip} not found in local config")
-        return False
 
-    # Extraire driver_config avec timestamps
+def _device_push_payload(device: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    {"driver_config": {snmp, pjlink}, "updated_at"} d'un device, None s'il n'a aucun
+    timestamp de modification (rien à pousser).
+    """
     snmp_config = device.get("snmp") or {}
     pjlink_config = device.get("pjlink") or {}
 
-    print(f"🔍 DEBUG push_device_config_to_backend for {device_ip}:")
-    print(f"   snmp_config: {snmp_config}")
-    print(f"   pjlink_config: {pjlink_config}")
-
     # Déterminer le timestamp le plus récent
     snmp_updated_at = snmp_config.get("_community_updated_at") if isinstance(snmp_config, dict) else None
     pjlink_updated_at = pjlink_config.get("_password_updated_at") if isinstance(pjlink_config, dict) else None
 
-    print(f"   snmp_updated_at: {snmp_updated_at}")
-    print(f"   pjlink_updated_at: {pjlink_updated_at}")
-
     # Prendre le plus récent des deux
     updated_at = None
     if snmp_updated_at and pjlink_updated_at:
@@ -415,14 +400,17 @@ def push_device_config_to_backend(cfg: Dict[str, Any], device_ip: str) -> bool:
     elif pjlink_updated_at:
         updated_at = pjlink_updated_at
 
-    print(f"   updated_at final: {updated_at}")
+    log.debug(
+        "push config timestamps",
+        ip=device.get("ip"),
+        snmp_updated_at=snmp_updated_at,
+        pjlink_updated_at=pjlink_updated_at,
+    )
 
     if not updated_at:
-        print(f"⚠️  No timestamp found for {device_ip}, skipping push")
-        return False
+        return None
 
-    # Construire le payload
-    payload = {
+    return {
         "driver_config": {
             "snmp": snmp_config,
             "pjlink": pjlink_config,
@@ -430,83 +418,161 @@ def push_device_config_to_backend(cfg: Dict[str, Any], device_ip: str) -> bool:
         "updated_at": updated_at,
     }
 
+
+def push_device_config_to_backend(cfg: Dict[str, Any], device_ip: str) -> bool:
+    """
+    Pousse la configuration driver d'un device vers le backend.
+
+    Args:
+        cfg: Configuration locale complète
+        device_ip: IP du device à synchroniser
+
+    Returns:
+        True si le push a réussi, False sinon
+    """
+    base_url, site_token = _push_base_url(cfg)
+    if not base_url:
+        log.warning("push config skipped: missing backend_url or site_token", ip=device_ip)
+        return False
+
+    # Construire l'URL du PATCH endpoint
+    patch_url = f"{base_url}/config/{site_token}/device/{device_ip}"
+
+    # Trouver le device dans la config
+    device = None
+    for dev in cfg.get("devices", []):
+        if dev.get("ip") == device_ip:
+            device = dev
+            break
+
+    if not device:
+        log.warning("push config: device not found in local config", ip=device_ip)
+        return False
+
+    payload = _device_push_payload(device)
+    if payload is None:
+        log.info("push config skipped: no timestamp", ip=device_ip)
+        return False
+    updated_at = payload["updated_at"]
+
     try:
-        print(f"🔄 Pushing config for {device_ip} to backend (updated at {updated_at})...")
-        print(f"   URL: {patch_url}")
-        print(f"   Payload: {payload}")
         r = requests.patch(patch_url, json=payload, timeout=10)
-        print(f"   Response status: {r.status_code}")
         if r.status_code != 200:
-            print(f"   Response body: {r.text}")
+            log.warning("push config: unexpected response", ip=device_ip, status=r.status_code, body=r.text[:280])
         r.raise_for_status()
         result = r.json()
 
         if result.get("ok"):
-            print(f"✅ Config pushed successfully for {device_ip}")
+            log.info("config pushed", ip=device_ip, updated_at=updated_at)
             return True
         else:
             reason = result.get("reason", "unknown")
             if reason == "backend_version_newer":
-                print(f"ℹ️  Backend has newer version for {device_ip}, local change rejected")
+                log.info("push rejected: backend has newer version", ip=device_ip)
             else:
-                print(f"⚠️  Push rejected for {device_ip}: {reason}")
+                log.warning("push rejected", ip=device_ip, reason=reason)
             return False
 
     except requests.exceptions.RequestException as e:
-        print(f"⚠️  Push failed for {device_ip} (network): {e.__class__.__name__}: {e}")
+        log.warning("push failed (network)", ip=device_ip, error=f"{e.__class__.__name__}: {e}")
         return False
 
-    except Exception as e:
-        print(f"⚠️  Push failed for {device_ip}: {e.__class__.__name__}: {e}")
+    except Exception:
+        log.exception("push failed", ip=device_ip)
         return False
 
 
+def push_devices_config_to_backend(cfg: Dict[str, Any], device_ips: Iterable[str]) -> Dict[str, bool]:
+    """
+    Pousse la configuration driver de plusieurs devices en une requête
+    (PATCH /config/{token}/devices). Backend sans cet endpoint: un PATCH par device.
+
+    Returns:
+        {ip: True si accepté} pour les devices qui avaient quelque chose à pousser
+    """
+    base_url, site_token = _push_base_url(cfg)
+    if not base_url:
+        log.warning("bulk push skipped: missing backend_url or site_token")
+        return {}
+
+    by_ip = {dev.get("ip"): dev for dev in cfg.get("devices", []) if isinstance(dev, dict)}
+    items: List[Dict[str, Any]] = []
+    for ip in dict.fromkeys(device_ips):
+        device = by_ip.get(ip)
+        payload = _device_push_payload(device) if device else None
+        if payload is not None:
+            items.append({"ip": ip, **payload})
+    if not items:
+        return {}
+
+    try:
+        r = requests.patch(f"{base_url}/config/{site_token}/devices", json={"devices": items}, timeout=30)
+        unsupported = r.status_code == 405 or (
+            r.status_code == 404 and r.headers.get("content-type", "").startswith("application/json")
+            and r.json().get("detail") == "Not Found"
+        )
+        if unsupported:
+            log.info("bulk push endpoint unavailable, pushing per device", devices=len(items))
+            return {item["ip"]: push_device_config_to_backend(cfg, item["ip"]) for item in items}
+        if r.status_code != 200:
+            log.warning("bulk push: unexpected response", status=r.status_code, body=r.text[:280])
+        r.raise_for_status()
+        results = {str(res.get("ip")): bool(res.get("ok")) for res in r.json().get("results") or []}
+        rejected = [ip for ip, ok in results.items() if not ok]
+        log.info("config pushed (bulk)", devices=len(items), rejected=len(rejected))
+        return results
+
+    except requests.exceptions.RequestException as e:
+        log.warning("bulk push failed (network)", devices=len(items), error=f"{e.__class__.__name__}: {e}")
+        return {item["ip"]: False for item in items}
+
+    except Exception:
+        log.exception("bulk push failed", devices=len(items))
+        return {item["ip"]: False for item in items}
+
+
 # -------------------------------------------------------------------
 # Loop de synchronisation périodique
 # -------------------------------------------------------------------
-def run_sync_loop(stop_flag: Dict[str, bool], interval_minutes: int = 5) -> None:
+def run_sync_loop(stop_flag: threading.Event, interval_minutes: int = 5) -> None:
     """
     Boucle de synchronisation qui s'exécute toutes les N minutes.
 
     Args:
-        stop_flag: dictionnaire avec clé "stop" pour arrêter la boucle
+        stop_flag: Event positionné pour arrêter la boucle (effet immédiat)
         interval_minutes: fréquence de synchronisation en minutes
     """
     interval_seconds = interval_minutes * 60
 
-    print(f"🚀 Config sync loop started (interval: {interval_minutes} min)")
+    log.info("config sync loop started", interval_min=interval_minutes)
 
     # Première sync immédiate au démarrage (après 10 secondes)
-    time.sleep(10)
+    if stop_flag.wait(10):
+        log.info("config sync loop stopped")
+        return
 
     while True:
-        if stop_flag.get("stop"):
-            print("🛑 Config sync loop stopped")
-            break
-
         try:
             cfg = load_config(CONFIG_PATH)
             updated = sync_config_from_backend(cfg)
 
-            # Si la config a été mise à jour, on peut déclencher un reload
-            # du collector (optionnel, le collector rechargera au prochain cycle)
+            # save_config() notifie le collector: cycle immédiat avec la nouvelle config
             if updated:
-                print("📢 Config updated, collector will reload on next cycle")
+                log.info("config updated, collector notified")
 
-        except Exception as e:
-            print(f"⚠️  Error in sync loop: {e.__class__.__name__}: {e}")
+        except Exception:
+            log.exception("error in sync loop")
 
-        # Attendre avant la prochaine sync
-        for _ in range(interval_seconds):
-            if stop_flag.get("stop"):
-                break
-            time.sleep(1)
+        # Attendre avant la prochaine sync (interrompu dès l'arrêt)
+        if stop_flag.wait(interval_seconds):
+            log.info("config sync loop stopped")
+            break
 
 
 # -------------------------------------------------------------------
 # Démarrage du thread de sync
 # -------------------------------------------------------------------
-def start_sync_thread(interval_minutes: int = 5) -> tuple[threading.Thread, Dict[str, bool]]:
+def start_sync_thread(interval_minutes: int = 5) -> tuple[threading.Thread, threading.Event]:
     """
     Démarre le thread de synchronisation périodique.
 
@@ -514,9 +580,9 @@ def start_sync_thread(interval_minutes: int = 5) -> tuple[threading.Thread, Dict
         interval_minutes: fréquence de synchronisation en minutes
 
     Returns:
-        (thread, stop_flag): le thread et le flag pour l'arrêter
+        (thread, stop_flag): le thread et l'Event pour l'arrêter (stop_flag.set())
     """
-    stop_flag = {"stop": False}
+    stop_flag = threading.Event()
     thread = threading.Thread(
         target=run_sync_loop,
         args=(stop_flag, interval_minutes),
@@ -0,0 +1,542 @@
+# agent/src/discovery.py
+"""
+Découverte des équipements AV d'un ou plusieurs sous-réseaux (onboarding d'un bâtiment).
+
+Une boucle asyncio, trois sondes en parallèle sur tous les hôtes:
+- ICMP echo in-process: un seul socket pour tout le balayage (socket "ping" non
+  privilégié si net.ipv4.ping_group_range l'autorise, sinon raw en root, sinon ignoré)
+- SNMP v2c GET sysDescr/sysObjectID/sysName: un seul socket UDP, PDU encodés par
+  drivers/snmp_ber (pas d'engine pysnmp par hôte), une requête par community candidate
+- PJLink (TCP 4352): bannière, puis INF1/INF2/NAME/CLSS si pas d'authentification
+  (ou mot de passe fourni)
+
+Les envois partagent un limiteur de débit (AVMVP_DISCOVERY_RATE paquets/s, défaut 2000),
+les connexions TCP simultanées sont bornées (AVMVP_DISCOVERY_CONCURRENCY, défaut 256):
+un /22 (1022 hôtes) est balayé en quelques secondes. Au-delà de AVMVP_DISCOVERY_MAX_HOSTS
+(défaut 4096, un /20) la plage est refusée.
+
+Chaque hôte qui répond donne une proposition de device au format config.json
+(driver pjlink > snmp > ping, bloc driver pré-rempli, type deviné), à valider dans l'UI.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import ipaddress
+import os
+import random
+import socket
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from src.drivers import snmp_ber as ber
+from src.logs import get_logger
+
+log = get_logger(__name__)
+
+SYS_DESCR_OID = "1.3.6.1.2.1.1.1.0"
+SYS_OBJECT_ID_OID = "1.3.6.1.2.1.1.2.0"
+SYS_NAME_OID = "1.3.6.1.2.1.1.5.0"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+RATE_PER_S = max(1, _env_int("AVMVP_DISCOVERY_RATE", 2000))
+TCP_CONCURRENCY = max(1, _env_int("AVMVP_DISCOVERY_CONCURRENCY", 256))
+MAX_HOSTS = max(1, _env_int("AVMVP_DISCOVERY_MAX_HOSTS", 4096))
+
+# Type deviné à partir de sysDescr / fabricant et modèle PJLink (premier motif trouvé)
+FINGERPRINTS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("projector", ("projector", "projecteur", "epson", "optoma", "benq", "christie", "barco", "vivitek", "infocus")),
+    ("display", ("display", "monitor", "signage", "samsung", "lg electronics", "bravia", "iiyama", "philips")),
+    ("control", ("crestron", "extron", "amx", "kramer", "control processor")),
+    ("audio", ("biamp", "q-sys", "qsc", "shure", "audinate", "dante", "sennheiser", "bose", "dsp")),
+    ("camera", ("camera", "ptz", "axis", "vaddio", "lumens", "aver")),
+    ("switch", ("switch", "cisco ios", "catalyst", "procurve", "aruba", "netgear", "routeros")),
+    ("printer", ("printer", "laserjet", "ricoh", "xerox", "kyocera")),
+)
+
+_PJLINK_QUERIES = (("INF1", "manufacturer"), ("INF2", "model"), ("NAME", "name"), ("CLSS", "class"))
+
+
+def _now_utc_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+# -------------------------------------------------------------------
+# Cibles
+# -------------------------------------------------------------------
+def expand_targets(targets: Iterable[str], max_hosts: int = MAX_HOSTS) -> List[str]:
+    """
+    "10.0.0.0/22", "10.0.1.10-10.0.1.50" (ou "10.0.1.10-50"), "10.0.2.7",
+    séparés par virgules, espaces ou lignes -> IPv4 uniques, dans l'ordre.
+    ValueError si une cible est invalide ou si le total dépasse max_hosts.
+    """
+    out: List[str] = []
+    seen: Set[str] = set()
+
+    def _add(addrs: Iterable[ipaddress.IPv4Address], count: int) -> None:
+        if len(out) + count > max_hosts:
+            raise ValueError(f"too many hosts (max {max_hosts})")
+        for addr in addrs:
+            ip = str(addr)
+            if ip not in seen:
+                seen.add(ip)
+                out.append(ip)
+
+    for raw in targets:
+        for token in (raw or "").replace(",", " ").split():
+            if "-" in token:
+                first, last = token.split("-", 1)
+                if "." not in last:
+                    last = first.rsplit(".", 1)[0] + "." + last
+                start, end = ipaddress.IPv4Address(first), ipaddress.IPv4Address(last)
+                if end < start:
+                    raise ValueError(f"invalid range: {token}")
+                count = int(end) - int(start) + 1
+                _add((start + i for i in range(count)), count)
+            else:
+                net = ipaddress.ip_network(token, strict=False)
+                if net.version != 4:
+                    raise ValueError(f"IPv4 only: {token}")
+                _add(net.hosts(), max(1, net.num_addresses - 2) if net.prefixlen < 31 else net.num_addresses)
+    return out
+
+
+# -------------------------------------------------------------------
+# Débit
+# -------------------------------------------------------------------
+class _Pacer:
+    """Limiteur de débit partagé par toutes les sondes (paquets ou connexions par seconde)."""
+
+    def __init__(self, rate_per_s: float) -> None:
+        self.interval = 1.0 / max(1.0, rate_per_s)
+        self._next = 0.0
+
+    async def wait(self) -> None:
+        now = asyncio.get_running_loop().time()
+        if self._next < now:
+            self._next = now
+        delay = self._next - now
+        self._next += self.interval
+        # Rafales de quelques ms tolérées: un sleep par paquet coûterait plus que l'envoi
+        if delay > 0.005:
+            await asyncio.sleep(delay)
+
+
+async def _wait_until(done: Callable[[], bool], timeout_s: float) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout_s
+    while not done():
+        remaining = deadline - asyncio.get_running_loop().time()
+        if remaining <= 0:
+            return
+        await asyncio.sleep(min(0.05, remaining))
+
+
+def _sendto(sock: socket.socket, data: bytes, addr: Tuple[str, int]) -> None:
+    try:
+        sock.sendto(data, addr)
+    except BlockingIOError:
+        # Tampon d'émission plein: l'hôte sera retenté à la passe suivante
+        pass
+    except OSError:
+        # Réseau injoignable, adresse de broadcast refusée, ...
+        pass
+
+
+# -------------------------------------------------------------------
+# ICMP
+# -------------------------------------------------------------------
+def _icmp_checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _icmp_echo(ident: int, seq: int) -> bytes:
+    payload = b"avmvp-discovery"
+    header = struct.pack("!BBHHH", 8, 0, 0, ident, seq)
+    return struct.pack("!BBHHH", 8, 0, _icmp_checksum(header + payload), ident, seq) + payload
+
+
+def _open_icmp_socket() -> Tuple[Optional[socket.socket], str]:
+    """(socket non bloquant, "dgram"|"raw") ou (None, "unavailable")."""
+    for kind, mode in ((socket.SOCK_DGRAM, "dgram"), (socket.SOCK_RAW, "raw")):
+        try:
+            sock = socket.socket(socket.AF_INET, kind, socket.IPPROTO_ICMP)
+        except OSError:
+            continue
+        sock.setblocking(False)
+        return sock, mode
+    return None, "unavailable"
+
+
+async def _icmp_sweep(hosts: List[str], pacer: _Pacer, timeout_s: float, retries: int) -> Tuple[Dict[str, float], str]:
+    """Echo ICMP vers tous les hôtes. Retour: ({ip: rtt_ms}, mode)."""
+    sock, mode = _open_icmp_socket()
+    if sock is None:
+        return {}, mode
+
+    loop = asyncio.get_running_loop()
+    ident = random.randint(1, 0xFFFF)
+    sent_at: Dict[str, float] = {}
+    alive: Dict[str, float] = {}
+
+    def _drain() -> None:
+        while True:
+            try:
+                data, addr = sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            if mode == "raw":
+                # Socket raw: en-tête IP inclus et tout le trafic ICMP de la machine
+                data = data[(data[0] & 0x0F) * 4:]
+                if len(data) >= 8 and struct.unpack("!H", data[4:6])[0] != ident:
+                    continue
+            # Echo reply (type 0); en mode dgram le noyau filtre sur l'identifiant
+            if len(data) < 8 or data[0] != 0:
+                continue
+            ip = addr[0]
+            if ip in sent_at and ip not in alive:
+                alive[ip] = round((loop.time() - sent_at[ip]) * 1000.0, 2)
+
+    loop.add_reader(sock.fileno(), _drain)
+    try:
+        for _ in range(max(0, retries) + 1):
+            todo = [ip for ip in hosts if ip not in alive]
+            if not todo:
+                break
+            for seq, ip in enumerate(todo):
+                await pacer.wait()
+                sent_at[ip] = loop.time()
+                _sendto(sock, _icmp_echo(ident, seq & 0xFFFF), (ip, 0))
+            await _wait_until(lambda: len(alive) >= len(hosts), timeout_s)
+    finally:
+        loop.remove_reader(sock.fileno())
+        sock.close()
+    return alive, mode
+
+
+# -------------------------------------------------------------------
+# SNMP
+# -------------------------------------------------------------------
+def _text(value: Any) -> str:
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace").replace("\x00", "").strip()
+    if isinstance(value, tuple):
+        # (OID, "1.3.6...") pour sysObjectID, (tag, None) pour noSuchObject
+        return "" if value[1] is None else str(value[1])
+    return "" if value is None else str(value).strip()
+
+
+async def _snmp_sweep(
+    hosts: List[str],
+    communities: List[str],
+    port: int,
+    pacer: _Pacer,
+    timeout_s: float,
+    retries: int,
+) -> Dict[str, Dict[str, Any]]:
+    """GET system (v2c) vers tous les hôtes, pour chaque community. Retour: {ip: infos}."""
+    loop = asyncio.get_running_loop()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    sock.bind(("0.0.0.0", 0))
+
+    varbinds: List[Tuple[str, Any]] = [(SYS_DESCR_OID, None), (SYS_OBJECT_ID_OID, None), (SYS_NAME_OID, None)]
+    base_id = random.randint(1, 1 << 28)
+    pending: Dict[int, Tuple[str, str]] = {}
+    found: Dict[str, Dict[str, Any]] = {}
+
+    def _drain() -> None:
+        while True:
+            try:
+                data, addr = sock.recvfrom(65535)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            try:
+                _, _, pdu, rid, error_status, _, values = ber.decode_message(data)
+            except (ber.BERError, IndexError, UnicodeDecodeError):
+                continue
+            target = pending.get(rid)
+            if pdu != ber.GET_RESPONSE or target is None or target[0] != addr[0] or target[0] in found:
+                continue
+            ip, community = target
+            by_oid = dict(values) if not error_status else {}
+            found[ip] = {
+                "community": community,
+                "sys_descr": _text(by_oid.get(SYS_DESCR_OID))[:255],
+                "sys_object_id": _text(by_oid.get(SYS_OBJECT_ID_OID)),
+                "sys_name": _text(by_oid.get(SYS_NAME_OID))[:64],
+            }
+
+    loop.add_reader(sock.fileno(), _drain)
+    try:
+        for _ in range(max(0, retries) + 1):
+            todo = [ip for ip in hosts if ip not in found]
+            if not todo:
+                break
+            for ip in todo:
+                for community in communities:
+                    await pacer.wait()
+                    rid = base_id + len(pending)
+                    pending[rid] = (ip, community)
+                    msg = ber.encode_message(1, community, ber.GET_REQUEST, rid, 0, 0, varbinds)
+                    _sendto(sock, msg, (ip, port))
+            await _wait_until(lambda: len(found) >= len(hosts), timeout_s)
+    finally:
+        loop.remove_reader(sock.fileno())
+        sock.close()
+    return found
+
+
+# -------------------------------------------------------------------
+# PJLink
+# -------------------------------------------------------------------
+async def _pjlink_probe(
+    ip: str,
+    port: int,
+    password: str,
+    timeout_s: float,
+    pacer: _Pacer,
+    sem: asyncio.Semaphore,
+) -> Optional[Dict[str, Any]]:
+    """Bannière PJLink + identification. None si le port est fermé ou ne parle pas PJLink."""
+    async with sem:
+        await pacer.wait()
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout_s)
+        except (OSError, asyncio.TimeoutError):
+            return None
+
+        info: Dict[str, Any] = {"auth": False}
+        try:
+            banner = (await asyncio.wait_for(reader.readuntil(b"\r"), timeout_s)).decode("ascii", "ignore").strip()
+            parts = banner.split()
+            if len(parts) < 2 or parts[0].upper() != "PJLINK" or parts[1] not in ("0", "1"):
+                return None
+            prefix = ""
+            if parts[1] == "1":
+                info["auth"] = True
+                if not password or len(parts) < 3:
+                    return info
+                # Digest exigé sur la première commande seulement
+                prefix = hashlib.md5((parts[2] + password).encode("ascii", "ignore")).hexdigest()
+
+            for cmd, key in _PJLINK_QUERIES:
+                writer.write(f"{prefix}%1{cmd} ?\r".encode("ascii"))
+                prefix = ""
+                await writer.drain()
+                line = (await asyncio.wait_for(reader.readuntil(b"\r"), timeout_s)).decode("utf-8", "replace").strip()
+                if line.upper().startswith("PJLINK ERRA"):
+                    info["auth_failed"] = True
+                    break
+                value = line.split("=", 1)[1].strip() if "=" in line else ""
+                if value and not value.upper().startswith("ERR"):
+                    info[key] = value[:64]
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+        return info
+
+
+# -------------------------------------------------------------------
+# Propositions
+# -------------------------------------------------------------------
+def fingerprint(*texts: str) -> str:
+    """Type d'équipement deviné (FINGERPRINTS) à partir de sysDescr, fabricant, modèle..."""
+    text = " ".join(t for t in texts if t).lower()
+    for device_type, patterns in FINGERPRINTS:
+        if any(p in text for p in patterns):
+            return device_type
+    return "unknown"
+
+
+def propose_device(
+    ip: str,
+    rtt_ms: Optional[float],
+    snmp: Optional[Dict[str, Any]],
+    pjlink: Optional[Dict[str, Any]],
+    snmp_port: int = 161,
+    pjlink_port: int = 4352,
+    pjlink_password: str = "",
+) -> Dict[str, Any]:
+    """Proposition pour un hôte: indices collectés + device au format config.json."""
+    snmp = snmp or {}
+    pj = pjlink or {}
+    device_type = fingerprint(snmp.get("sys_descr", ""), pj.get("manufacturer", ""), pj.get("model", ""))
+
+    device: Dict[str, Any] = {
+        "ip": ip,
+        "name": pj.get("name") or snmp.get("sys_name") or "",
+        "type": device_type,
+        "driver": "ping",
+        "snmp": {},
+        "pjlink": {},
+    }
+    if pjlink is not None:
+        # PJLink = vidéoprojecteur (ou écran): état alimentation/lampe/erreurs, plus riche que SNMP
+        device["driver"] = "pjlink"
+        device["type"] = device_type if device_type in ("projector", "display") else "projector"
+        device["pjlink"] = {"password": pjlink_password if pj.get("auth") else "", "port": pjlink_port, "timeout_s": 2}
+    elif snmp:
+        device["driver"] = "snmp"
+        device["snmp"] = {"community": snmp["community"], "port": snmp_port, "timeout_s": 1, "retries": 1}
+
+    return {
+        "ip": ip,
+        "icmp": rtt_ms is not None,
+        "rtt_ms": rtt_ms,
+        "snmp": snmp or None,
+        "pjlink": pjlink,
+        "device": device,
+    }
+
+
+def _ip_key(ip: str) -> int:
+    return int(ipaddress.IPv4Address(ip))
+
+
+async def discover_async(
+    hosts: List[str],
+    communities: Iterable[str] = ("public",),
+    snmp_port: int = 161,
+    pjlink_port: int = 4352,
+    pjlink_password: str = "",
+    timeout_s: float = 1.0,
+    retries: int = 1,
+    rate_per_s: int = RATE_PER_S,
+    concurrency: int = TCP_CONCURRENCY,
+    icmp: bool = True,
+) -> Dict[str, Any]:
+    """
+    Balaye hosts (voir expand_targets) et retourne:
+    {"hosts", "responding", "duration_s", "icmp": "dgram"|"raw"|"unavailable"|"disabled",
+     "proposals": [propose_device(...), ...]} (triées par IP)
+    """
+    loop = asyncio.get_running_loop()
+    t0 = loop.time()
+    communities = [c for c in dict.fromkeys(c.strip() for c in communities) if c] or ["public"]
+    pacer = _Pacer(rate_per_s)
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def _pjlink_all() -> Dict[str, Dict[str, Any]]:
+        results = await asyncio.gather(
+            *[_pjlink_probe(ip, pjlink_port, pjlink_password, max(timeout_s, 1.0), pacer, sem) for ip in hosts]
+        )
+        return {ip: info for ip, info in zip(hosts, results) if info is not None}
+
+    async def _no_icmp() -> Tuple[Dict[str, float], str]:
+        return {}, "disabled"
+
+    (alive, icmp_mode), snmp_found, pjlink_found = await asyncio.gather(
+        _icmp_sweep(hosts, pacer, timeout_s, retries) if icmp else _no_icmp(),
+        _snmp_sweep(hosts, communities, snmp_port, pacer, timeout_s, retries),
+        _pjlink_all(),
+    )
+
+    responding = sorted(set(alive) | set(snmp_found) | set(pjlink_found), key=_ip_key)
+    proposals = [
+        propose_device(
+            ip, alive.get(ip), snmp_found.get(ip), pjlink_found.get(ip),
+            snmp_port=snmp_port, pjlink_port=pjlink_port, pjlink_password=pjlink_password,
+        )
+        for ip in responding
+    ]
+    return {
+        "hosts": len(hosts),
+        "responding": len(responding),
+        "duration_s": round(loop.time() - t0, 2),
+        "icmp": icmp_mode,
+        "proposals": proposals,
+    }
+
+
+def discover(hosts: List[str], **options: Any) -> Dict[str, Any]:
+    """Version synchrone de discover_async (boucle asyncio dédiée)."""
+    return asyncio.run(discover_async(hosts, **options))
+
+
+# -------------------------------------------------------------------
+# Découverte en arrière-plan (webapp)
+# -------------------------------------------------------------------
+_lock = threading.Lock()
+_state: Dict[str, Any] = {
+    "running": False,
+    "targets": "",
+    "started_at": None,     # ISO UTC
+    "finished_at": None,    # ISO UTC
+    "error": None,          # str|None
+    "result": None,         # retour de discover_async (dernier balayage)
+}
+
+
+def get_discovery_state() -> Dict[str, Any]:
+    # copie défensive (result n'est plus modifié une fois publié)
+    with _lock:
+        return dict(_state)
+
+
+def start_discovery(targets: str, known_ips: Optional[Set[str]] = None, **options: Any) -> Optional[str]:
+    """
+    Lance un balayage dans un thread. Retourne None, ou la raison du refus
+    (balayage déjà en cours, cibles invalides). known_ips: devices déjà configurés
+    (marqués "configured" dans les propositions).
+    """
+    try:
+        hosts = expand_targets([targets])
+        if not hosts:
+            raise ValueError("no hosts")
+    except ValueError as e:
+        with _lock:
+            if not _state["running"]:
+                _state.update(targets=targets, error=str(e))
+        return str(e)
+
+    with _lock:
+        if _state["running"]:
+            return "discovery already running"
+        _state.update(running=True, targets=targets, started_at=_now_utc_iso(), finished_at=None, error=None)
+
+    def _run() -> None:
+        result: Optional[Dict[str, Any]] = None
+        error: Optional[str] = None
+        t0 = time.monotonic()
+        try:
+            result = discover(hosts, **options)
+            for proposal in result["proposals"]:
+                proposal["configured"] = proposal["ip"] in (known_ips or set())
+            log.info(
+                "discovery done",
+                targets=targets,
+                hosts=result["hosts"],
+                responding=result["responding"],
+                duration_s=round(time.monotonic() - t0, 2),
+                icmp=result["icmp"],
+            )
+        except Exception as e:
+            error = f"{e.__class__.__name__}: {e}"
+            log.warning("discovery failed", targets=targets, error=error)
+        with _lock:
+            _state.update(running=False, finished_at=_now_utc_iso(), error=error)
+            if result is not None:
+                _state["result"] = result
+
+    threading.Thread(target=_run, name="discovery", daemon=True).start()
+    return None
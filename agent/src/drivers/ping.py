@@ -111,6 +111,25 @@ def probe(device: Dict[str, Any]) -> Dict[str, Any]:
     return {"status": "offline", "detail": detail or "ping failed", "metrics": metrics}
 
 
+def reachable_result(device: Dict[str, Any], via: str) -> Dict[str, Any]:
+    """
+    Résultat ping d'un équipement qui a déjà répondu en ligne à un autre driver
+    (SNMP, PJLink) dans le cycle: joignable, sans nouvel ICMP.
+    """
+    ping_cfg = device.get("ping") if isinstance(device.get("ping"), dict) else {}
+    return {
+        "status": "online",
+        "detail": None,
+        "metrics": {
+            "ts": _now_utc_iso(),
+            "ping_ok": True,
+            "ping_timeout_s": _safe_int(ping_cfg.get("timeout_s"), 1),
+            "ping_count": 0,
+            "reachable_via": via,
+        },
+    }
+
+
 # -------------------------------------------------------------------
 # Compatibilité backward
 # -------------------------------------------------------------------
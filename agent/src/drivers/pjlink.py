@@ -1,9 +1,52 @@
 # agent/src/drivers/pjlink.py
+"""
+Driver PJLink (TCP 4352).
+
+- PJLinkSession: lecture bufferisée (recv par blocs, découpage sur \\r),
+  handshake/auth MD5 une seule fois par connexion.
+- Connexions réutilisées d'un probe à l'autre tant que le projecteur les garde
+  ouvertes (pjlink.keepalive_s, la plupart ferment après 30 s d'inactivité).
+  Avec le défaut (25 s) et des cycles de 60/300 s, la réutilisation ne joue
+  qu'entre probes rapprochés (micro-rapports, interface), pas d'un cycle à l'autre.
+- Requêtes pipelinées: POWR/ERST/LAMP/INPT en un seul envoi, puis FILT
+  (classe 2) sur la même connexion; l'identité (INF1/INF2/CLSS/SVER) est
+  rafraîchie toutes les heures. Repli en séquentiel si le projecteur ne
+  répond qu'aux commandes une à une (pipelining réessayé après NO_PIPELINE_RETRY_S).
+- Limite de débit par device (pjlink.min_interval_s): un probe trop rapproché
+  renvoie le dernier résultat sans solliciter le projecteur.
+"""
 from __future__ import annotations
 
+import hashlib
+import select
 import socket
+import threading
+import time
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+
+from src import rtt
+
+DEFAULT_KEEPALIVE_S = 25.0
+DEFAULT_MIN_INTERVAL_S = 1.0
+MAX_POOLED_SESSIONS = 256
+# Plancher du timeout adaptatif (projecteurs lents à répondre même en LAN)
+PJLINK_MIN_TIMEOUT_S = 0.5
+
+# Requêtes envoyées à chaque probe (POWR en premier: seule indispensable)
+CLASS1_QUERIES = ("POWR", "ERST", "LAMP", "INPT")
+CLASS2_QUERIES = ("FILT",)
+# Identité (fixe): redemandée toutes les INFO_REFRESH_S seulement
+CLASS1_INFO_QUERIES = ("INF1", "INF2", "CLSS")
+CLASS2_INFO_QUERIES = ("SVER",)
+INFO_REFRESH_S = 3600.0
+# Repli séquentiel après un échec du pipelining: réessayé au-delà (projecteur en
+# préchauffage, réseau chargé: un timeout isolé ne le déclasse pas définitivement)
+NO_PIPELINE_RETRY_S = 1800.0
+
+POWER_LABELS = {0: "off", 1: "on", 2: "cooling", 3: "warmup"}
+ERST_FIELDS = ("fan", "lamp", "temperature", "cover", "filter", "other")
+ERST_LABELS = {"0": "ok", "1": "warning", "2": "error"}
 
 
 def _now_utc_iso() -> str:
@@ -21,81 +64,230 @@ def _safe_int(x: Any, default: int) -> int:
         return default
 
 
-def _recv_line(sock: socket.socket, max_bytes: int = 4096) -> str:
-    """
-    PJLink parle en lignes ASCII finissant par \\r.
-    """
-    data = b""
-    while len(data) < max_bytes:
-        chunk = sock.recv(1)
-        if not chunk:
-            break
-        data += chunk
-        if chunk == b"\r":
-            break
+def _safe_float(x: Any, default: float) -> float:
     try:
-        return data.decode("ascii", errors="ignore").strip()
+        return float(str(x).strip())
     except Exception:
-        return ""
-
+        return default
 
-def _send_line(sock: socket.socket, line: str) -> None:
-    if not line.endswith("\r"):
-        line = line + "\r"
-    sock.sendall(line.encode("ascii", errors="ignore"))
 
+class PJLinkError(Exception):
+    pass
 
-def _pjlink_handshake(sock: socket.socket, password: str) -> Tuple[bool, Optional[str], Optional[str]]:
-    """
-    Retourne (ok, auth_used, error)
 
-    Serveur renvoie typiquement:
-      - "PJLINK 0" => pas d'auth
-      - "PJLINK 1 <salt>" => auth MD5(salt+password) à préfixer à la commande
-    """
-    hello = _recv_line(sock)
-    if not hello.startswith("PJLINK"):
-        return False, None, f"invalid handshake: {hello or 'empty'}"
-
-    parts = hello.split()
-    if len(parts) < 2:
-        return False, None, f"invalid handshake: {hello}"
-
-    mode = parts[1].strip()
-    if mode == "0":
-        return True, "none", None
-
-    if mode == "1":
-        # auth required
-        if len(parts) < 3:
-            return False, None, f"auth required but no salt: {hello}"
-        salt = parts[2].strip()
-        if not password:
-            return False, None, "auth required but password missing"
-        try:
-            import hashlib
+class PJLinkAuthError(PJLinkError):
+    pass
 
-            token = hashlib.md5((salt + password).encode("ascii", errors="ignore")).hexdigest()
-            return True, "md5", token
-        except Exception as e:
-            return False, None, f"auth md5 failed: {e}"
 
-    return False, None, f"unsupported auth mode: {hello}"
+def endpoint(device: Dict[str, Any]) -> Tuple[str, int]:
+    """(ip, port) PJLink d'un device: clé de l'état par équipement (session, RTT)."""
+    return (device.get("ip") or "").strip(), _safe_int(_as_dict(device.get("pjlink")).get("port"), 4352)
 
 
-def _pjlink_cmd(sock: socket.socket, cmd: str, auth_prefix: Optional[str]) -> str:
+# -------------------------------------------------------------------
+# Session
+# -------------------------------------------------------------------
+class PJLinkSession:
     """
-    Envoie une commande PJLink et lit la réponse.
-    Si auth_prefix est un hex MD5, on préfixe: <md5><cmd>
+    Connexion PJLink authentifiée.
+
+    PJLink parle en lignes ASCII finissant par \\r; le digest MD5 n'est exigé
+    que sur la première commande de la connexion.
     """
-    if auth_prefix and auth_prefix != "none":
-        line = f"{auth_prefix}{cmd}"
-    else:
-        line = cmd
-    _send_line(sock, line)
-    return _recv_line(sock)
+
+    def __init__(self, ip: str, port: int, password: str, timeout_s: float) -> None:
+        self.ip = ip
+        self.port = port
+        self.password = password
+        self.timeout_s = timeout_s
+        self.sock: Optional[socket.socket] = None
+        self.auth: Optional[str] = None  # "none" | "md5"
+        self._digest: Optional[str] = None
+        self._buf = b""
+        self.last_used = 0.0
+        self.pipeline = True
+        # Durée envoi -> première réponse de la dernière requête (estimateur RTT)
+        self.last_rtt_s: Optional[float] = None
+
+    # ---------------- I/O
+    def connect(self) -> None:
+        self.sock = socket.create_connection((self.ip, self.port), timeout=self.timeout_s)
+        self.sock.settimeout(self.timeout_s)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._buf = b""
+        self._handshake()
+        self.last_used = time.monotonic()
+
+    def close(self) -> None:
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except Exception:
+                pass
+        self.sock = None
+        self._buf = b""
+
+    def alive(self) -> bool:
+        """Socket encore ouverte côté projecteur (pas de FIN/RST en attente)."""
+        if self.sock is None:
+            return False
+        try:
+            readable, _, _ = select.select([self.sock], [], [], 0)
+            # Lisible sans requête en cours: fermeture (b"") ou données parasites => on jette
+            return not readable and not self._buf
+        except Exception:
+            return False
+
+    def _recv_line(self, max_bytes: int = 4096) -> str:
+        assert self.sock is not None
+        while b"\r" not in self._buf:
+            if len(self._buf) >= max_bytes:
+                break
+            chunk = self.sock.recv(4096)
+            if not chunk:
+                raise PJLinkError("connection closed by projector")
+            self._buf += chunk
+        line, sep, rest = self._buf.partition(b"\r")
+        self._buf = rest
+        return line.decode("ascii", errors="ignore").strip()
+
+    def _send(self, lines: List[str]) -> None:
+        assert self.sock is not None
+        self.sock.sendall("".join(line + "\r" for line in lines).encode("ascii", errors="ignore"))
+
+    def _handshake(self) -> None:
+        """
+        Serveur:
+          - "PJLINK 0" => pas d'auth
+          - "PJLINK 1 <salt>" => MD5(salt+password) à préfixer à la première commande
+        """
+        hello = self._recv_line()
+        parts = hello.split()
+        if len(parts) < 2 or parts[0] != "PJLINK":
+            raise PJLinkError(f"invalid handshake: {hello or 'empty'}")
+        if parts[1] == "ERRA":
+            raise PJLinkAuthError("auth error (ERRA)")
+        if parts[1] == "0":
+            self.auth, self._digest = "none", None
+            return
+        if parts[1] == "1":
+            if len(parts) < 3:
+                raise PJLinkError(f"auth required but no salt: {hello}")
+            if not self.password:
+                raise PJLinkAuthError("auth required but password missing")
+            self.auth = "md5"
+            self._digest = hashlib.md5((parts[2] + self.password).encode("ascii", errors="ignore")).hexdigest()
+            return
+        raise PJLinkError(f"unsupported auth mode: {hello}")
+
+    # ---------------- Requêtes
+    def query(self, commands: List[str]) -> Dict[str, str]:
+        """
+        Envoie des commandes ("%1POWR ?", ...) et renvoie {"%1POWR": "1", ...}.
+        Pipeline: tout part en un envoi, les réponses sont appariées par leur en-tête.
+        """
+        if self.sock is None:
+            raise PJLinkError("session not connected")
+        lines = list(commands)
+        if self._digest:
+            lines[0] = self._digest + lines[0]
+            self._digest = None
+
+        answers: Dict[str, str] = {}
+        t0 = time.perf_counter()
+        if self.pipeline:
+            self._send(lines)
+            for i in range(len(lines)):
+                self._store(self._recv_line(), answers)
+                if i == 0:
+                    self.last_rtt_s = time.perf_counter() - t0
+        else:
+            for i, line in enumerate(lines):
+                self._send([line])
+                self._store(self._recv_line(), answers)
+                if i == 0:
+                    self.last_rtt_s = time.perf_counter() - t0
+        self.last_used = time.monotonic()
+        return answers
+
+    @staticmethod
+    def _store(resp: str, answers: Dict[str, str]) -> None:
+        if resp.startswith("PJLINK ERRA"):
+            raise PJLinkAuthError("auth error (ERRA)")
+        head, sep, value = resp.partition("=")
+        if sep and len(head) == 6 and head.startswith("%"):
+            answers[head.upper()] = value.strip()
 
 
+# -------------------------------------------------------------------
+# Pool de sessions + limite de débit
+# -------------------------------------------------------------------
+_POOL_LOCK = threading.Lock()
+_POOL: Dict[Tuple[str, int], PJLinkSession] = {}
+# Verrou par équipement: un seul échange à la fois (collector vs webapp)
+_DEVICE_LOCKS: Dict[Tuple[str, int], threading.Lock] = {}
+# Dernier résultat par équipement (limite de débit)
+_LAST: Dict[Tuple[str, int], Tuple[float, Dict[str, Any]]] = {}
+# Projecteurs en repli séquentiel -> échéance (monotonic) du prochain essai pipeliné
+_NO_PIPELINE: Dict[Tuple[str, int], float] = {}
+# Réponses d'identité (INF1/INF2/CLSS/SVER) par équipement
+_INFO: Dict[Tuple[str, int], Tuple[float, Dict[str, str]]] = {}
+
+
+def _device_lock(key: Tuple[str, int]) -> threading.Lock:
+    with _POOL_LOCK:
+        lock = _DEVICE_LOCKS.get(key)
+        if lock is None:
+            lock = _DEVICE_LOCKS[key] = threading.Lock()
+        return lock
+
+
+def _no_pipeline(key: Tuple[str, int]) -> bool:
+    until = _NO_PIPELINE.get(key)
+    if until is None:
+        return False
+    if time.monotonic() >= until:
+        _NO_PIPELINE.pop(key, None)
+        return False
+    return True
+
+
+def _checkout(key: Tuple[str, int], password: str, keepalive_s: float) -> Optional[PJLinkSession]:
+    with _POOL_LOCK:
+        sess = _POOL.pop(key, None)
+    if sess is None:
+        return None
+    if sess.password != password or time.monotonic() - sess.last_used > keepalive_s or not sess.alive():
+        sess.close()
+        return None
+    return sess
+
+
+def _checkin(key: Tuple[str, int], sess: PJLinkSession, keepalive_s: float) -> None:
+    if keepalive_s <= 0 or sess.sock is None:
+        sess.close()
+        return
+    with _POOL_LOCK:
+        old = _POOL.pop(key, None)
+        if old is not None and old is not sess:
+            old.close()
+        if len(_POOL) >= MAX_POOLED_SESSIONS:
+            oldest = min(_POOL, key=lambda k: _POOL[k].last_used)
+            _POOL.pop(oldest).close()
+        _POOL[key] = sess
+
+
+def close_all() -> None:
+    with _POOL_LOCK:
+        sessions = list(_POOL.values())
+        _POOL.clear()
+    for sess in sessions:
+        sess.close()
+
+
+# -------------------------------------------------------------------
+# Parsing
+# -------------------------------------------------------------------
 def _parse_power_response(resp: str) -> Tuple[bool, Optional[int], Optional[str]]:
     """
     Réponse attendue:
@@ -123,6 +315,80 @@ def _parse_power_response(resp: str) -> Tuple[bool, Optional[int], Optional[str]
         return False, None, resp
 
 
+def _parse_lamps(value: str) -> List[Dict[str, Any]]:
+    """ "1200 1 800 0" -> [{"hours": 1200, "on": True}, {"hours": 800, "on": False}] """
+    parts = value.split()
+    lamps = []
+    for i in range(0, len(parts) - 1, 2):
+        try:
+            lamps.append({"hours": int(parts[i]), "on": parts[i + 1] == "1"})
+        except ValueError:
+            break
+    return lamps
+
+
+def _apply_answers(answers: Dict[str, str], metrics: Dict[str, Any]) -> None:
+    """Réponses ERST/LAMP/INPT/INF1/INF2/CLSS/SVER/FILT -> metrics (ERRx ignorées)."""
+
+    def ok(key: str) -> Optional[str]:
+        v = answers.get(key)
+        return v if v is not None and not v.startswith("ERR") else None
+
+    erst = ok("%1ERST")
+    if erst and len(erst) == 6:
+        metrics["pjlink_errors"] = {f: ERST_LABELS.get(c, c) for f, c in zip(ERST_FIELDS, erst)}
+
+    lamp = ok("%1LAMP")
+    if lamp:
+        lamps = _parse_lamps(lamp)
+        if lamps:
+            metrics["pjlink_lamps"] = lamps
+            metrics["pjlink_lamp_hours"] = max(l["hours"] for l in lamps)
+
+    for key, name in (("%1INPT", "pjlink_input"), ("%1INF1", "pjlink_manufacturer"),
+                      ("%1INF2", "pjlink_model"), ("%2SVER", "pjlink_sw_version")):
+        v = ok(key)
+        if v:
+            metrics[name] = v
+
+    clss = ok("%1CLSS")
+    if clss:
+        metrics["pjlink_class"] = _safe_int(clss, 1)
+
+    filt = ok("%2FILT")
+    if filt is not None:
+        metrics["pjlink_filter_hours"] = _safe_int(filt, 0)
+
+
+def _exchange(sess: PJLinkSession) -> Dict[str, str]:
+    """
+    Au plus 2 envois pipelinés: classe 1 (+ identité si périmée), puis classe 2
+    si le projecteur l'annonce.
+    """
+    key = (sess.ip, sess.port)
+    info = _INFO.get(key)
+    refresh = info is None or time.monotonic() - info[0] > INFO_REFRESH_S
+    known: Dict[str, str] = {} if refresh else dict(info[1])
+
+    answers = sess.query([f"%1{c} ?" for c in CLASS1_QUERIES + (CLASS1_INFO_QUERIES if refresh else ())])
+    answers = {**known, **answers}
+    if _safe_int(answers.get("%1CLSS"), 1) >= 2:
+        answers.update(sess.query([f"%2{c} ?" for c in CLASS2_QUERIES + (CLASS2_INFO_QUERIES if refresh else ())]))
+
+    if refresh:
+        _INFO[key] = (time.monotonic(), {k: v for k, v in answers.items()
+                                         if k[2:] in CLASS1_INFO_QUERIES + CLASS2_INFO_QUERIES})
+    return answers
+
+
+def _offline(metrics: Dict[str, Any], detail: str) -> Dict[str, Any]:
+    detail = detail.strip()
+    if len(detail) > 280:
+        detail = detail[:279] + "…"
+    metrics["pjlink_error"] = detail
+    return {"status": "offline", "detail": detail, "metrics": metrics}
+
+
 def probe(device: Dict[str, Any]) -> Dict[str, Any]:
     """
     Entrypoint standard attendu par drivers/registry.py
@@ -145,10 +411,42 @@ def probe(device: Dict[str, Any]) -> Dict[str, Any]:
         return {"status": "unknown", "detail": "missing ip", "metrics": {"ts": _now_utc_iso()}}
 
     pj = _as_dict(device.get("pjlink"))
-    port = _safe_int(pj.get("port"), 4352)
-    timeout_s = _safe_int(pj.get("timeout_s"), 2)
+    port = endpoint(device)[1]
+    configured_timeout_s = _safe_int(pj.get("timeout_s"), 2)
+    # Timeout adaptatif (SRTT/RTTVAR du device), borné par timeout_min_s / timeout_max_s
+    timeout_s = rtt.timeout_for("pjlink", f"{ip}:{port}", pj, configured_timeout_s, PJLINK_MIN_TIMEOUT_S)
     password = (pj.get("password") or "").strip()
-
+    keepalive_s = _safe_float(pj.get("keepalive_s"), DEFAULT_KEEPALIVE_S)
+    min_interval_s = _safe_float(pj.get("min_interval_s"), DEFAULT_MIN_INTERVAL_S)
+    key = (ip, port)
+
+    with _device_lock(key):
+        last = _LAST.get(key)
+        if last is not None and time.monotonic() - last[0] < min_interval_s:
+            cached = dict(last[1])
+            cached["metrics"] = dict(cached.get("metrics") or {}, pjlink_cached=True)
+            return cached
+
+        out = _probe_locked(ip, port, timeout_s, password, keepalive_s, pj)
+        m = out["metrics"]
+        m["pjlink_timeout_s"] = configured_timeout_s
+        m["pjlink_timeout_used_s"] = round(timeout_s, 3)
+        estimate = rtt.estimate("pjlink", f"{ip}:{port}")
+        if estimate:
+            m["pjlink_rtt_estimate"] = estimate
+        _LAST[key] = (time.monotonic(), out)
+        return out
+
+
+def _probe_locked(
+    ip: str,
+    port: int,
+    timeout_s: float,
+    password: str,
+    keepalive_s: float,
+    pj: Dict[str, Any],
+) -> Dict[str, Any]:
+    key = (ip, port)
     metrics: Dict[str, Any] = {
         "ts": _now_utc_iso(),
         "pjlink_ok": False,
@@ -156,67 +454,87 @@ def probe(device: Dict[str, Any]) -> Dict[str, Any]:
         "pjlink_timeout_s": timeout_s,
     }
 
+    sess = _checkout(key, password, keepalive_s)
+    reused = sess is not None
+    answers: Optional[Dict[str, str]] = None
+    sequential_retry = False
     try:
-        with socket.create_connection((ip, port), timeout=max(1, timeout_s)) as sock:
-            sock.settimeout(max(1, timeout_s))
-
-            ok, auth_used, auth_token_or_err = _pjlink_handshake(sock, password)
-            if not ok:
-                detail = (auth_token_or_err or "pjlink handshake failed").strip()
-                metrics["pjlink_error"] = detail
-                return {"status": "offline", "detail": detail, "metrics": metrics}
-
-            if auth_used == "md5":
-                auth_prefix = auth_token_or_err  # md5 hex
-            else:
-                auth_prefix = None
-
-            # Power status
-            resp = _pjlink_cmd(sock, "%1POWR ?", auth_prefix)
-            ok2, power_val, perr = _parse_power_response(resp)
-
-            metrics["pjlink_ok"] = True
-            metrics["pjlink_auth"] = auth_used or "unknown"
-            metrics["pjlink_raw_powr"] = resp
-
-            if ok2:
-                metrics["pjlink_power"] = power_val
-                # Optionnel: interprétation simple
-                metrics["pjlink_power_label"] = {
-                    0: "off",
-                    1: "on",
-                    2: "cooling",
-                    3: "warmup",
-                }.get(power_val, "unknown")
-            else:
-                metrics["pjlink_power"] = None
-                metrics["pjlink_error"] = (perr or "unknown").strip()
-
-            # Si on arrive ici, PJLink répond => online
-            return {"status": "online", "detail": None, "metrics": metrics}
-
+        for attempt in range(2):
+            fresh = sess is None
+            if sess is None:
+                sess = PJLinkSession(ip, port, password, timeout_s)
+                sess.pipeline = pj.get("pipeline", True) is not False and not sequential_retry and not _no_pipeline(key)
+                sess.connect()
+            try:
+                answers = _exchange(sess)
+                if sequential_retry:
+                    # Le séquentiel répond là où le pipeliné a expiré: repli temporaire
+                    _NO_PIPELINE[key] = time.monotonic() + NO_PIPELINE_RETRY_S
+                break
+            except PJLinkAuthError:
+                raise
+            except (OSError, PJLinkError) as e:
+                pipelined = sess.pipeline
+                sess.close()
+                sess = None
+                if attempt == 0 and not fresh:
+                    # Connexion réutilisée fermée entre-temps par le projecteur: on rouvre
+                    reused = False
+                    continue
+                if attempt == 0 and pipelined and isinstance(e, TimeoutError):
+                    # Pas de réponse aux commandes pipelinées: nouvel essai en séquentiel,
+                    # repli retenu seulement s'il répond
+                    sequential_retry = True
+                    continue
+                raise
+    except PJLinkAuthError as e:
+        if sess is not None:
+            sess.close()
+        return _offline(metrics, str(e))
     except (ConnectionRefusedError, TimeoutError, socket.timeout) as e:
-        detail = f"pjlink connect timeout/refused: {e}".strip()
-        if len(detail) > 280:
-            detail = detail[:279] + "…"
-        metrics["pjlink_error"] = detail
-        return {"status": "offline", "detail": detail, "metrics": metrics}
+        if sess is not None:
+            sess.close()
+        if isinstance(e, TimeoutError):
+            rtt.observe_timeout("pjlink", f"{ip}:{port}")
+        return _offline(metrics, f"pjlink connect timeout/refused: {e}")
     except OSError as e:
-        detail = f"pjlink socket error: {e}".strip()
-        if len(detail) > 280:
-            detail = detail[:279] + "…"
-        metrics["pjlink_error"] = detail
-        return {"status": "offline", "detail": detail, "metrics": metrics}
+        if sess is not None:
+            sess.close()
+        return _offline(metrics, f"pjlink socket error: {e}")
     except Exception as e:
-        detail = f"pjlink error: {e}".strip()
-        if len(detail) > 280:
-            detail = detail[:279] + "…"
-        metrics["pjlink_error"] = detail
-        return {"status": "offline", "detail": detail, "metrics": metrics}
+        if sess is not None:
+            sess.close()
+        return _offline(metrics, f"pjlink error: {e}")
+
+    assert sess is not None and answers is not None
+    if sess.last_rtt_s is not None and sess.last_rtt_s <= timeout_s:
+        rtt.observe("pjlink", f"{ip}:{port}", sess.last_rtt_s)
+    _checkin(key, sess, keepalive_s)
+
+    resp = f"%1POWR={answers['%1POWR']}" if "%1POWR" in answers else ""
+    ok2, power_val, perr = _parse_power_response(resp)
+
+    metrics["pjlink_ok"] = True
+    metrics["pjlink_auth"] = sess.auth or "unknown"
+    metrics["pjlink_raw_powr"] = resp
+    metrics["pjlink_session"] = "reused" if reused else "new"
+    metrics["pjlink_pipeline"] = sess.pipeline
+
+    if ok2:
+        metrics["pjlink_power"] = power_val
+        metrics["pjlink_power_label"] = POWER_LABELS.get(power_val, "unknown")
+    else:
+        metrics["pjlink_power"] = None
+        metrics["pjlink_error"] = (perr or "unknown").strip()
+
+    _apply_answers(answers, metrics)
+
+    # Si on arrive ici, PJLink répond => online
+    return {"status": "online", "detail": None, "metrics": metrics}
 
 
 # -------------------------------------------------------------------
 # Compatibilité backward
 # -------------------------------------------------------------------
 def collect(device: Dict[str, Any]) -> Dict[str, Any]:
-    return probe(device)
\ No newline at end of file
+    return probe(device)
@@ -1,17 +1,28 @@
 # agent/src/drivers/registry.py
 from __future__ import annotations
 
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
-from src.drivers.ping import probe as ping_probe
-from src.drivers.snmp import probe as snmp_probe
-from src.drivers.pjlink import probe as pjlink_probe
+from src import rtt
+from src.drivers import snmp_tables
+from src.drivers.ping import probe as ping_probe, reachable_result
+from src.drivers.snmp import endpoint as snmp_endpoint, probe as snmp_probe, probe_many as snmp_probe_many
+from src.drivers.pjlink import endpoint as pjlink_endpoint, probe as pjlink_probe
 from src.drivers.zigbee import probe as zigbee_probe
 
 # Type signature commune à nos drivers:
 # - device: dict (config device)
 # - retourne un dict d'observation (au minimum: status, detail, metrics...)
 DriverFn = Callable[[Dict[str, Any]], Dict[str, Any]]
+# Drivers capables de sonder une liste de devices en une passe (ordre conservé)
+BatchDriverFn = Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]
+
+# Drivers réseau dont le résultat ne dépend que de l'IP et du bloc driver:
+# plusieurs entrées identiques => un seul probe par cycle (résultat partagé)
+COALESCE_DRIVERS = ("ping", "snmp", "pjlink")
+# Drivers dont une réponse "online" prouve que l'IP est joignable: une entrée ping
+# sur la même IP reprend cette réponse au lieu d'envoyer son propre ICMP
+REACHABILITY_DRIVERS = ("snmp", "pjlink")
 
 
 def get_registry() -> Dict[str, DriverFn]:
@@ -30,6 +41,116 @@ def get_registry() -> Dict[str, DriverFn]:
     }
 
 
+def get_batch_registry() -> Dict[str, BatchDriverFn]:
+    """
+    Drivers à entrypoint batch: probe_many(devices) -> [result dict, ...]
+    (un résultat par device, dans l'ordre).
+    """
+    return {
+        "snmp": snmp_probe_many,
+    }
+
+
+def _normalize(dname: str, out: Any) -> Dict[str, Any]:
+    # Normalisation minimale (évite les KeyError plus loin)
+    if not isinstance(out, dict):
+        return {"status": "unknown", "detail": f"driver_invalid_return:{dname}", "metrics": {}}
+
+    out.setdefault("status", "unknown")
+    out.setdefault("detail", None)
+    out.setdefault("metrics", {} if isinstance(out.get("metrics"), dict) else {})
+
+    return out
+
+
+def coalesce_key(driver: str, device: Dict[str, Any]) -> Optional[Tuple[str, str, str]]:
+    """
+    Clé de partage d'un probe dans le cycle: (driver, ip, bloc driver hors clés "_").
+    None si le driver n'est pas mutualisable.
+    """
+    dname = (driver or "").strip().lower()
+    if dname not in COALESCE_DRIVERS:
+        return None
+    ip = (device.get("ip") or "").strip()
+    if not ip:
+        return None
+    block = device.get(dname)
+    items = sorted((str(k), v) for k, v in block.items() if not str(k).startswith("_")) if isinstance(block, dict) else []
+    return dname, ip, repr(items)
+
+
+def prune_state(devices: List[Dict[str, Any]]) -> None:
+    """
+    Purge l'état par équipement tenu par les drivers (tables SNMP, sysUpTime,
+    estimateurs RTT) des devices absents de la config complète.
+    """
+    tables_keep: Set[Tuple[str, int]] = set()
+    rtt_keep: Set[Tuple[str, str]] = set()
+    endpoints = {"snmp": snmp_endpoint, "pjlink": pjlink_endpoint}
+    for dev in devices:
+        if not isinstance(dev, dict):
+            continue
+        dname = (dev.get("driver") or "ping").strip().lower() or "ping"
+        fn = endpoints.get(dname)
+        if fn is None:
+            continue
+        ip, port = fn(dev)
+        if not ip:
+            continue
+        if dname == "snmp":
+            tables_keep.add((ip, port))
+        rtt_keep.add((dname, f"{ip}:{port}"))
+    snmp_tables.prune(tables_keep)
+    rtt.prune(rtt_keep)
+
+
+def reachability_key(driver: str, device: Dict[str, Any]) -> Optional[str]:
+    """
+    Clé de joignabilité partagée entre drivers: l'IP, pour ping et les drivers
+    de REACHABILITY_DRIVERS. None sinon (zigbee...).
+    """
+    dname = (driver or "").strip().lower()
+    if dname != "ping" and dname not in REACHABILITY_DRIVERS:
+        return None
+    return (device.get("ip") or "").strip() or None
+
+
+def reachable_ping(device: Dict[str, Any], via: str) -> Dict[str, Any]:
+    """Résultat ping (normalisé) d'une IP déjà vue en ligne par le driver via."""
+    return _normalize("ping", reachable_result(device, via))
+
+
+def run_batch(devices: List[Dict[str, Any]]) -> Dict[int, Tuple[Dict[str, Any], Optional[float]]]:
+    """
+    Exécute en une passe les devices dont le driver a une entrypoint batch.
+
+    Retour: {index dans devices: (résultat normalisé, durée de la requête en s ou None)}
+    Les devices absents du retour sont à traiter par run_driver().
+    """
+    groups: Dict[str, List[int]] = {}
+    for i, dev in enumerate(devices):
+        if not isinstance(dev, dict) or not (dev.get("ip") or "").strip():
+            continue
+        dname = (dev.get("driver") or "ping").strip().lower() or "ping"
+        if dname in get_batch_registry():
+            groups.setdefault(dname, []).append(i)
+
+    results: Dict[int, Tuple[Dict[str, Any], Optional[float]]] = {}
+    for dname, idxs in groups.items():
+        fn = get_batch_registry()[dname]
+        try:
+            outs = fn([devices[i] for i in idxs])
+        except Exception:
+            # Le batch est une optimisation: en cas d'échec, repli device par device
+            continue
+        if not isinstance(outs, list) or len(outs) != len(idxs):
+            continue
+        for i, out in zip(idxs, outs):
+            elapsed = out.pop("_elapsed_s", None) if isinstance(out, dict) else None
+            results[i] = (_normalize(dname, out), elapsed)
+    return results
+
+
 def run_driver(driver: str, device: Dict[str, Any]) -> Dict[str, Any]:
     """
     Entry-point stable attendu par collector.py.
@@ -61,12 +182,4 @@ def run_driver(driver: str, device: Dict[str, Any]) -> Dict[str, Any]:
             "metrics": {},
         }
 
-    # Normalisation minimale (évite les KeyError plus loin)
-    if not isinstance(out, dict):
-        return {"status": "unknown", "detail": f"driver_invalid_return:{dname}", "metrics": {}}
-
-    out.setdefault("status", "unknown")
-    out.setdefault("detail", None)
-    out.setdefault("metrics", {} if isinstance(out.get("metrics"), dict) else {})
-
-    return out
\ No newline at end of file
+    return _normalize(dname, out)
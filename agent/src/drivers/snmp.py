@@ -1,8 +1,51 @@
 # agent/src/drivers/snmp.py
+"""
+Driver SNMP v2c.
+
+- Un SnmpEngine unique, long-vivant, sur une boucle asyncio dédiée (thread
+  "snmp-dispatcher"): plus de chargement MIB / dispatcher par device et par cycle.
+- Toutes les OIDs d'un device (sysDescr, sysUpTime + bloc snmp.oids) dans un
+  seul GET (découpé au-delà de MAX_OIDS_PER_PDU).
+- probe_many(devices): requêtes multiplexées sur la boucle (concurrence bornée
+  par AVMVP_SNMP_MAX_CONCURRENCY), utilisé par le collector pour tout le cycle.
+
+OIDs additionnelles (bloc snmp du device):
+    "snmp": {"community": "public", "oids": {"if1_oper": "1.3.6.1.2.1.2.2.1.8.1",
+                                             "lamp_hours": "1.3.6.1.4.1.x.y.0"}}
+    (liste acceptée aussi: ["1.3.6.1.2.1.2.2.1.8.1", {"name": "temp", "oid": "..."}])
+Les valeurs remontent dans metrics["snmp_values"] (None si absente sur l'équipement).
+
+Tables (GETBULK, cadence propre): voir drivers/snmp_tables.py -> metrics["snmp_tables"].
+"""
 from __future__ import annotations
 
+import asyncio
+import os
+import re
+import threading
+import time
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+
+from src import rtt
+from src.drivers import snmp_tables
+
+SYS_DESCR_OID = "1.3.6.1.2.1.1.1.0"
+SYS_UPTIME_OID = "1.3.6.1.2.1.1.3.0"
+
+# Garde-fou taille de PDU (UDP 1472 octets sans fragmentation)
+MAX_OIDS_PER_PDU = 40
+MAX_EXTRA_OIDS = 200
+
+_OID_RE = re.compile(r"^\.?\d+(\.\d+)+$")
+
+
+def _target_timeout(timeout_s: float, hard_timeout_s: Optional[float]) -> float:
+    """
+    Timeout du target pysnmp: au-delà du délai par tentative (c'est wait_for qui
+    tranche), et constant pour un device (pysnmp garde un target par valeur).
+    """
+    return max(timeout_s, hard_timeout_s or 0.0) + 1.0
 
 
 def _now_utc_iso() -> str:
@@ -20,119 +63,545 @@ def _as_dict(v: Any) -> Dict[str, Any]:
     return v if isinstance(v, dict) else {}
 
 
-def _snmp_get_sys(ip: str, community: str, port: int, timeout_s: int, retries: int) -> Tuple[bool, Dict[str, Any], Optional[str]]:
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _parse_extra_oids(snmp_cfg: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """
+    snmp.oids -> [(name, oid)] (OIDs numériques uniquement, doublons ignorés).
     """
-    Fait un GET minimal sur:
-      - sysDescr.0   (1.3.6.1.2.1.1.1.0)
-      - sysUpTime.0  (1.3.6.1.2.1.1.3.0)
+    raw = snmp_cfg.get("oids")
+    items: List[Tuple[str, str]] = []
+    if isinstance(raw, dict):
+        items = [(str(k), str(v)) for k, v in raw.items()]
+    elif isinstance(raw, list):
+        for entry in raw:
+            if isinstance(entry, str):
+                items.append((entry, entry))
+            elif isinstance(entry, dict) and entry.get("oid"):
+                items.append((str(entry.get("name") or entry["oid"]), str(entry["oid"])))
 
-    Retour:
-      (ok, metrics, error)
+    out: List[Tuple[str, str]] = []
+    seen = {SYS_DESCR_OID, SYS_UPTIME_OID}
+    for name, oid in items:
+        oid = oid.strip().lstrip(".")
+        if not _OID_RE.match(oid) or oid in seen:
+            continue
+        seen.add(oid)
+        out.append((name.strip() or oid, oid))
+        if len(out) >= MAX_EXTRA_OIDS:
+            break
+    return out
+
+
+def _convert_value(val: Any) -> Any:
     """
-    # Import lazy pour éviter crash au démarrage si la dépendance n'est pas présente
-    try:
-        from pysnmp.hlapi import (  # type: ignore
-            SnmpEngine,
+    Valeur pysnmp -> type Python simple (int / str / None si noSuchObject...).
+    """
+    cls = val.__class__.__name__
+    if cls in ("NoSuchObject", "NoSuchInstance", "EndOfMibView", "Null"):
+        return None
+    if cls in ("Integer", "Integer32", "Counter32", "Counter64", "Gauge32", "Unsigned32", "TimeTicks"):
+        try:
+            return int(val)
+        except Exception:
+            return val.prettyPrint()
+    return val.prettyPrint()
+
+
+# -------------------------------------------------------------------
+# Engine partagé + boucle dédiée
+# -------------------------------------------------------------------
+class _SnmpDispatcher:
+    """
+    SnmpEngine partagé, piloté depuis une boucle asyncio dans un thread daemon.
+
+    Les appels synchrones (probe / probe_many) soumettent des coroutines à la
+    boucle et attendent leur résultat.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._engine: Any = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._warm = False
+        self.max_concurrency = max(1, _env_int("AVMVP_SNMP_MAX_CONCURRENCY", 64))
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is not None and self._thread is not None and self._thread.is_alive():
+                return self._loop
+            loop = asyncio.new_event_loop()
+            t = threading.Thread(target=loop.run_forever, name="snmp-dispatcher", daemon=True)
+            t.start()
+            self._loop, self._thread = loop, t
+            asyncio.run_coroutine_threadsafe(self._init_engine(), loop).result(timeout=30)
+            return loop
+
+    async def _init_engine(self) -> None:
+        from pysnmp.hlapi.asyncio import SnmpEngine  # type: ignore
+
+        # Créé dans la boucle: le transport asyncio de pysnmp s'y rattache
+        self._engine = SnmpEngine()
+        self._sem = asyncio.Semaphore(self.max_concurrency)
+
+    async def _request(
+        self,
+        send: Any,
+        timeout_s: float,
+        retries: int,
+        rtt_key: Optional[str],
+        max_timeout_s: Optional[float] = None,
+    ) -> Any:
+        """
+        Requête avec retransmissions gérées ici (pysnmp configuré sans retry):
+        chaque tentative a son propre request-id, le temps de réponse mesuré
+        est donc sans ambiguïté (Karn) et alimente l'estimateur RTT.
+        Délai doublé à chaque retransmission (RFC 6298 §5.5), jusqu'à max_timeout_s
+        (timeout_s configuré): un RTO adaptatif court ne raccourcit pas toute la requête.
+        Retour: réponse pysnmp; asyncio.TimeoutError si aucune tentative n'aboutit.
+        """
+        loop = asyncio.get_running_loop()
+        attempt_timeout_s = timeout_s
+        cap_s = max(timeout_s, max_timeout_s or 0.0)
+        for _ in range(max(0, retries) + 1):
+            t0 = loop.time()
+            try:
+                res = await asyncio.wait_for(send(), attempt_timeout_s)
+            except asyncio.TimeoutError:
+                if rtt_key and self._warm:
+                    rtt.observe_timeout("snmp", rtt_key)
+                attempt_timeout_s = min(attempt_timeout_s * 2.0, cap_s)
+                continue
+            if rtt_key and self._warm and not res[0]:
+                rtt.observe("snmp", rtt_key, loop.time() - t0)
+            return res
+        raise asyncio.TimeoutError()
+
+    def run(self, coro: Any, timeout_s: float) -> Any:
+        loop = self._ensure_started()
+        fut = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return fut.result(timeout=timeout_s)
+        except Exception:
+            fut.cancel()
+            raise
+        finally:
+            # Première passe = moteur à froid (chargement MIB pysnmp): temps non représentatifs
+            self._warm = True
+
+    async def get(
+        self,
+        ip: str,
+        port: int,
+        community: str,
+        timeout_s: float,
+        retries: int,
+        oids: List[str],
+        hard_timeout_s: Optional[float] = None,
+        rtt_key: Optional[str] = None,
+        max_timeout_s: Optional[float] = None,
+    ) -> Tuple[bool, Dict[str, Any], Optional[str], float]:
+        """
+        GET des OIDs (un PDU par lot de MAX_OIDS_PER_PDU).
+        timeout_s: délai de la première tentative (doublé jusqu'à max_timeout_s);
+        hard_timeout_s: timeout du target pysnmp (constant par device: un target
+        est créé par valeur distincte).
+        Retour: (ok, {oid: valeur}, erreur, durée en s)
+        """
+        from pysnmp.hlapi.asyncio import (  # type: ignore
             CommunityData,
-            UdpTransportTarget,
             ContextData,
-            ObjectType,
             ObjectIdentity,
+            ObjectType,
+            UdpTransportTarget,
             getCmd,
         )
-    except Exception as e:
-        return False, {}, f"pysnmp not available: {e}"
 
-    sys_descr_oid = "1.3.6.1.2.1.1.1.0"
-    sys_uptime_oid = "1.3.6.1.2.1.1.3.0"
+        assert self._sem is not None
+        loop = asyncio.get_running_loop()
+        async with self._sem:
+            t0 = loop.time()
+            values: Dict[str, Any] = {}
+            try:
+                target = UdpTransportTarget((ip, port), timeout=_target_timeout(max(timeout_s, max_timeout_s or 0.0), hard_timeout_s), retries=0)
+                auth = CommunityData(community, mpModel=1)  # SNMPv2c
+                for i in range(0, len(oids), MAX_OIDS_PER_PDU):
+                    chunk = oids[i:i + MAX_OIDS_PER_PDU]
+                    error_indication, error_status, error_index, var_binds = await self._request(
+                        lambda: getCmd(
+                            self._engine,
+                            auth,
+                            target,
+                            ContextData(),
+                            *[ObjectType(ObjectIdentity(o)) for o in chunk],
+                            lookupMib=False,
+                        ),
+                        timeout_s,
+                        retries,
+                        rtt_key,
+                        max_timeout_s,
+                    )
+                    if error_indication:
+                        return False, values, str(error_indication), loop.time() - t0
+                    if error_status:
+                        return False, values, f"{error_status.prettyPrint()} at {error_index}", loop.time() - t0
+                    for name, val in var_binds:
+                        values[str(name)] = _convert_value(val)
+                return True, values, None, loop.time() - t0
+            except asyncio.TimeoutError:
+                return False, values, "No SNMP response received before timeout", loop.time() - t0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                return False, values, f"snmp error: {e}", loop.time() - t0
 
-    try:
-        it = getCmd(
-            SnmpEngine(),
-            CommunityData(community, mpModel=1),  # SNMPv2c
-            UdpTransportTarget((ip, port), timeout=max(1, timeout_s), retries=max(0, retries)),
-            ContextData(),
-            ObjectType(ObjectIdentity(sys_descr_oid)),
-            ObjectType(ObjectIdentity(sys_uptime_oid)),
+    async def walk(
+        self,
+        ip: str,
+        port: int,
+        community: str,
+        timeout_s: float,
+        retries: int,
+        roots: List[str],
+        max_repetitions: int,
+        hard_timeout_s: Optional[float] = None,
+        rtt_key: Optional[str] = None,
+        max_timeout_s: Optional[float] = None,
+    ) -> Tuple[Dict[str, Dict[str, Tuple[str, Any]]], Optional[str]]:
+        """
+        Walk GETBULK de plusieurs colonnes en parallèle (une colonne par varbind,
+        max_repetitions lignes par réponse).
+        Retour: ({racine: {suffixe: (type, valeur)}}, erreur)
+        """
+        from pysnmp.hlapi.asyncio import (  # type: ignore
+            CommunityData,
+            ContextData,
+            ObjectIdentity,
+            ObjectType,
+            UdpTransportTarget,
+            bulkCmd,
         )
 
-        errorIndication, errorStatus, errorIndex, varBinds = next(it)
+        assert self._sem is not None
+        out: Dict[str, Dict[str, Tuple[str, Any]]] = {r: {} for r in roots}
+        prefixes = [r + "." for r in roots]
+        cursors = list(roots)
+        active = list(range(len(roots)))
+        rows = 0
 
-        if errorIndication:
-            return False, {}, str(errorIndication)
+        async with self._sem:
+            try:
+                target = UdpTransportTarget((ip, port), timeout=_target_timeout(max(timeout_s, max_timeout_s or 0.0), hard_timeout_s), retries=0)
+                auth = CommunityData(community, mpModel=1)
+                while active:
+                    error_indication, error_status, error_index, var_table = await self._request(
+                        lambda: bulkCmd(
+                            self._engine,
+                            auth,
+                            target,
+                            ContextData(),
+                            0,
+                            max_repetitions,
+                            *[ObjectType(ObjectIdentity(cursors[j])) for j in active],
+                            lookupMib=False,
+                        ),
+                        timeout_s,
+                        retries,
+                        rtt_key,
+                        max_timeout_s,
+                    )
+                    if error_indication:
+                        return out, str(error_indication)
+                    if error_status:
+                        return out, f"{error_status.prettyPrint()} at {error_index}"
+                    if not var_table:
+                        break
 
-        if errorStatus:
-            return False, {}, f"{errorStatus.prettyPrint()} at {errorIndex}"
+                    done = set()
+                    for var_row in var_table:
+                        for j, (name, val) in zip(active, var_row):
+                            if j in done:
+                                continue
+                            oid = str(name)
+                            if val.__class__.__name__ == "EndOfMibView" or not oid.startswith(prefixes[j]):
+                                done.add(j)
+                                continue
+                            out[roots[j]][oid[len(prefixes[j]):]] = (val.__class__.__name__, _convert_value(val))
+                            cursors[j] = oid
+                        rows += 1
 
-        metrics: Dict[str, Any] = {"snmp_ok": True, "snmp_port": port}
-        for name, val in varBinds:
-            oid = name.prettyPrint()
-            v = val.prettyPrint()
-            if oid == sys_descr_oid:
-                metrics["sys_descr"] = v
-            elif oid == sys_uptime_oid:
-                # sysUpTime = centièmes de secondes (souvent un integer)
-                try:
-                    metrics["sys_uptime"] = int(v)
-                except Exception:
-                    metrics["sys_uptime"] = v
+                    if rows >= snmp_tables.MAX_ROWS_PER_TABLE:
+                        return out, "table too large (truncated)"
+                    active = [j for j in active if j not in done]
+                return out, None
+            except asyncio.TimeoutError:
+                return out, "No SNMP response received before timeout"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                return out, f"snmp error: {e}"
 
-        return True, metrics, None
 
-    except StopIteration:
-        return False, {}, "snmp: no response"
-    except Exception as e:
-        return False, {}, f"snmp error: {e}"
+_DISPATCHER = _SnmpDispatcher()
 
 
-def probe(device: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Entrypoint standard attendu par drivers/registry.py
+def get_dispatcher() -> _SnmpDispatcher:
+    return _DISPATCHER
 
-    Input: device dict
-    Output:
-      {
-        "status": "online"|"offline"|"unknown",
-        "detail": "<string|None>",
-        "metrics": { ... }
-      }
-    """
-    ip = (device.get("ip") or "").strip()
-    if not ip:
-        return {"status": "unknown", "detail": "missing ip", "metrics": {"ts": _now_utc_iso()}}
 
+# -------------------------------------------------------------------
+# Probe
+# -------------------------------------------------------------------
+def endpoint(device: Dict[str, Any]) -> Tuple[str, int]:
+    """(ip, port) SNMP d'un device: clé de l'état par équipement (tables, RTT)."""
+    return (device.get("ip") or "").strip(), _safe_int(_as_dict(device.get("snmp")).get("port"), 161)
+
+
+def _device_params(device: Dict[str, Any]) -> Dict[str, Any]:
     snmp_cfg = _as_dict(device.get("snmp"))
-    community = (snmp_cfg.get("community") or "public").strip() or "public"
-    port = _safe_int(snmp_cfg.get("port"), 161)
-    timeout_s = _safe_int(snmp_cfg.get("timeout_s"), 1)
-    retries = _safe_int(snmp_cfg.get("retries"), 1)
+    ip, port = endpoint(device)
+    configured_timeout_s = _safe_int(snmp_cfg.get("timeout_s"), 1)
+    rtt_key = f"{ip}:{port}"
+    return {
+        "ip": ip,
+        "community": (snmp_cfg.get("community") or "public").strip() or "public",
+        "port": port,
+        # Timeout adaptatif (SRTT/RTTVAR du device), borné par timeout_min_s / timeout_max_s
+        "timeout_s": rtt.timeout_for("snmp", rtt_key, snmp_cfg, configured_timeout_s),
+        "configured_timeout_s": configured_timeout_s,
+        "hard_timeout_s": rtt.bounds(snmp_cfg, configured_timeout_s)[1],
+        "rtt_key": rtt_key,
+        "retries": _safe_int(snmp_cfg.get("retries"), 1),
+        "extra": _parse_extra_oids(snmp_cfg),
+        "tables": snmp_tables.parse_tables(snmp_cfg),
+        "rebooted": False,
+    }
 
-    ok, m, err = _snmp_get_sys(ip, community, port, timeout_s, retries)
 
+def _build_result(
+    p: Dict[str, Any],
+    ok: bool,
+    values: Dict[str, Any],
+    err: Optional[str],
+    elapsed_s: Optional[float],
+) -> Dict[str, Any]:
     metrics: Dict[str, Any] = {
         "ts": _now_utc_iso(),
         "snmp_ok": ok,
-        "snmp_port": port,
-        "snmp_timeout_s": timeout_s,
-        "snmp_retries": retries,
+        "snmp_port": p["port"],
+        "snmp_timeout_s": p["configured_timeout_s"],
+        "snmp_timeout_used_s": round(p["timeout_s"], 3),
+        "snmp_retries": p["retries"],
     }
-    # merge metrics sysDescr/sysUpTime si présents
-    if isinstance(m, dict):
-        metrics.update(m)
+    if SYS_DESCR_OID in values:
+        metrics["sys_descr"] = values[SYS_DESCR_OID]
+    if SYS_UPTIME_OID in values:
+        # sysUpTime = centièmes de secondes
+        metrics["sys_uptime"] = values[SYS_UPTIME_OID]
+    if p["extra"]:
+        metrics["snmp_values"] = {name: values.get(oid) for name, oid in p["extra"]}
+
+    out: Dict[str, Any] = {"metrics": metrics}
+    if elapsed_s is not None:
+        metrics["snmp_rtt_ms"] = round(elapsed_s * 1000.0, 2)
+        out["_elapsed_s"] = elapsed_s  # consommé par le registry (durée par device en batch)
+    estimate = rtt.estimate("snmp", p["rtt_key"])
+    if estimate:
+        metrics["snmp_rtt_estimate"] = estimate
 
     if ok:
-        return {"status": "online", "detail": None, "metrics": metrics}
+        out.update(status="online", detail=None)
+        return out
 
     detail = (err or "snmp failed").strip()
     if len(detail) > 280:
         detail = detail[:279] + "…"
-
     # SNMP KO => on considère offline (connectivité/agent)
-    return {"status": "offline", "detail": detail, "metrics": metrics}
+    out.update(status="offline", detail=detail)
+    return out
+
+
+def _wait_budget_s(params: List[Dict[str, Any]], concurrency: int) -> float:
+    """Borne d'attente côté appelant (le timeout pysnmp reste la référence)."""
+    if not params:
+        return 1.0
+    per = 0
+    for p in params:
+        # Retransmissions à délai doublé, plafonné au timeout_s configuré
+        one = max(1, p["timeout_s"], p["configured_timeout_s"]) * (max(0, p["retries"]) + 1)
+        # GET (+ lots d'OIDs) puis walks: quelques allers-retours par table
+        per = max(per, one * (1 + len(p["extra"]) // MAX_OIDS_PER_PDU + 8 * len(p["tables"])))
+    waves = (len(params) + concurrency - 1) // concurrency
+    return per * waves + 10.0
+
+
+def _oids_for(p: Dict[str, Any]) -> List[str]:
+    return [SYS_DESCR_OID, SYS_UPTIME_OID] + [oid for _, oid in p["extra"]]
+
+
+def probe_many(devices: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Probe d'une liste de devices en une passe (requêtes concurrentes sur l'engine partagé).
+    Retourne les résultats dans l'ordre des devices.
+
+    Plusieurs devices sur le même agent (ip, port, community) partagent un seul
+    GET (union de leurs OIDs), chacun ne reçoit que ses propres valeurs.
+
+    Tables (snmp.tables): walkées après un GET réussi, à leur propre cadence
+    (interval_s); un même walk (ip, port, community, table) n'est fait qu'une
+    fois par passe même si plusieurs devices le déclarent.
+    """
+    params = [_device_params(d) for d in devices]
+    results: List[Optional[Dict[str, Any]]] = [None] * len(params)
+
+    todo: List[int] = []
+    for i, p in enumerate(params):
+        if not p["ip"]:
+            results[i] = {"status": "unknown", "detail": "missing ip", "metrics": {"ts": _now_utc_iso()}}
+        else:
+            todo.append(i)
+
+    if todo:
+        try:
+            import pysnmp.hlapi.asyncio  # noqa: F401  # type: ignore
+        except Exception as e:
+            for i in todo:
+                results[i] = _build_result(params[i], False, {}, f"pysnmp not available: {e}", None)
+            return [r for r in results if r is not None]
+
+        dispatcher = get_dispatcher()
+
+        async def _all() -> List[Any]:
+            # Cache des walks de la passe: clé -> Task partagée
+            walks: Dict[Tuple[Any, ...], "asyncio.Task[Any]"] = {}
+
+            async def _walk(p: Dict[str, Any], spec: Any) -> Dict[str, Any]:
+                ip, port = p["ip"], p["port"]
+                walked, err = await dispatcher.walk(ip, port, p["community"], p["timeout_s"], p["retries"],
+                                                    spec.walk_roots(), spec.max_repetitions,
+                                                    hard_timeout_s=p["hard_timeout_s"], rtt_key=p["rtt_key"],
+                                                    max_timeout_s=p["configured_timeout_s"])
+                if err and not any(walked.values()):
+                    return snmp_tables.record_error(ip, port, spec, err)
+                rows = snmp_tables.split_rows(spec, walked)
+                result = snmp_tables.record_walk(ip, port, spec, rows, p["rebooted"])
+                if err:
+                    result = dict(result, error=err)
+                return result
+
+            async def _tables(p: Dict[str, Any]) -> Dict[str, Any]:
+                ip, port = p["ip"], p["port"]
+                due = snmp_tables.due_tables(ip, port, p["tables"])
+                out: Dict[str, Any] = {}
+                for spec in p["tables"]:
+                    key = (ip, port, p["community"], spec.name) + spec.cache_key()
+                    task = walks.get(key)
+                    if task is None and spec not in due:
+                        last = snmp_tables.last_result(ip, port, spec.name)
+                        if last is not None:
+                            out[spec.name] = last
+                        continue
+                    if task is None:
+                        task = walks[key] = asyncio.ensure_future(_walk(p, spec))
+                    out[spec.name] = await task
+                return out
+
+            # GET partagés: un seul GET par (ip, port, community) et par passe, avec
+            # l'union des OIDs des devices qui pointent sur le même agent
+            gets: Dict[Tuple[str, int, str], "asyncio.Task[Any]"] = {}
+            get_oids: Dict[Tuple[str, int, str], Dict[str, None]] = {}
+            for i in todo:
+                p = params[i]
+                get_oids.setdefault((p["ip"], p["port"], p["community"]), {}).update(dict.fromkeys(_oids_for(p)))
+
+            async def _one(p: Dict[str, Any]) -> Tuple[Any, ...]:
+                key = (p["ip"], p["port"], p["community"])
+                task = gets.get(key)
+                shared = task is not None
+                if task is None:
+                    task = gets[key] = asyncio.ensure_future(dispatcher.get(
+                        p["ip"], p["port"], p["community"], p["timeout_s"], p["retries"], list(get_oids[key]),
+                        hard_timeout_s=p["hard_timeout_s"], rtt_key=p["rtt_key"],
+                        max_timeout_s=p["configured_timeout_s"],
+                    ))
+                ok, values, err, dt = await task
+                tables: Optional[Dict[str, Any]] = None
+                if ok and p["tables"]:
+                    p["rebooted"] = snmp_tables.note_uptime(p["ip"], p["port"], values.get(SYS_UPTIME_OID))
+                    tables = await _tables(p)
+                return ok, values, err, dt, tables, shared
+
+            # Etat des tables retirées de la config (union par équipement: une IP peut être déclarée 2 fois)
+            declared: Dict[Tuple[str, int], List[str]] = {}
+            for i in todo:
+                declared.setdefault((params[i]["ip"], params[i]["port"]), []).extend(s.name for s in params[i]["tables"])
+            for (ip, port), names in declared.items():
+                snmp_tables.forget(ip, port, names)
+
+            return await asyncio.gather(*(_one(params[i]) for i in todo), return_exceptions=True)
+
+        t0 = time.perf_counter()
+        try:
+            outcomes = dispatcher.run(_all(), _wait_budget_s([params[i] for i in todo], dispatcher.max_concurrency))
+        except Exception as e:
+            elapsed = time.perf_counter() - t0
+            outcomes = [e] * len(todo)
+        else:
+            elapsed = time.perf_counter() - t0
+
+        for i, outcome in zip(todo, outcomes):
+            if isinstance(outcome, BaseException):
+                results[i] = _build_result(params[i], False, {}, f"snmp error: {outcome.__class__.__name__}: {outcome}", elapsed)
+            else:
+                ok, values, err, dt, tables, shared = outcome
+                results[i] = _build_result(params[i], ok, values, err, dt)
+                if tables:
+                    results[i]["metrics"]["snmp_tables"] = tables
+                if shared:
+                    results[i]["metrics"]["probe_coalesced"] = True
+
+    return [r for r in results if r is not None]
+
+
+def _snmp_get_sys(ip: str, community: str, port: int, timeout_s: int, retries: int) -> Tuple[bool, Dict[str, Any], Optional[str]]:
+    """
+    GET minimal sysDescr.0 / sysUpTime.0 (compatibilité): passe par l'engine partagé.
+    """
+    out = probe_many([{"ip": ip, "snmp": {"community": community, "port": port,
+                                          "timeout_s": timeout_s, "retries": retries}}])[0]
+    m = out.get("metrics") or {}
+    keep = {k: m[k] for k in ("sys_descr", "sys_uptime") if k in m}
+    if out.get("status") == "online":
+        return True, {"snmp_ok": True, "snmp_port": port, **keep}, None
+    return False, {}, out.get("detail")
+
+
+def probe(device: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Entrypoint standard attendu par drivers/registry.py
+
+    Input: device dict
+    Output:
+      {
+        "status": "online"|"offline"|"unknown",
+        "detail": "<string|None>",
+        "metrics": { ... }
+      }
+    """
+    out = probe_many([device])[0]
+    out.pop("_elapsed_s", None)
+    return out
 
 
 # -------------------------------------------------------------------
 # Compatibilité backward
 # -------------------------------------------------------------------
 def collect(device: Dict[str, Any]) -> Dict[str, Any]:
-    return probe(device)
\ No newline at end of file
+    return probe(device)
@@ -0,0 +1,223 @@
+# agent/src/drivers/snmp_ber.py
+"""
+Codec BER minimal pour SNMP v1/v2c: sondage de masse sans pysnmp (src/discovery.py)
+et agents SNMP simulés (simulator/snmp_agent.py).
+
+Couvre: INTEGER, OCTET STRING, NULL, OBJECT IDENTIFIER, SEQUENCE,
+Counter32/Gauge32/TimeTicks/Counter64, exceptions noSuchObject/endOfMibView,
+et les PDU GetRequest/GetNextRequest/GetResponse/GetBulkRequest.
+"""
+from __future__ import annotations
+
+from typing import Any, List, Tuple
+
+# Tags universels
+INTEGER = 0x02
+OCTET_STRING = 0x04
+NULL = 0x05
+OID = 0x06
+SEQUENCE = 0x30
+
+# Types applicatifs SNMP
+IP_ADDRESS = 0x40
+COUNTER32 = 0x41
+GAUGE32 = 0x42
+TIMETICKS = 0x43
+COUNTER64 = 0x46
+
+# Exceptions varbind (v2c)
+NO_SUCH_OBJECT = 0x80
+NO_SUCH_INSTANCE = 0x81
+END_OF_MIB_VIEW = 0x82
+
+# PDU
+GET_REQUEST = 0xA0
+GET_NEXT_REQUEST = 0xA1
+GET_RESPONSE = 0xA2
+GET_BULK_REQUEST = 0xA5
+
+
+class BERError(ValueError):
+    pass
+
+
+# -------------------------------------------------------------------
+# Encodage
+# -------------------------------------------------------------------
+def encode_length(n: int) -> bytes:
+    if n < 0x80:
+        return bytes([n])
+    out = n.to_bytes((n.bit_length() + 7) // 8, "big")
+    return bytes([0x80 | len(out)]) + out
+
+
+def encode_tlv(tag: int, value: bytes) -> bytes:
+    return bytes([tag]) + encode_length(len(value)) + value
+
+
+def encode_int(v: int, tag: int = INTEGER) -> bytes:
+    if tag == INTEGER:
+        length = max(1, (v + (v < 0)).bit_length() // 8 + 1)
+        return encode_tlv(tag, v.to_bytes(length, "big", signed=True))
+    # Types non signés (Counter/Gauge/TimeTicks): éviter le bit de signe
+    length = max(1, v.bit_length() // 8 + 1)
+    return encode_tlv(tag, v.to_bytes(length, "big", signed=False))
+
+
+def encode_octets(v: Any) -> bytes:
+    if isinstance(v, str):
+        v = v.encode("utf-8")
+    return encode_tlv(OCTET_STRING, bytes(v))
+
+
+def encode_null(tag: int = NULL) -> bytes:
+    return bytes([tag, 0])
+
+
+def encode_oid(oid: str) -> bytes:
+    parts = [int(p) for p in oid.strip(".").split(".") if p != ""]
+    if len(parts) < 2:
+        raise BERError(f"invalid oid: {oid}")
+    body = bytearray([parts[0] * 40 + parts[1]])
+    for p in parts[2:]:
+        chunk = [p & 0x7F]
+        p >>= 7
+        while p:
+            chunk.append(0x80 | (p & 0x7F))
+            p >>= 7
+        body.extend(reversed(chunk))
+    return encode_tlv(OID, bytes(body))
+
+
+def encode_sequence(*items: bytes, tag: int = SEQUENCE) -> bytes:
+    return encode_tlv(tag, b"".join(items))
+
+
+def encode_value(value: Any) -> bytes:
+    """
+    Encode une valeur Python:
+      - (tag, int) pour les types applicatifs (ex: (TIMETICKS, 12345))
+      - int -> INTEGER, str/bytes -> OCTET STRING, None -> NULL
+    """
+    if isinstance(value, tuple) and len(value) == 2:
+        tag, v = value
+        if tag in (NO_SUCH_OBJECT, NO_SUCH_INSTANCE, END_OF_MIB_VIEW, NULL):
+            return encode_null(tag)
+        if tag == OID:
+            return encode_oid(v)
+        if tag == OCTET_STRING:
+            return encode_octets(v)
+        return encode_int(int(v), tag)
+    if value is None:
+        return encode_null()
+    if isinstance(value, bool):
+        return encode_int(int(value))
+    if isinstance(value, int):
+        return encode_int(value)
+    return encode_octets(value)
+
+
+def encode_message(version: int, community: str, pdu_tag: int, request_id: int,
+                   error_status: int, error_index: int, varbinds: List[Tuple[str, Any]]) -> bytes:
+    vbs = encode_sequence(*[encode_sequence(encode_oid(o), encode_value(v)) for o, v in varbinds])
+    pdu = encode_sequence(
+        encode_int(request_id), encode_int(error_status), encode_int(error_index), vbs, tag=pdu_tag
+    )
+    return encode_sequence(encode_int(version), encode_octets(community), pdu)
+
+
+# -------------------------------------------------------------------
+# Décodage
+# -------------------------------------------------------------------
+def decode_tlv(data: bytes, pos: int = 0) -> Tuple[int, bytes, int]:
+    """Retourne (tag, value, next_pos)."""
+    if pos + 2 > len(data):
+        raise BERError("truncated tlv")
+    tag = data[pos]
+    length = data[pos + 1]
+    pos += 2
+    if length & 0x80:
+        n = length & 0x7F
+        if n == 0 or pos + n > len(data):
+            raise BERError("invalid length")
+        length = int.from_bytes(data[pos:pos + n], "big")
+        pos += n
+    end = pos + length
+    if end > len(data):
+        raise BERError("truncated value")
+    return tag, data[pos:end], end
+
+
+def decode_int(value: bytes, signed: bool = True) -> int:
+    if not value:
+        return 0
+    return int.from_bytes(value, "big", signed=signed)
+
+
+def decode_oid(value: bytes) -> str:
+    if not value:
+        raise BERError("empty oid")
+    first = value[0]
+    parts = [first // 40, first % 40] if first < 80 else [2, first - 80]
+    n = 0
+    for b in value[1:]:
+        n = (n << 7) | (b & 0x7F)
+        if not b & 0x80:
+            parts.append(n)
+            n = 0
+    return ".".join(str(p) for p in parts)
+
+
+def decode_value(tag: int, value: bytes) -> Any:
+    if tag == INTEGER:
+        return decode_int(value)
+    if tag in (COUNTER32, GAUGE32, TIMETICKS, COUNTER64):
+        return (tag, decode_int(value, signed=False))
+    if tag == OCTET_STRING:
+        return value
+    if tag == OID:
+        return (OID, decode_oid(value))
+    if tag == IP_ADDRESS:
+        return ".".join(str(b) for b in value)
+    if tag in (NULL, NO_SUCH_OBJECT, NO_SUCH_INSTANCE, END_OF_MIB_VIEW):
+        return (tag, None)
+    return value
+
+
+def decode_message(data: bytes) -> Tuple[int, str, int, int, int, int, List[Tuple[str, Any]]]:
+    """
+    Retourne (version, community, pdu_tag, request_id, err_status|non_repeaters,
+              err_index|max_repetitions, varbinds)
+    """
+    tag, msg, _ = decode_tlv(data)
+    if tag != SEQUENCE:
+        raise BERError("not a sequence")
+
+    t, v, pos = decode_tlv(msg, 0)
+    version = decode_int(v)
+    t, v, pos = decode_tlv(msg, pos)
+    community = v.decode("latin-1")
+    pdu_tag, pdu, _ = decode_tlv(msg, pos)
+
+    t, v, p = decode_tlv(pdu, 0)
+    request_id = decode_int(v)
+    t, v, p = decode_tlv(pdu, p)
+    f1 = decode_int(v)
+    t, v, p = decode_tlv(pdu, p)
+    f2 = decode_int(v)
+    t, vbs, _ = decode_tlv(pdu, p)
+
+    varbinds: List[Tuple[str, Any]] = []
+    q = 0
+    while q < len(vbs):
+        _, vb, q = decode_tlv(vbs, q)
+        t_oid, v_oid, r = decode_tlv(vb, 0)
+        t_val, v_val, _ = decode_tlv(vb, r)
+        varbinds.append((decode_oid(v_oid), decode_value(t_val, v_val)))
+
+    return version, community, pdu_tag, request_id, f1, f2, varbinds
+
+
+def oid_key(oid: str) -> Tuple[int, ...]:
+    """Clé de tri lexicographique SNMP."""
+    return tuple(int(p) for p in oid.strip(".").split(".") if p != "")
@@ -0,0 +1,338 @@
+# agent/src/drivers/snmp_tables.py
+"""
+Tables SNMP (GETBULK): déclarations, cadence et calcul des débits.
+
+Bloc snmp du device:
+    "snmp": {
+      "community": "public",
+      "tables": {
+        "ifTable": {"interval_s": 300},
+        "entSensor": {},
+        "dsp_channels": {"oid": "1.3.6.1.4.1.x.y.1",          # OID de l'entrée (…Entry)
+                         "columns": {"level": 3, "rx": 5},   # optionnel (sinon walk complet)
+                         "counters": ["rx"],                 # colonnes à traiter en compteur
+                         "max_repetitions": 20, "interval_s": 60}
+      }
+    }
+    (liste acceptée aussi: ["ifTable", "ifXTable", {"name": "dsp", "oid": "..."}])
+
+Les compteurs (Counter32/Counter64 ou déclarés dans "counters") ne sont jamais
+remontés bruts: seul "<colonne>_per_s" (delta / durée depuis l'échantillon
+précédent, wrap 32 bits géré, remise à zéro sur reboot) part au backend.
+"""
+from __future__ import annotations
+
+import re
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_TABLE_INTERVAL_S = 300
+MIN_TABLE_INTERVAL_S = 10
+MAX_TABLES_PER_DEVICE = 16
+MAX_ROWS_PER_TABLE = 4096
+
+# Nombre de varbinds visé par réponse GETBULK (tient dans ~1 datagramme)
+_VARBINDS_PER_RESPONSE = 100
+
+_OID_RE = re.compile(r"^\.?\d+(\.\d+)+$")
+
+COUNTER_TYPES = ("Counter32", "Counter64")
+_WRAP_32 = 1 << 32
+
+# Tables standard: (OID de l'entrée, {colonne: sous-identifiant})
+PRESETS: Dict[str, Tuple[str, Dict[str, int]]] = {
+    # IF-MIB::ifTable
+    "ifTable": ("1.3.6.1.2.1.2.2.1", {
+        "descr": 2,
+        "speed": 5,
+        "admin_status": 7,
+        "oper_status": 8,
+        "in_octets": 10,
+        "in_discards": 13,
+        "in_errors": 14,
+        "out_octets": 16,
+        "out_discards": 19,
+        "out_errors": 20,
+    }),
+    # IF-MIB::ifXTable (compteurs 64 bits, liens >= 1 Gb/s)
+    "ifXTable": ("1.3.6.1.2.1.31.1.1.1", {
+        "name": 1,
+        "hc_in_octets": 6,
+        "hc_out_octets": 10,
+        "high_speed": 15,
+        "alias": 18,
+    }),
+    # ENTITY-SENSOR-MIB::entPhySensorTable
+    "entSensor": ("1.3.6.1.2.1.99.1.1.1", {
+        "type": 1,
+        "scale": 2,
+        "precision": 3,
+        "value": 4,
+        "oper_status": 5,
+        "units": 6,
+    }),
+}
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    name: str
+    oid: str
+    columns: Tuple[Tuple[str, int], ...]  # vide = walk complet de l'entrée
+    counters: Tuple[str, ...]
+    max_repetitions: int
+    interval_s: int
+
+    def walk_roots(self) -> List[str]:
+        if not self.columns:
+            return [self.oid]
+        return [f"{self.oid}.{sub}" for _, sub in self.columns]
+
+    def cache_key(self) -> Tuple[Any, ...]:
+        return (self.oid, self.columns, self.max_repetitions)
+
+
+def _safe_int(x: Any, default: int) -> int:
+    try:
+        return int(str(x).strip())
+    except Exception:
+        return default
+
+
+def default_max_repetitions(ncols: int) -> int:
+    return max(5, min(50, _VARBINDS_PER_RESPONSE // max(1, ncols)))
+
+
+def _spec_from(name: str, raw: Dict[str, Any]) -> Optional[TableSpec]:
+    preset = PRESETS.get(name) if not raw.get("oid") else None
+    if preset is not None:
+        oid, cols = preset
+        columns = tuple(cols.items())
+    else:
+        oid = str(raw.get("oid") or "").strip().lstrip(".")
+        if not _OID_RE.match(oid):
+            return None
+        cols_raw = raw.get("columns")
+        columns = ()
+        if isinstance(cols_raw, dict):
+            columns = tuple(
+                (str(k), _safe_int(v, 0)) for k, v in cols_raw.items() if _safe_int(v, 0) > 0
+            )
+
+    counters_raw = raw.get("counters")
+    counters = tuple(str(c) for c in counters_raw) if isinstance(counters_raw, list) else ()
+
+    max_rep = _safe_int(raw.get("max_repetitions"), 0)
+    if max_rep <= 0:
+        max_rep = default_max_repetitions(len(columns) or 1)
+
+    interval_s = max(MIN_TABLE_INTERVAL_S, _safe_int(raw.get("interval_s"), DEFAULT_TABLE_INTERVAL_S))
+    return TableSpec(
+        name=name,
+        oid=oid,
+        columns=columns,
+        counters=counters,
+        max_repetitions=min(max_rep, 200),
+        interval_s=interval_s,
+    )
+
+
+def parse_tables(snmp_cfg: Dict[str, Any]) -> List[TableSpec]:
+    """
+    snmp.tables -> [TableSpec] (entrées invalides ignorées).
+    """
+    raw = snmp_cfg.get("tables")
+    entries: List[Tuple[str, Dict[str, Any]]] = []
+    if isinstance(raw, dict):
+        for k, v in raw.items():
+            entries.append((str(k), v if isinstance(v, dict) else {}))
+    elif isinstance(raw, list):
+        for entry in raw:
+            if isinstance(entry, str):
+                entries.append((entry, {}))
+            elif isinstance(entry, dict) and (entry.get("name") or entry.get("oid")):
+                entries.append((str(entry.get("name") or entry["oid"]), entry))
+
+    out: List[TableSpec] = []
+    seen = set()
+    for name, cfg in entries:
+        name = name.strip()
+        if not name or name in seen:
+            continue
+        spec = _spec_from(name, cfg)
+        if spec is None:
+            continue
+        seen.add(name)
+        out.append(spec)
+        if len(out) >= MAX_TABLES_PER_DEVICE:
+            break
+    return out
+
+
+def split_rows(spec: TableSpec, walked: Dict[str, Dict[str, Tuple[str, Any]]]) -> Dict[str, Dict[str, Tuple[str, Any]]]:
+    """
+    Résultat de walk {racine: {suffixe: (type, valeur)}} -> {index: {colonne: (type, valeur)}}
+    """
+    rows: Dict[str, Dict[str, Tuple[str, Any]]] = {}
+    if spec.columns:
+        for (col, _), root in zip(spec.columns, spec.walk_roots()):
+            for index, tv in (walked.get(root) or {}).items():
+                rows.setdefault(index, {})[col] = tv
+        return rows
+
+    # Walk complet: suffixe = "<colonne>.<index>"
+    for suffix, tv in (walked.get(spec.oid) or {}).items():
+        col, _, index = suffix.partition(".")
+        if index:
+            rows.setdefault(index, {})[col] = tv
+    return rows
+
+
+# -------------------------------------------------------------------
+# Etat entre cycles: cadence + échantillons précédents des compteurs
+# -------------------------------------------------------------------
+class _TableState:
+    __slots__ = ("walked_at", "counters", "result")
+
+    def __init__(self) -> None:
+        self.walked_at = 0.0
+        self.counters: Dict[Tuple[str, str], Tuple[int, float]] = {}
+        self.result: Optional[Dict[str, Any]] = None
+
+
+_LOCK = threading.Lock()
+_STATES: Dict[Tuple[str, int, str], _TableState] = {}
+# Dernier sysUpTime vu par équipement (détection de reboot => compteurs remis à zéro)
+_UPTIMES: Dict[Tuple[str, int], int] = {}
+
+
+def _state(ip: str, port: int, name: str) -> _TableState:
+    key = (ip, port, name)
+    st = _STATES.get(key)
+    if st is None:
+        st = _STATES[key] = _TableState()
+    return st
+
+
+def due_tables(ip: str, port: int, specs: List[TableSpec], now_mono: Optional[float] = None) -> List[TableSpec]:
+    """Tables dont l'intervalle est écoulé (à walker ce cycle)."""
+    now_mono = time.monotonic() if now_mono is None else now_mono
+    with _LOCK:
+        return [s for s in specs if now_mono - _state(ip, port, s.name).walked_at >= s.interval_s]
+
+
+def note_uptime(ip: str, port: int, uptime: Any) -> bool:
+    """
+    Enregistre le sysUpTime; True si l'équipement a redémarré depuis le dernier
+    échantillon (les compteurs précédents ne sont alors plus comparables).
+    """
+    if not isinstance(uptime, int):
+        return False
+    with _LOCK:
+        prev = _UPTIMES.get((ip, port))
+        _UPTIMES[(ip, port)] = uptime
+    return prev is not None and uptime < prev
+
+
+def _rate(prev: Tuple[int, float], cur: int, now_mono: float, type_name: str) -> Optional[float]:
+    prev_val, prev_t = prev
+    dt = now_mono - prev_t
+    if dt <= 0:
+        return None
+    delta = cur - prev_val
+    if delta < 0:
+        if type_name != "Counter32":
+            # Counter64 ne boucle pas en pratique: discontinuité
+            return None
+        delta += _WRAP_32
+    return round(delta / dt, 3)
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+def record_walk(
+    ip: str,
+    port: int,
+    spec: TableSpec,
+    rows: Dict[str, Dict[str, Tuple[str, Any]]],
+    rebooted: bool = False,
+    now_mono: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Convertit un walk en sortie métriques et met à jour l'état du device:
+      {"ts": iso, "interval_s": n, "rows": {index: {colonne: valeur, compteur_per_s: débit}}}
+    """
+    now_mono = time.monotonic() if now_mono is None else now_mono
+    explicit = set(spec.counters)
+    out_rows: Dict[str, Dict[str, Any]] = {}
+
+    with _LOCK:
+        st = _state(ip, port, spec.name)
+        prev_counters = {} if rebooted else st.counters
+        new_counters: Dict[Tuple[str, str], Tuple[int, float]] = {}
+
+        for index, cols in rows.items():
+            row: Dict[str, Any] = {}
+            for col, (type_name, value) in cols.items():
+                if (type_name in COUNTER_TYPES or col in explicit) and isinstance(value, int):
+                    key = (index, col)
+                    new_counters[key] = (value, now_mono)
+                    prev = prev_counters.get(key)
+                    if prev is not None:
+                        rate = _rate(prev, value, now_mono, type_name)
+                        if rate is not None:
+                            row[f"{col}_per_s"] = rate
+                    continue
+                row[col] = value
+            out_rows[index] = row
+            if len(out_rows) >= MAX_ROWS_PER_TABLE:
+                break
+
+        # Les lignes disparues (interfaces supprimées) sortent de l'état
+        st.counters = new_counters
+        st.walked_at = now_mono
+        st.result = {"ts": _iso(time.time()), "interval_s": spec.interval_s, "rows": out_rows}
+        return st.result
+
+
+def record_error(ip: str, port: int, spec: TableSpec, error: str, now_mono: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Walk en échec: on réessaie au prochain intervalle, la dernière sortie valide est gardée.
+    """
+    now_mono = time.monotonic() if now_mono is None else now_mono
+    with _LOCK:
+        st = _state(ip, port, spec.name)
+        st.walked_at = now_mono
+        out = dict(st.result or {"rows": {}})
+        out["error"] = error
+        return out
+
+
+def last_result(ip: str, port: int, name: str) -> Optional[Dict[str, Any]]:
+    with _LOCK:
+        st = _STATES.get((ip, port, name))
+        return st.result if st is not None else None
+
+
+def forget(ip: str, port: int, keep: List[str]) -> None:
+    """Purge l'état des tables retirées de la config d'un device."""
+    with _LOCK:
+        for key in [k for k in _STATES if k[0] == ip and k[1] == port and k[2] not in keep]:
+            del _STATES[key]
+
+
+def prune(keep: Iterable[Tuple[str, int]]) -> int:
+    """Purge l'état (tables, sysUpTime) des équipements (ip, port) retirés de la config."""
+    keep_set = set(keep)
+    with _LOCK:
+        gone = [k for k in _STATES if (k[0], k[1]) not in keep_set]
+        for key in gone:
+            del _STATES[key]
+        for key in [k for k in _UPTIMES if k not in keep_set]:
+            del _UPTIMES[key]
+    return len(gone)
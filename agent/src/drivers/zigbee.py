@@ -10,6 +10,11 @@ Logique:
 - last_seen >= 60 min → offline
 - MQTT down ou device absent → unknown
 
+Mesures fréquentes (température, CO2, puissance...): en plus de la dernière valeur,
+<champ>_min / _max / _avg / _samples depuis le report précédent du device (suit
+l'intervalle ok/ko et les micro-rapports), <champ>_truncated si l'historique n'a
+pas tout couvert.
+
 Aucune exception levée (isolation garantie).
 """
 
@@ -236,6 +241,25 @@ def probe(device: Dict[str, Any]) -> Dict[str, Any]:
                 except:
                     metrics[field] = value
 
+    # -----------------------------------------------------------
+    # Agrégats depuis le report précédent (la dernière valeur est déjà <champ>)
+    # -----------------------------------------------------------
+
+    try:
+        window_s, aggregates = mqtt.report_device_aggregates(friendly_name)
+    except Exception:
+        window_s, aggregates = 0.0, {}
+    for field, agg in aggregates.items():
+        metrics[f"{field}_min"] = round(agg["min"], 3)
+        metrics[f"{field}_max"] = round(agg["max"], 3)
+        metrics[f"{field}_avg"] = round(agg["avg"], 3)
+        metrics[f"{field}_samples"] = agg["samples"]
+        if agg["truncated"]:
+            metrics[f"{field}_truncated"] = True
+        metrics.setdefault(field, agg["last"])
+    if aggregates:
+        metrics["history_window_s"] = int(window_s)
+
     # -----------------------------------------------------------
     # Flags additionnels
     # -----------------------------------------------------------
@@ -0,0 +1,272 @@
+# agent/src/metrics.py
+"""
+Métriques internes de l'agent (exposées via /metrics au format Prometheus texte).
+
+Objectif: dimensionner concurrence et timeouts sur chaque site.
+
+- Compteurs (probes en erreur/timeout, messages MQTT, cycles en dépassement)
+- Jauges (durée du dernier cycle, intervalle courant, débit MQTT)
+- Histogrammes à buckets fixes (durée des probes par driver, durée de cycle,
+  latence et taille d'envoi, temps de chargement config)
+
+Aucune dépendance externe: un registre thread-safe minimal suffit ici.
+
+Usage:
+    from src import metrics
+    metrics.observe("agent_probe_duration_seconds", 0.12, driver="snmp")
+    metrics.inc("agent_probe_errors_total", driver="snmp")
+    text = metrics.render_prometheus()
+"""
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# Buckets par défaut (secondes): couvre le LAN rapide jusqu'au timeout WAN
+DEFAULT_BUCKETS_S: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+
+# Buckets taille payload (octets)
+BYTES_BUCKETS: Tuple[float, ...] = (
+    1_000, 5_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000,
+)
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((str(k), str(v)) for k, v in labels.items()))
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key)
+    if extra is not None:
+        items.append(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets: Tuple[float, ...] = tuple(buckets)
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)  # dernier = +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Registre thread-safe (compteurs, jauges, histogrammes) indexé par nom + labels.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._help: Dict[str, str] = {}
+        self._types: Dict[str, str] = {}
+        self._bucket_defs: Dict[str, Tuple[float, ...]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+
+    # --------------------------------------------------------------
+    # Déclaration
+    # --------------------------------------------------------------
+    def describe(
+        self,
+        name: str,
+        mtype: str,
+        help_text: str,
+        buckets: Optional[Sequence[float]] = None,
+    ) -> None:
+        with self._lock:
+            self._types[name] = mtype
+            self._help[name] = help_text
+            if mtype == "histogram":
+                self._bucket_defs[name] = tuple(buckets or DEFAULT_BUCKETS_S)
+
+    # --------------------------------------------------------------
+    # Mise à jour
+    # --------------------------------------------------------------
+    def inc(self, name: str, amount: float = 1.0, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    def set_gauge(self, name: str, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._gauges.setdefault(name, {})[key] = float(value)
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            h = series.get(key)
+            if h is None:
+                h = _Histogram(self._bucket_defs.get(name, DEFAULT_BUCKETS_S))
+                series[key] = h
+            h.observe(float(value))
+
+    # --------------------------------------------------------------
+    # Lecture
+    # --------------------------------------------------------------
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Vue JSON (debug / UI): {name: {labels_str: value|{count,sum}}}
+        """
+        out: Dict[str, Any] = {}
+        with self._lock:
+            for name, series in self._counters.items():
+                out[name] = {_fmt_labels(k) or "": v for k, v in series.items()}
+            for name, series in self._gauges.items():
+                out[name] = {_fmt_labels(k) or "": v for k, v in series.items()}
+            for name, series in self._histograms.items():
+                out[name] = {
+                    _fmt_labels(k) or "": {"count": h.count, "sum": round(h.total, 6)}
+                    for k, h in series.items()
+                }
+        return out
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            names = sorted(set(self._counters) | set(self._gauges) | set(self._histograms))
+            for name in names:
+                mtype = self._types.get(name)
+                if mtype is None:
+                    mtype = "counter" if name in self._counters else ("gauge" if name in self._gauges else "histogram")
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {mtype}")
+
+                if name in self._counters:
+                    for key, v in sorted(self._counters[name].items()):
+                        lines.append(f"{name}{_fmt_labels(key)} {_fmt_value(v)}")
+                if name in self._gauges:
+                    for key, v in sorted(self._gauges[name].items()):
+                        lines.append(f"{name}{_fmt_labels(key)} {_fmt_value(v)}")
+                if name in self._histograms:
+                    for key, h in sorted(self._histograms[name].items()):
+                        cumulative = 0
+                        for bound, c in zip(h.buckets, h.counts):
+                            cumulative += c
+                            lines.append(f"{name}_bucket{_fmt_labels(key, ('le', _fmt_value(bound)))} {cumulative}")
+                        cumulative += h.counts[-1]
+                        lines.append(f"{name}_bucket{_fmt_labels(key, ('le', '+Inf'))} {cumulative}")
+                        lines.append(f"{name}_sum{_fmt_labels(key)} {_fmt_value(h.total)}")
+                        lines.append(f"{name}_count{_fmt_labels(key)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+class RateMeter:
+    """
+    Débit glissant (événements/s) sur une fenêtre, sans timer: calculé à la lecture.
+    """
+
+    def __init__(self, window_s: float = 60.0) -> None:
+        self._window_s = window_s
+        self._lock = threading.Lock()
+        self._bucket_start = time.monotonic()
+        self._current = 0
+        self._previous = 0
+
+    def mark(self, n: int = 1) -> None:
+        with self._lock:
+            self._roll(time.monotonic())
+            self._current += n
+
+    def _roll(self, now: float) -> None:
+        elapsed = now - self._bucket_start
+        if elapsed >= self._window_s:
+            # Une fenêtre complète écoulée: on bascule (ou on remet à zéro si > 2 fenêtres)
+            self._previous = self._current if elapsed < 2 * self._window_s else 0
+            self._current = 0
+            self._bucket_start = now - (elapsed % self._window_s)
+
+    def rate(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._roll(now)
+            frac = (now - self._bucket_start) / self._window_s
+            # Pondération de la fenêtre précédente (approximation sliding window)
+            estimate = self._previous * (1.0 - frac) + self._current
+            return estimate / self._window_s
+
+
+# -------------------------------------------------------------------
+# Registre global de l'agent
+# -------------------------------------------------------------------
+REGISTRY = MetricsRegistry()
+
+REGISTRY.describe("agent_probe_duration_seconds", "histogram", "Durée d'une probe par driver")
+REGISTRY.describe("agent_probe_total", "counter", "Nombre de probes exécutées par driver et statut")
+REGISTRY.describe("agent_probe_errors_total", "counter", "Probes en erreur (exception, retour invalide, unknown)")
+REGISTRY.describe("agent_probe_timeouts_total", "counter", "Probes terminées en timeout")
+REGISTRY.describe("agent_cycle_duration_seconds", "histogram", "Durée murale d'un cycle de collecte")
+REGISTRY.describe("agent_cycle_last_duration_seconds", "gauge", "Durée du dernier cycle de collecte")
+REGISTRY.describe("agent_cycle_interval_seconds", "gauge", "Intervalle de collecte courant")
+REGISTRY.describe("agent_cycle_devices", "gauge", "Nombre d'équipements collectés au dernier cycle")
+REGISTRY.describe("agent_cycle_overrun_total", "counter", "Cycles plus longs que l'intervalle de collecte")
+REGISTRY.describe("agent_cycle_overrun_seconds", "gauge", "Dépassement du dernier cycle (0 si dans les temps)")
+REGISTRY.describe("agent_send_duration_seconds", "histogram", "Latence de l'envoi au backend")
+REGISTRY.describe("agent_send_payload_bytes", "histogram", "Taille du payload envoyé au backend", buckets=BYTES_BUCKETS)
+REGISTRY.describe("agent_send_total", "counter", "Envois au backend par résultat")
+REGISTRY.describe("agent_config_load_duration_seconds", "histogram", "Temps de chargement de config.json")
+REGISTRY.describe("agent_probe_coalesced_total", "counter", "Probes évités: même équipement déjà sondé dans le cycle (résultat partagé)")
+REGISTRY.describe("agent_probe_srtt_seconds", "gauge", "RTT lissé des probes par driver (tous devices)")
+REGISTRY.describe("agent_probe_rto_seconds", "gauge", "Timeout adaptatif agrégé par driver (SRTT + 4*RTTVAR)")
+REGISTRY.describe("agent_state_flush_duration_seconds", "histogram", "Ecriture de l'état runtime des devices (par cycle)")
+REGISTRY.describe("agent_micro_reports_total", "counter", "Envois hors cycle déclenchés par un changement Zigbee")
+REGISTRY.describe("agent_micro_report_devices_total", "counter", "Devices envoyés dans les micro-rapports")
+REGISTRY.describe("agent_mqtt_messages_total", "counter", "Messages MQTT reçus par type de topic")
+REGISTRY.describe("agent_mqtt_messages_per_second", "gauge", "Débit MQTT glissant (fenêtre 60 s)")
+REGISTRY.describe("agent_mqtt_dropped_total", "counter", "Messages MQTT remplacés par un plus récent du même device (file de parsing pleine)")
+
+MQTT_RATE = RateMeter(window_s=60.0)
+
+
+def inc(name: str, amount: float = 1.0, **labels: Any) -> None:
+    REGISTRY.inc(name, amount, **labels)
+
+
+def set_gauge(name: str, value: float, **labels: Any) -> None:
+    REGISTRY.set_gauge(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels: Any) -> None:
+    REGISTRY.observe(name, value, **labels)
+
+
+def render_prometheus() -> str:
+    # Jauge calculée à la lecture (pas de timer dédié)
+    REGISTRY.set_gauge("agent_mqtt_messages_per_second", round(MQTT_RATE.rate(), 3))
+    return REGISTRY.render_prometheus()
+
+
+def snapshot() -> Dict[str, Any]:
+    REGISTRY.set_gauge("agent_mqtt_messages_per_second", round(MQTT_RATE.rate(), 3))
+    return REGISTRY.snapshot()
@@ -4,8 +4,9 @@ Client MQTT singleton pour communication avec Zigbee2MQTT.
 
 Architecture:
 - Un seul client MQTT pour tous les devices Zigbee (singleton pattern)
-- Thread background pour message loop (paho.mqtt)
-- Cache d'état thread-safe avec TTL 5 min
+- Thread background pour message loop (paho.mqtt): routage du topic et mise en file seulement
+- Thread de parsing: décodage JSON (orjson si installé) et mise à jour du cache
+- Cache d'état thread-safe, borné (LRU/TTL, index ieee): voir zigbee_cache.py
 - Reconnexion automatique avec backoff exponentiel
 - TLS mandatory (pas de fallback en clair)
 
@@ -19,16 +20,98 @@ from __future__ import annotations
 
 import json
 import os
+import queue
 import threading
 import time
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from src import metrics as agent_metrics
+from src.logs import get_logger
+from src.zigbee_cache import ZigbeeRecord, ZigbeeStateCache
+
+log = get_logger(__name__)
 
 try:
     import paho.mqtt.client as mqtt
     MQTT_AVAILABLE = True
 except ImportError:
     MQTT_AVAILABLE = False
-    print("WARNING: paho-mqtt not installed. Zigbee support disabled.")
+    log.warning("paho-mqtt not installed, Zigbee support disabled")
+
+try:
+    import orjson  # optionnel: décodage 3-10x plus rapide des gros bridge/devices
+    _json_loads: Callable[[bytes], Any] = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:
+    _json_loads = json.loads
+    JSON_BACKEND = "json"
+
+# Messages en attente de parsing au-delà desquels le thread réseau bascule sur
+# le débordement (dernier payload par (kind, friendly_name), le plus récent l'emporte)
+try:
+    PARSE_QUEUE_MAX = max(1, int(os.getenv("AVMVP_MQTT_QUEUE_MAX", "10000")))
+except ValueError:
+    PARSE_QUEUE_MAX = 10000
+
+# Topics décodés par le thread de parsing (les autres sont seulement comptés)
+_PARSED_KINDS = frozenset(("bridge_devices", "bridge_state", "device_state"))
+# zigbee2mqtt/<nom> qui ne sont pas des devices
+_NOT_DEVICES = frozenset(("bridge", "coordinator"))
+
+
+# Champs dont un changement doit remonter sans attendre le cycle de collecte
+# (alarmes, états): contact ouvert, fuite d'eau, fumée, sabotage, batterie faible...
+ALERT_FIELDS = (
+    "contact",
+    "water_leak",
+    "smoke",
+    "gas",
+    "carbon_monoxide",
+    "tamper",
+    "battery_low",
+    "state",
+)
+
+# Device revu après ce silence: il était "offline" pour le driver (cf. drivers/zigbee.py)
+OFFLINE_AFTER_S = 3600
+
+# Abonnés notifiés (hors lock) d'un changement significatif: fn("zigbee:<friendly_name>")
+_CHANGE_LISTENERS: List[Callable[[str], None]] = []
+
+
+def on_device_change(fn: Callable[[str], None]) -> None:
+    """Enregistre fn(key), appelée depuis le thread MQTT à chaque changement significatif."""
+    if fn not in _CHANGE_LISTENERS:
+        _CHANGE_LISTENERS.append(fn)
+
+
+# Abonnés notifiés (hors lock) d'une connexion/déconnexion au broker: fn()
+_HEALTH_LISTENERS: List[Callable[[], None]] = []
+
+
+def on_health_change(fn: Callable[[], None]) -> None:
+    """Enregistre fn(), appelée depuis le thread MQTT quand l'état de connexion change."""
+    if fn not in _HEALTH_LISTENERS:
+        _HEALTH_LISTENERS.append(fn)
+
+
+def _notify_health_change() -> None:
+    for fn in list(_HEALTH_LISTENERS):
+        try:
+            fn()
+        except Exception as e:
+            log.warning("mqtt health listener error", error=str(e), rate_key="health_listener")
+
+
+def is_relevant_change(prev: Optional[ZigbeeRecord], payload: Dict[str, Any], now: float) -> bool:
+    """
+    True si le message change le statut (apparition, retour après silence) ou un champ d'alerte.
+    """
+    if prev is None:
+        return True
+    if now - prev.cached_at >= OFFLINE_AFTER_S:
+        return True
+    return any(field in payload and payload[field] != prev.get(field) for field in ALERT_FIELDS)
 
 
 class MQTTClientManager:
@@ -52,9 +135,20 @@ class MQTTClientManager:
             self._last_error = "paho-mqtt not installed"
             return
 
-        self._client: Optional[mqtt.Client] = None
-        self._state_cache: Dict[str, Dict[str, Any]] = {}
-        self._bridge_devices: List[Dict[str, Any]] = []
+        self._init_state()
+
+        # Check configuration at init (don't connect yet)
+        self._check_configuration()
+
+    def _init_state(self) -> None:
+        """
+        Initialise le cache et l'état de connexion (sans toucher au réseau).
+
+        Séparé de __init__ pour permettre l'injection de messages sans broker
+        (simulateur / benchmarks, cf. agent/simulator).
+        """
+        self._client: Optional[Any] = None
+        self._state_cache = ZigbeeStateCache()
         self._lock = threading.Lock()
         self._connected = False
         self._thread: Optional[threading.Thread] = None
@@ -65,9 +159,15 @@ class MQTTClientManager:
         self._last_connect_ts: Optional[float] = None
         self._last_error: Optional[str] = None
         self._configured = False  # True si env vars présentes
-
-        # Check configuration at init (don't connect yet)
-        self._check_configuration()
+        # (kind, friendly_name, payload brut) du thread réseau vers le thread de parsing
+        self._queue: "queue.Queue[Optional[Tuple[str, str, bytes]]]" = queue.Queue(maxsize=PARSE_QUEUE_MAX)
+        self._parser: Optional[threading.Thread] = None
+        # File pleine: dernier payload brut par (kind, friendly_name), appliqué par le
+        # thread de parsing quand la file est vide (voir _enqueue / _drain_overflow)
+        self._overflow: Dict[Tuple[str, str], bytes] = {}
+        self._overflow_lock = threading.Lock()
+        self._dropped = 0
+        self._base_topic = os.getenv("AVMVP_MQTT_BASE_TOPIC", "zigbee2mqtt")
 
     def _check_configuration(self):
         """
@@ -82,7 +182,7 @@ class MQTTClientManager:
         base_topic = os.getenv("AVMVP_MQTT_BASE_TOPIC", "zigbee2mqtt")
 
         if not user or not password:
-            print("MQTT configured: no (missing AVMVP_MQTT_USER or AVMVP_MQTT_PASS)")
+            log.info("mqtt not configured (missing AVMVP_MQTT_USER or AVMVP_MQTT_PASS)")
             self._configured = False
             self._last_error = "Missing credentials (AVMVP_MQTT_USER or AVMVP_MQTT_PASS)"
             return
@@ -92,14 +192,14 @@ class MQTTClientManager:
 
         # Configuration valide
         self._configured = True
-        print("MQTT configured: yes")
-        print(f"  Host: {host or 'localhost'}:{port or '1883'}")
-        print(f"  User: {user}")
-        print(f"  Mode: {tls_mode}")
-        print(f"  Base topic: {base_topic}")
-        if ca_path and os.path.exists(ca_path):
-            print(f"  CA cert: {ca_path}")
-        print("  (Connection will be attempted on first use or via init_connection())")
+        log.info(
+            "mqtt configured",
+            host=f"{host or 'localhost'}:{port or '1883'}",
+            user=user,
+            mode=tls_mode,
+            base_topic=base_topic,
+            ca_cert=ca_path if ca_path and os.path.exists(ca_path) else None,
+        )
 
     @classmethod
     def get_instance(cls) -> MQTTClientManager:
@@ -163,12 +263,12 @@ class MQTTClientManager:
         try:
             port = int(port_str)
         except ValueError:
-            print(f"MQTT: Invalid port '{port_str}', using default 1883")
+            log.warning("mqtt invalid port, using default 1883", port=port_str)
             port = 1883
 
         # Validation credentials
         if not user or not password:
-            print("MQTT: Missing credentials (AVMVP_MQTT_USER or AVMVP_MQTT_PASS)")
+            log.warning("mqtt missing credentials (AVMVP_MQTT_USER or AVMVP_MQTT_PASS)")
             return False
 
         # TLS optionnel : si CA fourni et existe, activer TLS
@@ -184,9 +284,9 @@ class MQTTClientManager:
             # TLS (optionnel)
             if use_tls:
                 self._client.tls_set(ca_certs=ca_path)
-                print(f"MQTT: TLS enabled with CA: {ca_path}")
+                log.info("mqtt tls enabled", ca_cert=ca_path)
             else:
-                print("MQTT: Connecting without TLS (non-encrypted)")
+                log.warning("mqtt connecting without TLS (non-encrypted)")
 
             # Callbacks
             self._client.on_connect = self._on_connect
@@ -201,14 +301,14 @@ class MQTTClientManager:
             self._thread = threading.Thread(target=self._loop, daemon=True)
             self._thread.start()
 
-            print(f"MQTT: Connecting to {host}:{port} (TLS)...")
+            log.info("mqtt connecting", host=host, port=port, tls=bool(use_tls))
             self._last_connect_ts = time.time()
             self._last_error = None  # Clear previous errors
             return True
 
         except Exception as e:
             error_msg = f"Connection failed: {e}"
-            print(f"MQTT: {error_msg}")
+            log.error("mqtt connection failed", error=str(e))
             self._connected = False
             self._client = None
             self._last_error = error_msg
@@ -231,7 +331,7 @@ class MQTTClientManager:
                     time.sleep(self._reconnect_delay)
                     self._reconnect_delay = min(60, self._reconnect_delay * 2)
             except Exception as e:
-                print(f"MQTT: Loop error: {e}")
+                log.warning("mqtt loop error", error=str(e))
                 time.sleep(self._reconnect_delay)
                 self._reconnect_delay = min(60, self._reconnect_delay * 2)
 
@@ -244,11 +344,9 @@ class MQTTClientManager:
             self._reconnect_delay = 5  # Reset backoff
             self._last_connect_ts = time.time()
             self._last_error = None
-            print("MQTT connect OK")
-
             # Subscribe à tous les topics Zigbee2MQTT
             client.subscribe(f"{self._base_topic}/#")
-            print(f"MQTT: Subscribed to {self._base_topic}/#")
+            log.info("mqtt connected", subscribed=f"{self._base_topic}/#")
         else:
             self._connected = False
             error_msg = {
@@ -259,62 +357,174 @@ class MQTTClientManager:
                 5: "Connection refused - not authorized"
             }.get(rc, f"Connection refused - code {rc}")
             self._last_error = error_msg
-            print(f"MQTT: {error_msg}")
+            log.error("mqtt connection refused", rc=rc, error=error_msg)
+        _notify_health_change()
 
     def _on_message(self, client, userdata, msg):
         """
-        Callback paho: message reçu.
+        Callback paho (thread réseau): routage du topic et mise en file, sans décodage.
 
-        Parse les topics:
-        - zigbee2mqtt/<friendly_name> → état device
-        - zigbee2mqtt/bridge/devices → liste complète devices
-        - zigbee2mqtt/bridge/state → état broker
+        Le JSON est décodé par le thread de parsing (_parse_loop): un gros
+        bridge/devices ne retarde plus les keepalives ni les lecteurs du cache.
         """
+        kind = "other"
         try:
-            topic = msg.topic
-            payload_raw = msg.payload.decode("utf-8")
+            kind, name = self._route(msg.topic)
+            agent_metrics.inc("agent_mqtt_messages_total", kind=kind)
+            agent_metrics.MQTT_RATE.mark()
+            self._last_message_time = time.time()
 
-            # Ignorer topics non-JSON
-            if not payload_raw or payload_raw[0] not in ['{', '[']:
+            if kind not in _PARSED_KINDS or name in _NOT_DEVICES:
                 return
+            self._ensure_parser()
+            self._enqueue(kind, name, msg.payload)
 
-            payload = json.loads(payload_raw)
+        except Exception as e:
+            log.warning("mqtt message routing error", error=str(e), rate_key=getattr(msg, "topic", ""))
 
-            self._last_message_time = time.time()
+    def _enqueue(self, kind: str, name: str, raw: bytes) -> None:
+        """
+        File de parsing, ou débordement si elle est pleine. Tant que le débordement
+        n'est pas vide, tout y va: il reste plus récent que tout ce qui est en file.
+        Décision sous verrou (sinon un débordement vidé entre-temps resterait en plan).
+        """
+        with self._overflow_lock:
+            if not self._overflow:
+                try:
+                    self._queue.put_nowait((kind, name, raw))
+                    return
+                except queue.Full:
+                    pass
+            superseded = self._overflow.pop((kind, name), None) is not None
+            self._overflow[(kind, name)] = raw
+        if superseded:
+            self._dropped += 1
+            agent_metrics.inc("agent_mqtt_dropped_total", kind=kind)
+        else:
+            log.warning("mqtt parse queue full, message coalesced", kind=kind, rate_key="mqtt_queue_full")
+
+    def _route(self, topic: str) -> Tuple[str, str]:
+        """
+        (kind, friendly_name) d'un topic. kind sert aussi de label de métrique
+        (cardinalité bornée, pas de friendly_name).
+        """
+        prefix = f"{self._base_topic}/"
+        if not topic.startswith(prefix):
+            return "other", ""
+        rest = topic[len(prefix):]
+        if rest == "bridge/devices":
+            return "bridge_devices", ""
+        if rest == "bridge/state":
+            return "bridge_state", ""
+        if rest.startswith("bridge/"):
+            return "bridge_other", ""
+        if "/" in rest:
+            return "device_sub", ""
+        return "device_state", rest
+
+    # ------------------------------------------------------------
+    # Thread de parsing
+    # ------------------------------------------------------------
+    def _ensure_parser(self) -> None:
+        t = self._parser
+        if t is not None and t.is_alive():
+            return
+        with self._lock:
+            if self._parser is None or not self._parser.is_alive():
+                self._parser = threading.Thread(target=self._parse_loop, name="mqtt-parser", daemon=True)
+                self._parser.start()
 
-            # Topic: bridge/devices (liste complète)
-            if topic == f"{self._base_topic}/bridge/devices":
-                with self._lock:
-                    self._bridge_devices = payload
-                print(f"MQTT: Received bridge/devices ({len(payload)} devices)")
+    def _parse_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._handle_message(*item)
+            except Exception as e:
+                # Sur un flux de messages: échantillonné par device
+                log.warning("mqtt message parsing error", error=str(e), rate_key=f"parse:{item[1] if item else ''}")
+            finally:
+                # Avant task_done: wait_idle() couvre aussi le débordement
+                if self._queue.empty():
+                    self._drain_overflow()
+                self._queue.task_done()
+
+    def _drain_overflow(self) -> None:
+        """
+        Applique le débordement une fois la file vide: ses payloads sont plus
+        récents que tout ce qui y était (ordre par (kind, name) préservé).
+        """
+        while True:
+            with self._overflow_lock:
+                if not self._overflow:
+                    return
+                pending, self._overflow = self._overflow, {}
+            for (kind, name), raw in pending.items():
+                try:
+                    self._handle_message(kind, name, raw)
+                except Exception as e:
+                    log.warning("mqtt message parsing error", error=str(e), rate_key=f"parse:{name}")
+            if not self._queue.empty():
+                return
 
-            # Topic: device state (zigbee2mqtt/<friendly_name>)
-            elif topic.startswith(f"{self._base_topic}/") and "/" not in topic[len(self._base_topic)+1:]:
-                friendly_name = topic[len(self._base_topic)+1:]
+    def _handle_message(self, kind: str, friendly_name: str, raw: bytes) -> None:
+        """
+        Décode et applique un message:
+        - zigbee2mqtt/<friendly_name> → état device
+        - zigbee2mqtt/bridge/devices → liste complète devices
+        - zigbee2mqtt/bridge/state → état broker
+        """
+        # Ignorer payloads non-JSON
+        if not raw or raw[:1] not in (b"{", b"["):
+            return
+        try:
+            payload = _json_loads(raw)
+        except ValueError:
+            # JSON invalide (orjson.JSONDecodeError et UnicodeDecodeError en dérivent)
+            return
 
-                # Ignorer topics spéciaux
-                if friendly_name in ["bridge", "coordinator"]:
-                    return
+        # Topic: bridge/devices (liste complète), remplacée d'un bloc
+        if kind == "bridge_devices":
+            evicted = self._state_cache.set_bridge_devices(payload if isinstance(payload, list) else [])
+            log.info("mqtt bridge/devices received", devices=len(payload), evicted=evicted)
 
-                # Stocker état dans cache
-                with self._lock:
-                    key = f"zigbee:{friendly_name}"
-                    self._state_cache[key] = {
-                        **payload,
-                        "friendly_name": friendly_name,
-                        "cached_at": time.time()
-                    }
-
-            # Topic: bridge/state (online/offline)
-            elif topic == f"{self._base_topic}/bridge/state":
-                state = payload.get("state", "unknown")
-                print(f"MQTT: Zigbee2MQTT bridge state: {state}")
-
-        except json.JSONDecodeError:
-            # Payload non-JSON, ignorer
-            pass
-        except Exception as e:
-            print(f"MQTT: Message parsing error: {e}")
+        # Topic: device state (zigbee2mqtt/<friendly_name>)
+        elif kind == "device_state":
+            if not isinstance(payload, dict):
+                return
+
+            # Stocker état dans cache (champs utiles seulement)
+            now = time.time()
+            key = f"zigbee:{friendly_name}"
+            prev = self._state_cache.update(friendly_name, payload, now)
+
+            # Changement d'état/alarme: micro-rapport immédiat (collector, avec debounce)
+            if _CHANGE_LISTENERS and is_relevant_change(prev, payload, now):
+                for fn in list(_CHANGE_LISTENERS):
+                    try:
+                        fn(key)
+                    except Exception as e:
+                        log.warning("mqtt change listener error", error=str(e), rate_key="change_listener")
+
+        # Topic: bridge/state (online/offline)
+        elif kind == "bridge_state" and isinstance(payload, dict):
+            log.info("zigbee2mqtt bridge state", state=payload.get("state", "unknown"))
+
+    def wait_idle(self, timeout: float = 5.0) -> bool:
+        """
+        Attend que tous les messages en file soient appliqués au cache.
+        Pour les tests et le simulateur; False si timeout.
+        """
+        deadline = time.monotonic() + timeout
+        q = self._queue
+        with q.all_tasks_done:
+            while q.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                q.all_tasks_done.wait(remaining)
+        return True
 
     def _on_disconnect(self, client, userdata, rc):
         """
@@ -322,7 +532,8 @@ class MQTTClientManager:
         """
         self._connected = False
         if rc != 0:
-            print(f"MQTT: Unexpected disconnection (code {rc}), will retry...")
+            log.warning("mqtt unexpected disconnection, will retry", rc=rc)
+        _notify_health_change()
 
     def is_connected(self) -> bool:
         """
@@ -367,32 +578,54 @@ class MQTTClientManager:
             return None
 
         try:
-            with self._lock:
-                key = f"zigbee:{friendly_name}" if not friendly_name.startswith("zigbee:") else friendly_name
-                state = self._state_cache.get(key)
-
-                if not state:
-                    return None
-
-                # Vérifier TTL (5 min = 300s)
-                age = time.time() - state.get("cached_at", 0)
-                if age > 300:
-                    # Cache expiré mais on retourne quand même (stale data > no data)
-                    state["stale"] = True
-                    state["cache_age_seconds"] = int(age)
-
-                return dict(state)  # Copie défensive
+            key = f"zigbee:{friendly_name}" if not friendly_name.startswith("zigbee:") else friendly_name
+            rec = self._state_cache.get(key)
+            if rec is None:
+                return None
+
+            state = rec.as_dict()
+            # Vérifier TTL (5 min = 300s)
+            age = time.time() - rec.cached_at
+            if age > 300:
+                # Cache expiré mais on retourne quand même (stale data > no data)
+                state["stale"] = True
+                state["cache_age_seconds"] = int(age)
+            return state
 
         except Exception as e:
-            print(f"MQTT: Cache read error: {e}")
+            log.warning("mqtt cache read error", error=str(e))
             return None
 
-    def get_all_devices(self) -> List[Dict[str, Any]]:
+    def report_device_aggregates(self, friendly_name: str) -> Tuple[float, Dict[str, Dict[str, Any]]]:
+        """
+        min/max/avg/last par mesure numérique reçue depuis le report précédent du
+        device (historique en anneau, cf. zigbee_cache.HISTORY_FIELDS), et marque
+        ce report. Retour: (durée de la fenêtre en s, agrégats).
+        """
+        if not MQTT_AVAILABLE:
+            return 0.0, {}
+        key = friendly_name if friendly_name.startswith("zigbee:") else f"zigbee:{friendly_name}"
+        try:
+            return self._state_cache.report_aggregates(key)
+        except Exception as e:
+            log.warning("mqtt history read error", error=str(e), rate_key="history_read")
+            return 0.0, {}
+
+    def get_states_snapshot(self) -> Dict[str, ZigbeeRecord]:
+        """
+        Tous les états en cache, clé "zigbee:<friendly_name>" (enregistrements partagés,
+        lecture seule). Pour les vues qui lisent beaucoup de devices d'un coup.
+        """
+        if not MQTT_AVAILABLE:
+            return {}
+        return self._state_cache.snapshot()
+
+    def get_all_devices(self) -> Sequence[Dict[str, Any]]:
         """
         Récupère la liste complète des devices Zigbee depuis bridge/devices.
 
         Returns:
-            List de dicts avec infos devices:
+            Tuple (partagé, lecture seule) de dicts avec infos devices:
             - friendly_name
             - ieee_address
             - type (ex: "Router", "EndDevice")
@@ -406,17 +639,25 @@ class MQTTClientManager:
         if not self._ensure_connected():
             return []
 
-        try:
-            with self._lock:
-                return list(self._bridge_devices)  # Copie défensive
-        except Exception as e:
-            print(f"MQTT: Error reading bridge devices: {e}")
-            return []
+        # Tuple remplacé à chaque bridge/devices: partagé sans copie (lecture seule)
+        return self._state_cache.bridge_devices()
 
-    def get_bridge_devices(self) -> List[Dict[str, Any]]:
+    def get_bridge_devices(self) -> Sequence[Dict[str, Any]]:
         """Alias de get_all_devices() pour compatibilité."""
         return self.get_all_devices()
 
+    def get_bridge_device(self, friendly_name: str) -> Optional[Dict[str, Any]]:
+        """Entrée bridge/devices d'un device (index par friendly_name)."""
+        if not MQTT_AVAILABLE:
+            return None
+        return self._state_cache.bridge_device(friendly_name)
+
+    def get_friendly_name_by_ieee(self, ieee_address: str) -> Optional[str]:
+        """friendly_name courant d'une adresse IEEE (stable malgré les renommages)."""
+        if not MQTT_AVAILABLE:
+            return None
+        return self._state_cache.friendly_name_for_ieee(ieee_address)
+
     def publish_action(self, friendly_name: str, action: Dict[str, Any]) -> bool:
         """
         Publie une action sur un device (ex: ON/OFF).
@@ -441,10 +682,10 @@ class MQTTClientManager:
             topic = f"{self._base_topic}/{friendly_name}/set"
             payload = json.dumps(action)
             self._client.publish(topic, payload)
-            print(f"MQTT: Published to {topic}: {payload}")
+            log.info("mqtt published", topic=topic, payload=payload)
             return True
         except Exception as e:
-            print(f"MQTT: Publish error: {e}")
+            log.warning("mqtt publish error", topic=f"{self._base_topic}/{friendly_name}/set", error=str(e))
             return False
 
     def permit_join(self, duration: int = 60) -> bool:
@@ -470,10 +711,10 @@ class MQTTClientManager:
             topic = f"{self._base_topic}/bridge/request/permit_join"
             payload = json.dumps({"value": True, "time": duration})
             self._client.publish(topic, payload)
-            print(f"MQTT: Permit join enabled for {duration}s")
+            log.info("zigbee permit join enabled", duration_s=duration)
             return True
         except Exception as e:
-            print(f"MQTT: Permit join error: {e}")
+            log.warning("zigbee permit join error", error=str(e))
             return False
 
     def rename_device(self, old_name: str, new_name: str) -> bool:
@@ -500,10 +741,10 @@ class MQTTClientManager:
             topic = f"{self._base_topic}/bridge/request/device/rename"
             payload = json.dumps({"from": old_name, "to": new_name})
             self._client.publish(topic, payload)
-            print(f"MQTT: Rename device {old_name} → {new_name}")
+            log.info("zigbee rename device", old_name=old_name, new_name=new_name)
             return True
         except Exception as e:
-            print(f"MQTT: Rename error: {e}")
+            log.warning("zigbee rename error", old_name=old_name, error=str(e))
             return False
 
     def remove_device(self, ieee_address: str, force: bool = False) -> bool:
@@ -530,10 +771,10 @@ class MQTTClientManager:
             topic = f"{self._base_topic}/bridge/request/device/remove"
             payload = json.dumps({"id": ieee_address, "force": force})
             self._client.publish(topic, payload)
-            print(f"MQTT: Remove device {ieee_address} (force={force})")
+            log.info("zigbee remove device", ieee_address=ieee_address, force=force)
             return True
         except Exception as e:
-            print(f"MQTT: Remove error: {e}")
+            log.warning("zigbee remove error", ieee_address=ieee_address, error=str(e))
             return False
 
     def get_last_message_time(self) -> Optional[float]:
@@ -558,18 +799,18 @@ class MQTTClientManager:
             bool: True si connexion démarrée (pas forcément connecté yet)
         """
         if not self._configured:
-            print("MQTT: Not configured, skipping connection")
+            log.info("mqtt not configured, skipping connection")
             return False
 
         if self._connected:
-            print("MQTT: Already connected")
+            log.debug("mqtt already connected")
             return True
 
         if self._connection_attempted:
-            print("MQTT: Connection already attempted (check logs for errors)")
+            log.info("mqtt connection already attempted (check logs for errors)")
             return False
 
-        print("MQTT: Initiating connection at startup...")
+        log.info("mqtt initiating connection at startup")
         return self.connect()
 
     def get_health(self) -> Dict[str, Any]:
@@ -584,6 +825,10 @@ class MQTTClientManager:
             - last_error: str|None (dernière erreur rencontrée)
             - last_message_ts: float|None (timestamp dernier message reçu)
             - devices_in_cache: int (nombre de devices en cache)
+            - cache_evicted: int (évictions LRU/TTL/bridge depuis le démarrage)
+            - parse_queue / parse_overflow: messages en file / en débordement (file pleine)
+            - parse_dropped: payloads remplacés par un plus récent du même device en débordement
+            - json_backend: "orjson" ou "json"
         """
         with self._lock:
             return {
@@ -593,6 +838,11 @@ class MQTTClientManager:
                 "last_error": self._last_error,
                 "last_message_ts": self._last_message_time,
                 "devices_in_cache": len(self._state_cache),
+                "cache_evicted": self._state_cache.evicted,
+                "parse_queue": self._queue.qsize(),
+                "parse_overflow": len(self._overflow),
+                "parse_dropped": self._dropped,
+                "json_backend": JSON_BACKEND,
                 "mqtt_available": MQTT_AVAILABLE
             }
 
@@ -611,7 +861,12 @@ class MQTTClientManager:
             self._client.loop_stop()
         if self._thread and self._thread.is_alive():
             self._thread.join(timeout=2)
-        print("MQTT: Client stopped")
+        if self._parser and self._parser.is_alive():
+            try:
+                self._queue.put(None, timeout=1)
+            except queue.Full:
+                pass  # thread daemon: ne bloque pas l'arrêt
+        log.info("mqtt client stopped")
 
 
 # ------------------------------------------------------------
@@ -0,0 +1,176 @@
+# agent/src/rtt.py
+"""
+Timeouts de probe adaptatifs (estimateur RTT façon RFC 6298).
+
+Par (driver, device):
+    SRTT, RTTVAR mis à jour à chaque réponse, RTO = SRTT + max(G, K * RTTVAR)
+    timeout => RTO doublé (backoff plafonné, sans dépasser max(timeout_s, timeout_max_s)),
+    remis à 1 à la première réponse
+
+Le timeout utilisé est borné par [timeout_min_s, timeout_max_s] du bloc driver:
+un équipement LAN qui répond en 5 ms est déclaré mort en ~0.2 s au lieu du
+timeout fixe, un équipement WAN lent obtient plus que timeout_s.
+
+Un device sans échantillon propre utilise son timeout_s configuré; l'estimation
+agrégée du driver (tous devices) n'alimente que les métriques.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from src import metrics as agent_metrics
+
+# RFC 6298 §2
+ALPHA = 1.0 / 8.0
+BETA = 1.0 / 4.0
+K = 4.0
+# Granularité d'horloge (G): plancher de la marge de variance
+CLOCK_G_S = 0.01
+
+# Backoff après timeout: x2 par timeout, plafonné (un device mort ne doit pas
+# retrouver le timeout max à chaque cycle)
+MAX_BACKOFF = 4
+
+DEFAULT_MIN_S = 0.2
+DEFAULT_MAX_S = 5.0
+
+
+class RttEstimator:
+    __slots__ = ("srtt", "rttvar", "samples", "backoff")
+
+    def __init__(self) -> None:
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+        self.samples = 0
+        self.backoff = 1
+
+    def observe(self, rtt_s: float) -> None:
+        if rtt_s < 0:
+            return
+        if self.srtt is None:
+            self.srtt = rtt_s
+            self.rttvar = rtt_s / 2.0
+        else:
+            self.rttvar = (1.0 - BETA) * self.rttvar + BETA * abs(self.srtt - rtt_s)
+            self.srtt = (1.0 - ALPHA) * self.srtt + ALPHA * rtt_s
+        self.samples += 1
+        self.backoff = 1
+
+    def on_timeout(self) -> None:
+        self.backoff = min(MAX_BACKOFF, self.backoff * 2)
+
+    def rto(self) -> Optional[float]:
+        """RTO de base (hors backoff)."""
+        if self.srtt is None:
+            return None
+        return self.srtt + max(CLOCK_G_S, K * self.rttvar)
+
+
+_lock = threading.Lock()
+_devices: Dict[Tuple[str, str], RttEstimator] = {}
+_drivers: Dict[str, RttEstimator] = {}
+
+
+def _safe_float(x: Any, default: float) -> float:
+    try:
+        return float(str(x).strip())
+    except Exception:
+        return default
+
+
+def bounds(cfg: Dict[str, Any], configured_timeout_s: float, default_min_s: float = DEFAULT_MIN_S) -> Tuple[float, float]:
+    """
+    [timeout_min_s, timeout_max_s] du bloc driver.
+    Défaut max: le plus grand de timeout_s et DEFAULT_MAX_S.
+    """
+    lo = max(0.05, _safe_float(cfg.get("timeout_min_s"), default_min_s))
+    hi = _safe_float(cfg.get("timeout_max_s"), max(configured_timeout_s, DEFAULT_MAX_S))
+    return lo, max(lo, hi)
+
+
+def adaptive_enabled(cfg: Dict[str, Any]) -> bool:
+    return cfg.get("adaptive_timeout", True) is not False
+
+
+def timeout_for(
+    driver: str,
+    key: str,
+    cfg: Dict[str, Any],
+    configured_timeout_s: float,
+    default_min_s: float = DEFAULT_MIN_S,
+) -> float:
+    """
+    Timeout à utiliser pour la prochaine probe de ce device: RTO borné par
+    [lo, hi], puis backoff (plafonné à max(timeout_s, hi)).
+    """
+    if not adaptive_enabled(cfg):
+        return configured_timeout_s
+    lo, hi = bounds(cfg, configured_timeout_s, default_min_s)
+    with _lock:
+        est = _devices.get((driver, key))
+        rto = est.rto() if est is not None else None
+        backoff = est.backoff if est is not None else 1
+    if rto is None:
+        # Device sans échantillon propre (nouveau, ou muet depuis le démarrage): timeout_s
+        # configuré. Pas l'agrégat du driver: des devices LAN rapides imposeraient leur RTO
+        # à un device lent, qui timeouterait à chaque cycle sans jamais fournir d'échantillon
+        return min(max(configured_timeout_s, lo), hi)
+    timeout_s = min(max(rto, lo), hi)
+    if backoff > 1:
+        timeout_s = min(timeout_s * backoff, max(configured_timeout_s, hi))
+    return timeout_s
+
+
+def observe(driver: str, key: str, rtt_s: float) -> None:
+    """Echantillon RTT (réponse obtenue sans retransmission)."""
+    with _lock:
+        est = _devices.get((driver, key))
+        if est is None:
+            est = _devices[(driver, key)] = RttEstimator()
+        est.observe(rtt_s)
+        agg = _drivers.get(driver)
+        if agg is None:
+            agg = _drivers[driver] = RttEstimator()
+        agg.observe(rtt_s)
+        srtt, rto = agg.srtt, agg.rto()
+    agent_metrics.set_gauge("agent_probe_srtt_seconds", srtt or 0.0, driver=driver)
+    agent_metrics.set_gauge("agent_probe_rto_seconds", rto or 0.0, driver=driver)
+
+
+def observe_timeout(driver: str, key: str) -> None:
+    with _lock:
+        est = _devices.get((driver, key))
+        if est is None:
+            est = _devices[(driver, key)] = RttEstimator()
+        est.on_timeout()
+
+
+def estimate(driver: str, key: str) -> Dict[str, Any]:
+    """Estimation courante d'un device (pour metrics de l'observation)."""
+    with _lock:
+        est = _devices.get((driver, key))
+        if est is None or est.srtt is None:
+            return {}
+        rto = est.rto()
+        return {
+            "srtt_ms": round(est.srtt * 1000.0, 2),
+            "rttvar_ms": round(est.rttvar * 1000.0, 2),
+            "rto_ms": round(rto * 1000.0, 2) if rto is not None else None,
+            "backoff": est.backoff,
+        }
+
+
+def forget(driver: str, key: str) -> None:
+    with _lock:
+        _devices.pop((driver, key), None)
+
+
+def prune(keep: Iterable[Tuple[str, str]]) -> int:
+    """Oublie les estimateurs des (driver, device) retirés de la config."""
+    keep_set = set(keep)
+    with _lock:
+        gone = [k for k in _devices if k not in keep_set]
+    for driver, key in gone:
+        forget(driver, key)
+    return len(gone)
@@ -0,0 +1,259 @@
+# agent/src/runtime_state.py
+"""
+Etat d'exécution par équipement, persistant entre redémarrages.
+
+Par device (clé = state_key(ip, driver)): dernier OK, début de la panne en
+cours, échecs consécutifs, dernier statut/verdict. Deux entrées de la config
+sur la même IP (ping + snmp d'un même écran) ont chacune leur état: le ping OK
+n'efface pas la panne SNMP.
+
+- Chargé en mémoire au démarrage (warm start: la panne en cours garde son
+  ancienneté, pas de nouvelle alerte après un redémarrage de l'agent)
+- Ecrit en un seul lot par cycle (SQLite WAL, une transaction)
+- Fichier: AGENT_STATE_DB (défaut: runtime_state.db à côté de config.json)
+
+Si la base est inutilisable (droits, disque), l'état reste en mémoire.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from src import metrics as agent_metrics
+from src.logs import get_logger
+
+log = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS device_state (
+    key             TEXT PRIMARY KEY,
+    last_ok_utc     TEXT,
+    offline_since   TEXT,
+    failures        INTEGER NOT NULL DEFAULT 0,
+    last_status     TEXT,
+    last_verdict    TEXT,
+    updated_at      TEXT
+)
+"""
+
+_UPSERT = """
+INSERT INTO device_state (key, last_ok_utc, offline_since, failures, last_status, last_verdict, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(key) DO UPDATE SET
+    last_ok_utc = excluded.last_ok_utc,
+    offline_since = excluded.offline_since,
+    failures = excluded.failures,
+    last_status = excluded.last_status,
+    last_verdict = excluded.last_verdict,
+    updated_at = excluded.updated_at
+"""
+
+
+def _parse_dt(v: Optional[str]) -> Optional[datetime]:
+    if not v:
+        return None
+    try:
+        return datetime.fromisoformat(v.replace("Z", "+00:00"))
+    except Exception:
+        return None
+
+
+def _iso(dt: Optional[datetime]) -> Optional[str]:
+    return dt.isoformat() if dt is not None else None
+
+
+def state_key(ip: str, driver: str) -> str:
+    return f"{ip}|{driver}"
+
+
+class DeviceState:
+    __slots__ = ("last_ok_utc", "offline_since", "failures", "last_status", "last_verdict", "updated_at")
+
+    def __init__(
+        self,
+        last_ok_utc: Optional[datetime] = None,
+        offline_since: Optional[datetime] = None,
+        failures: int = 0,
+        last_status: Optional[str] = None,
+        last_verdict: Optional[str] = None,
+        updated_at: Optional[datetime] = None,
+    ) -> None:
+        self.last_ok_utc = last_ok_utc
+        self.offline_since = offline_since
+        self.failures = failures
+        self.last_status = last_status
+        self.last_verdict = last_verdict
+        self.updated_at = updated_at
+
+    def observe(self, status: str, now: datetime) -> None:
+        """Met à jour l'état avec le statut observé au cycle courant."""
+        if status == "online":
+            self.last_ok_utc = now
+            self.offline_since = None
+            self.failures = 0
+        elif status == "offline":
+            if self.offline_since is None:
+                self.offline_since = now
+            self.failures += 1
+        # "unknown" (erreur driver): on ne conclut rien, la panne en cours garde son ancienneté
+        self.last_status = status
+        self.updated_at = now
+
+    def offline_for_s(self, now: datetime) -> Optional[int]:
+        if self.offline_since is None:
+            return None
+        return max(0, int((now - self.offline_since).total_seconds()))
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "last_ok_utc": _iso(self.last_ok_utc),
+            "offline_since": _iso(self.offline_since),
+            "failures": self.failures,
+            "last_status": self.last_status,
+            "last_verdict": self.last_verdict,
+            "updated_at": _iso(self.updated_at),
+        }
+
+
+class RuntimeStateStore:
+    """
+    Cache mémoire des DeviceState, adossé à SQLite.
+
+    get() ne touche pas au disque; flush() écrit les états modifiés depuis le
+    dernier flush dans une seule transaction.
+    """
+
+    def __init__(self, path: Optional[str]) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._states: Dict[str, DeviceState] = {}
+        self._dirty: set = set()
+        self._conn: Optional[sqlite3.Connection] = None
+        if path:
+            self._open(path)
+
+    def _open(self, path: str) -> None:
+        try:
+            parent = os.path.dirname(path)
+            if parent:
+                os.makedirs(parent, mode=0o750, exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            rows = conn.execute(
+                "SELECT key, last_ok_utc, offline_since, failures, last_status, last_verdict, updated_at FROM device_state"
+            ).fetchall()
+        except (sqlite3.Error, OSError) as e:
+            log.warning("runtime state store unavailable, keeping state in memory", path=path, error=str(e))
+            return
+
+        for key, last_ok, offline_since, failures, last_status, last_verdict, updated_at in rows:
+            self._states[key] = DeviceState(
+                last_ok_utc=_parse_dt(last_ok),
+                offline_since=_parse_dt(offline_since),
+                failures=int(failures or 0),
+                last_status=last_status,
+                last_verdict=last_verdict,
+                updated_at=_parse_dt(updated_at),
+            )
+        self._conn = conn
+        log.info("runtime state loaded", path=path, devices=len(rows))
+
+    def get(self, key: str) -> DeviceState:
+        """Etat du device (créé vide si inconnu). Marqué modifié: sera écrit au prochain flush()."""
+        with self._lock:
+            st = self._states.get(key)
+            if st is None:
+                # Base d'une version précédente (clé = ip seule): chaque driver de l'IP en
+                # repart (warm start), l'ancienne ligne est purgée par prune() en fin de cycle
+                legacy = self._states.get(key.split("|", 1)[0]) if "|" in key else None
+                st = self._states[key] = DeviceState(
+                    *((legacy.last_ok_utc, legacy.offline_since, legacy.failures, legacy.last_status,
+                       legacy.last_verdict, legacy.updated_at) if legacy is not None else ())
+                )
+            self._dirty.add(key)
+            return st
+
+    def peek(self, key: str) -> Optional[DeviceState]:
+        with self._lock:
+            return self._states.get(key)
+
+    def flush(self) -> int:
+        """Ecrit les états modifiés (une transaction). Retourne le nombre de lignes écrites."""
+        with self._lock:
+            if not self._dirty:
+                return 0
+            keys = list(self._dirty)
+            self._dirty.clear()
+            if self._conn is None:
+                return 0
+            rows = []
+            for key in keys:
+                st = self._states.get(key)
+                if st is None:
+                    continue
+                rows.append((key, _iso(st.last_ok_utc), _iso(st.offline_since), st.failures,
+                             st.last_status, st.last_verdict, _iso(st.updated_at)))
+            t0 = time.perf_counter()
+            try:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(_UPSERT, rows)
+                self._conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                try:
+                    self._conn.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass
+                self._dirty.update(keys)  # réessayé au prochain cycle
+                log.warning("runtime state flush failed", error=str(e), rate_key="state_flush")
+                return 0
+            agent_metrics.observe("agent_state_flush_duration_seconds", time.perf_counter() - t0)
+            return len(rows)
+
+    def prune(self, keep: Iterable[str]) -> int:
+        """Supprime l'état des devices retirés de la config."""
+        keep_set = set(keep)
+        with self._lock:
+            gone: List[str] = [k for k in self._states if k not in keep_set]
+            for k in gone:
+                self._states.pop(k, None)
+                self._dirty.discard(k)
+            if gone and self._conn is not None:
+                try:
+                    self._conn.executemany("DELETE FROM device_state WHERE key = ?", [(k,) for k in gone])
+                except sqlite3.Error as e:
+                    log.warning("runtime state prune failed", error=str(e), rate_key="state_flush")
+            return len(gone)
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# -------------------------------------------------------------------
+# Singleton agent
+# -------------------------------------------------------------------
+_store: Optional[RuntimeStateStore] = None
+_store_lock = threading.Lock()
+
+
+def default_state_path() -> str:
+    config_path = os.getenv("AGENT_CONFIG", "/var/lib/avmonitoring/config.json")
+    return os.getenv("AGENT_STATE_DB") or os.path.join(os.path.dirname(config_path), "runtime_state.db")
+
+
+def get_store() -> RuntimeStateStore:
+    """Store global (ouvert et chargé au premier appel)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = RuntimeStateStore(default_state_path())
+        return _store
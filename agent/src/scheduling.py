@@ -1,8 +1,11 @@
 # agent/src/scheduling.py
 from __future__ import annotations
 
-from dataclasses import dataclass
-from datetime import datetime, time, timedelta
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta, tzinfo
+from functools import lru_cache
 from typing import Any, Dict, List, Optional, Tuple
 from zoneinfo import ZoneInfo
 
@@ -24,12 +27,102 @@ class DevicePolicy:
     expected_on: List[Tuple[time, time, List[str]]]  # (start, end, days) en heure locale
     timezone: str
     alert_after_s: int
+    # Forme compilée de expected_on (bitmap minute) + tzinfo, calculées une fois
+    compiled: Optional["CompiledSchedule"] = field(default=None, compare=False, repr=False)
+    tz: Optional[tzinfo] = field(default=None, compare=False, repr=False)
+
+
+# ------------------------------------------------------------
+# Schedule compilé: bitmap 7 x 1440 minutes
+# ------------------------------------------------------------
+_MINUTES_PER_DAY = 1440
+
+# Valeurs du bitmap
+_OFF = 0
+_ON = 1
+# Minute de fin d'une plage: incluse seulement à hh:mm:00 pile (règle "t <= end")
+_ON_AT_ZERO = 2
+
+
+class CompiledSchedule:
+    """
+    Plages expected_on compilées en un bitmap d'une semaine (index = jour*1440 + minute).
+
+    Equivalent exact à l'évaluation plage par plage (bornes incluses, plages
+    traversant minuit) avec un lookup O(1).
+    """
+    __slots__ = ("minutes", "empty")
+
+    def __init__(self, expected_on: List[Tuple[time, time, List[str]]]) -> None:
+        bitmap = bytearray(7 * _MINUTES_PER_DAY)
+
+        def mark(day: int, start_min: int, end_min: int, end_inclusive: bool) -> None:
+            base = day * _MINUTES_PER_DAY
+            for m in range(start_min, end_min):
+                bitmap[base + m] = _ON
+            if end_inclusive and end_min < _MINUTES_PER_DAY and bitmap[base + end_min] == _OFF:
+                bitmap[base + end_min] = _ON_AT_ZERO
+
+        for start, end, days in expected_on:
+            s_min = start.hour * 60 + start.minute
+            e_min = end.hour * 60 + end.minute
+            for d in days:
+                day = _DAY_INDEX.get(d)
+                if day is None:
+                    continue
+                if start <= end:
+                    mark(day, s_min, e_min, True)
+                else:
+                    # traverse minuit: fin du jour courant + début du lendemain
+                    mark(day, s_min, _MINUTES_PER_DAY, False)
+                    mark((day + 1) % 7, 0, e_min, True)
+
+        self.minutes = bytes(bitmap)
+        self.empty = not any(bitmap)
+
+    def contains(self, now_local: datetime) -> bool:
+        if self.empty:
+            return False
+        return self.contains_index(*minute_index(now_local))
+
+    def contains_index(self, index: int, at_zero: bool) -> bool:
+        """Lookup par index pré-calculé (partagé entre devices d'une même timezone)."""
+        v = self.minutes[index]
+        return v == _ON or (v == _ON_AT_ZERO and at_zero)
+
+
+def minute_index(now_local: datetime) -> Tuple[int, bool]:
+    """(jour*1440 + minute, True si hh:mm:00 pile) pour CompiledSchedule.contains_index()."""
+    return (
+        now_local.weekday() * _MINUTES_PER_DAY + now_local.hour * 60 + now_local.minute,
+        now_local.second == 0 and now_local.microsecond == 0,
+    )
+
+
+@lru_cache(maxsize=1024)
+def _compile_cached(key: Tuple[Tuple[time, time, Tuple[str, ...]], ...]) -> CompiledSchedule:
+    return CompiledSchedule([(st, en, list(days)) for st, en, days in key])
+
+
+def compile_schedule(expected_on: List[Tuple[time, time, List[str]]]) -> CompiledSchedule:
+    """Bitmap partagé entre équipements ayant les mêmes plages."""
+    return _compile_cached(tuple((st, en, tuple(days)) for st, en, days in expected_on))
+
+
+@lru_cache(maxsize=64)
+def get_tzinfo(name: str) -> tzinfo:
+    """ZoneInfo mise en cache (fallback UTC si timezone inconnue)."""
+    try:
+        return ZoneInfo(name)
+    except Exception:
+        return ZoneInfo("UTC")
 
 
 # ------------------------------------------------------------
 # Parsing helpers
 # ------------------------------------------------------------
 _VALID_DAYS = {"mon", "tue", "wed", "thu", "fri", "sat", "sun"}
+_DAY_INDEX = {d: i for i, d in enumerate(("mon", "tue", "wed", "thu", "fri", "sat", "sun"))}
 
 
 def _parse_hhmm(s: str) -> Optional[time]:
@@ -215,7 +308,47 @@ def device_policy_from_config(device: Dict[str, Any], default_tz: str = "UTC") -
 
     tz = (tz or "").strip() or (default_tz or "UTC")
 
-    return DevicePolicy(always_on=always_on, expected_on=expected, timezone=tz, alert_after_s=alert_after_s)
+    return DevicePolicy(
+        always_on=always_on,
+        expected_on=expected,
+        timezone=tz,
+        alert_after_s=alert_after_s,
+        compiled=compile_schedule(expected),
+        tz=get_tzinfo(tz),
+    )
+
+
+# Policies compilées par empreinte de config (la config est relue à chaque cycle)
+_POLICY_CACHE: "OrderedDict[str, DevicePolicy]" = OrderedDict()
+_POLICY_CACHE_MAX = 4096
+_POLICY_LOCK = threading.Lock()
+
+
+def _policy_fingerprint(device: Dict[str, Any], default_tz: str) -> str:
+    # repr(): stable pour une même config relue (ordre des clés conservé), ~5x moins cher que json.dumps
+    return repr((device.get("expectations"), device.get("critical"), device.get("expected_on"),
+                 device.get("timezone"), default_tz))
+
+
+def policy_for_device(device: Dict[str, Any], default_tz: str = "UTC") -> DevicePolicy:
+    """
+    device_policy_from_config() avec cache: tant que les champs de policy d'un
+    device ne changent pas, la même DevicePolicy compilée est réutilisée d'un cycle à l'autre.
+    """
+    if not isinstance(device, dict):
+        return device_policy_from_config(device, default_tz)
+    key = _policy_fingerprint(device, default_tz)
+    with _POLICY_LOCK:
+        policy = _POLICY_CACHE.get(key)
+        if policy is not None:
+            _POLICY_CACHE.move_to_end(key)
+            return policy
+    policy = device_policy_from_config(device, default_tz)
+    with _POLICY_LOCK:
+        _POLICY_CACHE[key] = policy
+        if len(_POLICY_CACHE) > _POLICY_CACHE_MAX:
+            _POLICY_CACHE.popitem(last=False)
+    return policy
 
 
 # ------------------------------------------------------------
@@ -237,37 +370,14 @@ def is_within_expected_on(now_local: datetime, policy: DevicePolicy) -> bool:
           - vendredi 22:00 -> vendredi 23:59
           - samedi 00:00 -> samedi 02:00
         Donc si now_local est après minuit, on accepte la plage si le "jour précédent" est inclus.
+
+    Lookup O(1) dans le bitmap compilé (policy.compiled).
     """
     if not policy.expected_on:
         return False
 
-    t = now_local.timetz().replace(tzinfo=None)
-    day = _weekday_key(now_local)
-
-    for start, end, days in policy.expected_on:
-        days_norm = [d for d in days if d in _VALID_DAYS]
-        if not days_norm:
-            continue
-
-        if start <= end:
-            # plage classique: le jour doit correspondre
-            if day in days_norm and start <= t <= end:
-                return True
-        else:
-            # traverse minuit
-            # 1) partie "avant minuit" (jour courant)
-            if day in days_norm and t >= start:
-                return True
-            # 2) partie "après minuit" (jour +1), on regarde si le "jour précédent" était dans days
-            prev_day = _VALID_DAYS_ORDERED[(_VALID_DAYS_ORDERED.index(day) - 1) % 7]
-            if prev_day in days_norm and t <= end:
-                return True
-
-    return False
-
-
-# Order helper for prev_day computation
-_VALID_DAYS_ORDERED = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+    compiled = policy.compiled if policy.compiled is not None else compile_schedule(policy.expected_on)
+    return compiled.contains(now_local)
 
 
 def classify_observation(
@@ -310,11 +420,7 @@ def classify_observation(
         if policy.always_on:
             return "fault"
 
-        try:
-            tz = ZoneInfo(policy.timezone)
-        except Exception:
-            tz = ZoneInfo("UTC")
-
+        tz = policy.tz if policy.tz is not None else get_tzinfo(policy.timezone)
         now_local = now_utc.astimezone(tz)
         within = is_within_expected_on(now_local, policy)
 
@@ -328,6 +434,67 @@ def classify_observation(
     return "unknown"
 
 
+def classify_batch(
+    observations: List[Dict[str, Any]],
+    now_utc: datetime,
+    *,
+    doubt_after_days: int,
+) -> List[str]:
+    """
+    classify_observation() pour tout un cycle.
+
+    observations: [{"policy": DevicePolicy, "observed_status": str,
+                    "last_ok_utc": datetime|None, "offline_for_s": int|None}, ...]
+    Retour: verdicts dans le même ordre.
+
+    La conversion en heure locale et l'index minute ne sont calculés qu'une fois
+    par timezone, et seulement si un device OFF en a besoin.
+    """
+    doubt_delta = timedelta(days=doubt_after_days) if doubt_after_days > 0 else None
+    local_index: Dict[str, Tuple[int, bool]] = {}
+    verdicts: List[str] = []
+
+    for obs in observations:
+        policy: DevicePolicy = obs["policy"]
+        status = (obs.get("observed_status") or "unknown").strip().lower()
+        last_ok_utc = obs.get("last_ok_utc")
+
+        if doubt_delta is not None and last_ok_utc is not None and now_utc - last_ok_utc >= doubt_delta:
+            verdicts.append("doubt")
+            continue
+
+        if status == "online":
+            verdicts.append("ok")
+            continue
+
+        if status != "offline":
+            verdicts.append("unknown")
+            continue
+
+        offline_for_s = obs.get("offline_for_s")
+        if offline_for_s is not None and offline_for_s < policy.alert_after_s:
+            verdicts.append("unknown")
+            continue
+
+        if policy.always_on:
+            verdicts.append("fault")
+            continue
+
+        if not policy.expected_on:
+            verdicts.append("expected_off")
+            continue
+
+        idx = local_index.get(policy.timezone)
+        if idx is None:
+            tz = policy.tz if policy.tz is not None else get_tzinfo(policy.timezone)
+            idx = local_index[policy.timezone] = minute_index(now_utc.astimezone(tz))
+
+        compiled = policy.compiled if policy.compiled is not None else compile_schedule(policy.expected_on)
+        verdicts.append("fault" if compiled.contains_index(*idx) else "expected_off")
+
+    return verdicts
+
+
 def compute_next_collect_interval_s(
     *,
     any_fault: bool,
@@ -3,7 +3,7 @@ from __future__ import annotations
 
 import json
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 # ------------------------------------------------------------
 # Default config (safe baseline)
@@ -203,6 +203,14 @@ def _normalize_expectations(exp: Any, fallback_tz: str) -> Dict[str, Any]:
     return out
 
 
+# Clés du bloc snmp non éditées par le formulaire, conservées telles quelles
+SNMP_PASSTHROUGH_KEYS = ("oids", "tables")
+# Idem bloc pjlink (réglages de session)
+PJLINK_PASSTHROUGH_KEYS = ("keepalive_s", "min_interval_s", "pipeline")
+# Timeouts adaptatifs (communs snmp / pjlink), conservés même à false
+TIMEOUT_PASSTHROUGH_KEYS = ("adaptive_timeout", "timeout_min_s", "timeout_max_s")
+
+
 def _normalize_driver_blocks(device: Dict[str, Any]) -> None:
     """
     Make sure driver configs are present and correctly typed.
@@ -219,9 +227,9 @@ def _normalize_driver_blocks(device: Dict[str, Any]) -> None:
             "timeout_s": max(1, _as_int(snmp.get("timeout_s"), 1)),
             "retries": max(0, _as_int(snmp.get("retries"), 1)),
         }
-        # Préserver les timestamps (clés commençant par underscore)
+        # Préserver les timestamps (clés commençant par underscore), OIDs additionnelles et tables
         for key, value in snmp.items():
-            if key.startswith("_"):
+            if key.startswith("_") or (key in SNMP_PASSTHROUGH_KEYS and value) or key in TIMEOUT_PASSTHROUGH_KEYS:
                 snmp_out[key] = value
         device["snmp"] = snmp_out
     else:
@@ -245,9 +253,9 @@ def _normalize_driver_blocks(device: Dict[str, Any]) -> None:
             "port": max(1, _as_int(pj.get("port"), 4352)),
             "timeout_s": max(1, _as_int(pj.get("timeout_s"), 2)),
         }
-        # Préserver les timestamps (clés commençant par underscore)
+        # Préserver les timestamps (clés commençant par underscore) et réglages de session
         for key, value in pj.items():
-            if key.startswith("_"):
+            if key.startswith("_") or key in PJLINK_PASSTHROUGH_KEYS or key in TIMEOUT_PASSTHROUGH_KEYS:
                 pj_out[key] = value
         device["pjlink"] = pj_out
     else:
@@ -442,6 +450,16 @@ def load_config(path: str) -> Dict[str, Any]:
     return _normalize_config(cfg)
 
 
+# Abonnés notifiés après chaque écriture réussie (ex: collector => cycle immédiat)
+_SAVE_LISTENERS: List[Callable[[str], None]] = []
+
+
+def on_config_saved(fn: Callable[[str], None]) -> None:
+    """Enregistre fn(path), appelée après chaque save_config() réussi."""
+    if fn not in _SAVE_LISTENERS:
+        _SAVE_LISTENERS.append(fn)
+
+
 def save_config(path: str, cfg: Dict[str, Any]) -> None:
     """
     Save config with atomic write + fsync.
@@ -481,4 +499,10 @@ def save_config(path: str, cfg: Dict[str, Any]) -> None:
         raise RuntimeError(
             f"Failed to save config to {path}: {e}. "
             f"Ensure {parent_dir} is owned by the service user and has 750 permissions."
-        ) from e
\ No newline at end of file
+        ) from e
+
+    for fn in list(_SAVE_LISTENERS):
+        try:
+            fn(path)
+        except Exception:
+            pass
\ No newline at end of file
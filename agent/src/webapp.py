@@ -1,17 +1,38 @@
 # agent/src/webapp.py
 from __future__ import annotations
 
+import asyncio
+import copy
+import csv
+import io
+import json
 import os
 import threading
-from typing import Any, Dict, Optional
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
 
-from fastapi import FastAPI, Form, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import FastAPI, File, Form, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, RedirectResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 
-from src.storage import load_config, save_config, ensure_runtime_dir
-from src.collector import run_forever, get_last_status, get_last_results
-from src.config_sync import start_sync_thread, get_sync_status
+from src.storage import load_config, save_config, ensure_runtime_dir, SNMP_PASSTHROUGH_KEYS, PJLINK_PASSTHROUGH_KEYS, TIMEOUT_PASSTHROUGH_KEYS
+from src.collector import (
+    run_forever,
+    get_last_status,
+    get_last_results,
+    get_results_since,
+    get_results_version,
+    on_state_change,
+    request_collect_now,
+    wake as wake_collector,
+)
+from src.config_sync import start_sync_thread, get_sync_status, on_sync_status_change
+from src.discovery import get_discovery_state, start_discovery
+from src.logs import get_logger
+from src import metrics as agent_metrics
+
+log = get_logger(__name__)
 
 # Determine config path with proper fallback
 CONFIG_PATH = os.getenv("AGENT_CONFIG", "/var/lib/avmonitoring/config.json")
@@ -35,7 +56,7 @@ _thread: Optional[threading.Thread] = None
 
 # Config sync
 _sync_thread: Optional[threading.Thread] = None
-_sync_stop_flag: Optional[Dict[str, bool]] = None
+_sync_stop_flag: Optional[threading.Event] = None
 
 
 # ---------------------------------------------------------------------
@@ -50,12 +71,17 @@ def ensure_collector_running() -> None:
     if collector_running():
         return
     _stop_flag["stop"] = False
+    if _thread is not None and _thread.is_alive():
+        # Thread en attente (collector arrêté): reprise immédiate
+        wake_collector("start")
+        return
     _thread = threading.Thread(target=run_forever, args=(_stop_flag,), daemon=True)
     _thread.start()
 
 
 def stop_collector() -> None:
     _stop_flag["stop"] = True
+    wake_collector("stop")
 
 
 # ---------------------------------------------------------------------
@@ -136,7 +162,9 @@ def index(request: Request):
     raw = get_last_status()
     last_status = _normalize_last_status(raw)
 
-    # Récupérer les derniers résultats de collecte
+    # Récupérer les derniers résultats de collecte (version lue avant: un changement
+    # concurrent sera renvoyé par /api/status, jamais perdu)
+    results_version = get_results_version()
     last_results = get_last_results()
 
     # Récupérer l'état de la synchronisation config
@@ -154,13 +182,13 @@ def index(request: Request):
         }
         # Récupérer liste complète depuis bridge/devices
         all_devices = mqtt.get_all_devices()
-        # Enrichir avec infos du cache
+        # Enrichir avec infos du cache (une seule lecture pour tous les devices)
+        states = mqtt.get_states_snapshot()
         for dev in all_devices:
             fn = dev.get("friendly_name", "")
             if not fn or fn == "Coordinator":
                 continue  # Skip coordinator
-            # Récupérer état depuis cache
-            state = mqtt.get_device_state(fn)
+            state = states.get(f"zigbee:{fn}")
             zigbee_devices.append({
                 "friendly_name": fn,
                 "ieee_address": dev.get("ieee_address", ""),
@@ -184,9 +212,11 @@ def index(request: Request):
         "last_status": last_status,
         "status": last_status,  # alias
         "last_results": last_results,  # résultats par IP
+        "results_version": results_version,  # point de départ de /api/status?since=
         "sync_status": sync_status,  # état de la sync config
         "zigbee_status": zigbee_status,  # état MQTT Zigbee
         "zigbee_devices": zigbee_devices,  # liste devices Zigbee
+        "discovery": get_discovery_state(),  # dernier balayage réseau
     }
 
     return templates.TemplateResponse("index.html", context)
@@ -214,123 +244,384 @@ def update_settings(
     return RedirectResponse("/", status_code=303)
 
 
-@app.post("/devices/add")
-def add_device(
-    ip: str = Form(...),
-    name: str = Form(""),
-    building: str = Form(""),
-    floor: str = Form(""),
-    room: str = Form(""),
-    device_type: str = Form("unknown"),
-    driver: str = Form("ping"),
+# ---------------------------------------------------------------------
+# Devices: mutations (formulaires, lot, import)
+# ---------------------------------------------------------------------
+# Champs des formulaires d'ajout/édition et leurs valeurs par défaut (CSV d'import: mêmes colonnes)
+DEVICE_FIELDS: Dict[str, str] = {
+    "ip": "",
+    "name": "",
+    "building": "",
+    "floor": "",
+    "room": "",
+    "device_type": "unknown",
+    "driver": "ping",
     # SNMP
-    snmp_community: str = Form("public"),
-    snmp_port: str = Form("161"),
-    snmp_timeout_s: str = Form("1"),
-    snmp_retries: str = Form("1"),
+    "snmp_community": "public",
+    "snmp_port": "161",
+    "snmp_timeout_s": "1",
+    "snmp_retries": "1",
     # PJLINK
-    pjlink_password: str = Form(""),
-    pjlink_port: str = Form("4352"),
-    pjlink_timeout_s: str = Form("2"),
+    "pjlink_password": "",
+    "pjlink_port": "4352",
+    "pjlink_timeout_s": "2",
     # expectations
-    always_on: str = Form(""),
-    alert_after_s: str = Form("300"),
-    sched_days: str = Form("mon,tue,wed,thu,fri"),
-    sched_start: str = Form("07:30"),
-    sched_end: str = Form("19:00"),
-    sched_timezone: str = Form("Europe/Paris"),
-):
-    cfg = load_config(CONFIG_PATH)
-    cfg.setdefault("devices", [])
+    "always_on": "",
+    "alert_after_s": "300",
+    "sched_days": "mon,tue,wed,thu,fri",
+    "sched_start": "07:30",
+    "sched_end": "19:00",
+    "sched_timezone": "Europe/Paris",
+}
 
-    ip = (ip or "").strip()
-    if not ip:
-        return RedirectResponse("/", status_code=303)
 
-    if any((d.get("ip") or "").strip() == ip for d in cfg["devices"]):
-        return RedirectResponse("/", status_code=303)
+def _int_field(value: Any, default: int) -> int:
+    try:
+        return int(value)
+    except Exception:
+        return default
+
 
-    driver = (driver or "ping").strip().lower()
+def _device_from_fields(fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Device config à partir des champs de formulaire (valeurs manquantes: DEVICE_FIELDS)."""
+    f = dict(DEVICE_FIELDS)
+    f.update({k: "" if v is None else str(v) for k, v in fields.items() if k in DEVICE_FIELDS})
+    driver = (f["driver"] or "ping").strip().lower()
 
     # driver configs
     snmp_block: Dict[str, Any] = {}
     if driver == "snmp":
-        try:
-            port = int(snmp_port)
-        except Exception:
-            port = 161
-        try:
-            timeout_i = int(snmp_timeout_s)
-        except Exception:
-            timeout_i = 1
-        try:
-            retries_i = int(snmp_retries)
-        except Exception:
-            retries_i = 1
         snmp_block = {
-            "community": (snmp_community or "public").strip(),
-            "port": port,
-            "timeout_s": max(1, timeout_i),
-            "retries": max(0, retries_i),
+            "community": (f["snmp_community"] or "public").strip(),
+            "port": _int_field(f["snmp_port"], 161),
+            "timeout_s": max(1, _int_field(f["snmp_timeout_s"], 1)),
+            "retries": max(0, _int_field(f["snmp_retries"], 1)),
         }
 
     pj_block: Dict[str, Any] = {}
     if driver == "pjlink":
-        try:
-            port = int(pjlink_port)
-        except Exception:
-            port = 4352
-        try:
-            timeout_i = int(pjlink_timeout_s)
-        except Exception:
-            timeout_i = 2
         pj_block = {
-            "password": (pjlink_password or "").strip(),
-            "port": port,
-            "timeout_s": max(1, timeout_i),
+            "password": (f["pjlink_password"] or "").strip(),
+            "port": _int_field(f["pjlink_port"], 4352),
+            "timeout_s": max(1, _int_field(f["pjlink_timeout_s"], 2)),
         }
 
     # expectations
-    ao = (always_on or "").strip().lower() in {"1", "true", "on", "yes"}
-    try:
-        a_s = int(alert_after_s)
-    except Exception:
-        a_s = 300
-    a_s = max(15, a_s)
+    ao = (f["always_on"] or "").strip().lower() in {"1", "true", "on", "yes"}
+    a_s = max(15, _int_field(f["alert_after_s"], 300))
 
     days = []
-    for part in (sched_days or "").split(","):
+    for part in (f["sched_days"] or "").split(","):
         p = part.strip().lower()
         if p in {"mon", "tue", "wed", "thu", "fri", "sat", "sun"}:
             days.append(p)
 
     schedule: Dict[str, Any] = {}
-    if days and (sched_start or "").strip() and (sched_end or "").strip():
+    if days and (f["sched_start"] or "").strip() and (f["sched_end"] or "").strip():
         schedule = {
-            "timezone": (sched_timezone or "Europe/Paris").strip() or "Europe/Paris",
-            "rules": [{"days": days, "start": (sched_start or "").strip(), "end": (sched_end or "").strip()}],
+            "timezone": (f["sched_timezone"] or "Europe/Paris").strip() or "Europe/Paris",
+            "rules": [{"days": days, "start": f["sched_start"].strip(), "end": f["sched_end"].strip()}],
         }
 
-    cfg["devices"].append(
-        {
-            "ip": ip,
-            "name": (name or "").strip(),
-            "building": (building or "").strip(),
-            "floor": (floor or "").strip(),
-            "room": (room or "").strip(),
-            "type": (device_type or "unknown").strip(),
-            "driver": driver,
-            "snmp": snmp_block,
-            "pjlink": pj_block,
-            "expectations": {
-                "always_on": ao,
-                "alert_after_s": a_s,
-                "schedule": schedule,
-            },
-        }
-    )
+    return {
+        "ip": (f["ip"] or "").strip(),
+        "name": (f["name"] or "").strip(),
+        "building": (f["building"] or "").strip(),
+        "floor": (f["floor"] or "").strip(),
+        "room": (f["room"] or "").strip(),
+        "type": (f["device_type"] or "unknown").strip(),
+        "driver": driver,
+        "snmp": snmp_block,
+        "pjlink": pj_block,
+        "expectations": {
+            "always_on": ao,
+            "alert_after_s": a_s,
+            "schedule": schedule,
+        },
+    }
 
+
+def _device_from_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Device d'un lot/import: soit au format config.json (blocs snmp/pjlink/expectations,
+    normalisé par save_config), soit à plat avec les champs du formulaire.
+    """
+    if any(isinstance(item.get(k), dict) for k in ("snmp", "pjlink", "expectations")):
+        device = dict(item)
+        device["ip"] = str(device.get("ip") or "").strip()
+        return device
+    if "type" in item and "device_type" not in item:
+        item = dict(item, device_type=item["type"])
+    return _device_from_fields(item)
+
+
+# Champs à plat (formulaire / CSV) -> (bloc, clé) dans la config du device (bloc None = racine)
+_FLAT_FIELD_KEYS: Dict[str, Tuple[Optional[str], str]] = {
+    "name": (None, "name"),
+    "building": (None, "building"),
+    "floor": (None, "floor"),
+    "room": (None, "room"),
+    "type": (None, "type"),
+    "device_type": (None, "type"),
+    "driver": (None, "driver"),
+    "snmp_community": ("snmp", "community"),
+    "snmp_port": ("snmp", "port"),
+    "snmp_timeout_s": ("snmp", "timeout_s"),
+    "snmp_retries": ("snmp", "retries"),
+    "pjlink_password": ("pjlink", "password"),
+    "pjlink_port": ("pjlink", "port"),
+    "pjlink_timeout_s": ("pjlink", "timeout_s"),
+    "always_on": ("expectations", "always_on"),
+    "alert_after_s": ("expectations", "alert_after_s"),
+}
+_SCHEDULE_FIELDS = ("sched_days", "sched_start", "sched_end", "sched_timezone")
+
+
+def _flat_value(field: str, value: Any) -> Any:
+    if field == "always_on":
+        return value if isinstance(value, bool) else str(value).strip().lower() in {"1", "true", "on", "yes"}
+    if field == "alert_after_s":
+        return max(15, _int_field(value, 300))
+    if field == "driver":
+        return (str(value) or "ping").strip().lower() or "ping"
+    if field.endswith(("_port", "_timeout_s", "_retries")):
+        return _int_field(value, int(DEVICE_FIELDS[field]))
+    return "" if value is None else str(value).strip()
+
+
+def _merge_item(old: Dict[str, Any], item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Device existant + clés présentes dans l'item d'un lot/import (update/upsert):
+    ce qui est absent de l'item (colonne CSV manquante) garde sa valeur actuelle.
+    Horodate community/password seulement si l'item les contient et qu'ils changent.
+    """
+    device = copy.deepcopy(old)
+    blocks = {name: dict(device.get(name) or {}) for name in ("snmp", "pjlink", "expectations")}
+
+    for field, value in item.items():
+        if field == "ip":
+            device["ip"] = str(value or "").strip()
+        elif field in _FLAT_FIELD_KEYS:
+            block, key = _FLAT_FIELD_KEYS[field]
+            target = device if block is None else blocks[block]
+            target[key] = _flat_value(field, value)
+        elif field in blocks and isinstance(value, dict):
+            blocks[field].update(value)
+        elif field not in _SCHEDULE_FIELDS and not str(field).startswith("_"):
+            device[field] = value
+
+    if any(f in item for f in _SCHEDULE_FIELDS):
+        schedule = blocks["expectations"].get("schedule") or {}
+        rule = (schedule.get("rules") or [{}])[0]
+        days = item.get("sched_days", ",".join(rule.get("days") or []))
+        start = str(item.get("sched_start", rule.get("start") or "")).strip()
+        end = str(item.get("sched_end", rule.get("end") or "")).strip()
+        tz = str(item.get("sched_timezone", schedule.get("timezone") or "Europe/Paris")).strip() or "Europe/Paris"
+        day_list = [d.strip().lower() for d in str(days).split(",")
+                    if d.strip().lower() in {"mon", "tue", "wed", "thu", "fri", "sat", "sun"}]
+        blocks["expectations"]["schedule"] = (
+            {"timezone": tz, "rules": [{"days": day_list, "start": start, "end": end}]}
+            if day_list and start and end else {}
+        )
+
+    old_snmp = old.get("snmp") if isinstance(old.get("snmp"), dict) else {}
+    old_pjlink = old.get("pjlink") if isinstance(old.get("pjlink"), dict) else {}
+    if "community" in blocks["snmp"] and blocks["snmp"]["community"] != old_snmp.get("community"):
+        blocks["snmp"]["_community_updated_at"] = datetime.now(timezone.utc).isoformat()
+    if "password" in blocks["pjlink"] and blocks["pjlink"]["password"] != old_pjlink.get("password"):
+        blocks["pjlink"]["_password_updated_at"] = datetime.now(timezone.utc).isoformat()
+
+    device.update(blocks)
+    return device
+
+
+def _apply_merge(devices: List[Dict[str, Any]], original_ip: str, item: Dict[str, Any]) -> Optional[str]:
+    """Fusionne item sur le device original_ip (None) ou retourne la raison du refus."""
+    original_ip = (original_ip or "").strip()
+    for i, d in enumerate(devices):
+        if (d.get("ip") or "").strip() != original_ip:
+            continue
+        device = _merge_item(d, item)
+        ip = device.get("ip") or ""
+        if not ip:
+            return "missing_ip"
+        if ip != original_ip and any((x.get("ip") or "").strip() == ip for x in devices):
+            return "duplicate_ip"
+        devices[i] = device
+        return None
+    return "not_found" if original_ip else "missing_ip"
+
+
+def _apply_add(devices: List[Dict[str, Any]], device: Dict[str, Any]) -> Optional[str]:
+    """Ajoute device (None) ou retourne la raison du refus."""
+    ip = device.get("ip") or ""
+    if not ip:
+        return "missing_ip"
+    if any((d.get("ip") or "").strip() == ip for d in devices):
+        return "duplicate_ip"
+    devices.append(device)
+    return None
+
+
+def _apply_update(devices: List[Dict[str, Any]], original_ip: str, device: Dict[str, Any]) -> Optional[str]:
+    """
+    Remplace le device original_ip (None) ou retourne la raison du refus.
+    Horodate les changements de community/password (sync bidirectionnelle) et conserve
+    les clés non éditées par le formulaire (OIDs, tables, réglages de session/timeouts).
+    """
+    original_ip = (original_ip or "").strip()
+    ip = device.get("ip") or ""
+    if not original_ip or not ip:
+        return "missing_ip"
+
+    # collision si on change l'IP vers une autre déjà existante
+    if ip != original_ip and any((d.get("ip") or "").strip() == ip for d in devices):
+        return "duplicate_ip"
+
+    for d in devices:
+        if (d.get("ip") or "").strip() != original_ip:
+            continue
+
+        driver = device.get("driver")
+        snmp_block = dict(device.get("snmp") or {})
+        pj_block = dict(device.get("pjlink") or {})
+        old_snmp = d.get("snmp") if isinstance(d.get("snmp"), dict) else {}
+        old_pjlink = d.get("pjlink") if isinstance(d.get("pjlink"), dict) else {}
+
+        # Ajouter timestamp si valeur modifiée, sinon préserver l'existant
+        new_community = snmp_block.get("community")
+        if new_community and new_community != old_snmp.get("community"):
+            snmp_block["_community_updated_at"] = datetime.now(timezone.utc).isoformat()
+        elif old_snmp.get("_community_updated_at"):
+            snmp_block["_community_updated_at"] = old_snmp["_community_updated_at"]
+
+        # OIDs additionnelles et tables (non éditées par le formulaire)
+        if driver == "snmp":
+            for key in SNMP_PASSTHROUGH_KEYS:
+                if old_snmp.get(key) and key not in snmp_block:
+                    snmp_block[key] = old_snmp[key]
+            for key in TIMEOUT_PASSTHROUGH_KEYS:
+                if key in old_snmp and key not in snmp_block:
+                    snmp_block[key] = old_snmp[key]
+
+        if pj_block.get("password") != old_pjlink.get("password"):  # Comparer même si vide (changement volontaire)
+            pj_block["_password_updated_at"] = datetime.now(timezone.utc).isoformat()
+        elif old_pjlink.get("_password_updated_at"):
+            pj_block["_password_updated_at"] = old_pjlink["_password_updated_at"]
+
+        if driver == "pjlink":
+            for key in PJLINK_PASSTHROUGH_KEYS + TIMEOUT_PASSTHROUGH_KEYS:
+                if key in old_pjlink and key not in pj_block:
+                    pj_block[key] = old_pjlink[key]
+
+        d.update(device)
+        d["snmp"] = snmp_block
+        d["pjlink"] = pj_block
+        return None
+
+    return "not_found"
+
+
+def _apply_delete(devices: List[Dict[str, Any]], ip: str) -> Optional[str]:
+    ip = (ip or "").strip()
+    kept = [d for d in devices if (d.get("ip") or "").strip() != ip]
+    if len(kept) == len(devices):
+        return "not_found"
+    devices[:] = kept
+    return None
+
+
+def _apply_batch(cfg: Dict[str, Any], ops: List[Any], atomic: bool) -> Dict[str, Any]:
+    """
+    Applique les opérations {"op": add|update|upsert|delete, "device": {...}, "original_ip"}
+    sur cfg["devices"] (en mémoire). atomic: au premier refus, rien n'est appliqué.
+
+    Returns:
+        {"applied": int, "errors": [{"index", "ip", "error"}], "updated_ips": [...]}
+    """
+    devices = copy.deepcopy(cfg.get("devices") or [])
+    errors: List[Dict[str, Any]] = []
+    updated_ips: List[str] = []
+    applied = 0
+
+    for index, op in enumerate(ops):
+        op = op if isinstance(op, dict) else {}
+        kind = str(op.get("op") or "add").strip().lower()
+        item = op.get("device") if isinstance(op.get("device"), dict) else {}
+        ip = str(item.get("ip") or op.get("ip") or "").strip()
+
+        if kind == "delete":
+            error = _apply_delete(devices, ip)
+        elif kind in ("add", "update", "upsert"):
+            original_ip = str(op.get("original_ip") or ip).strip()
+            exists = any((d.get("ip") or "").strip() == original_ip for d in devices)
+            if kind == "add" or (kind == "upsert" and not exists):
+                error = _apply_add(devices, _device_from_item(item))
+            else:
+                # Mise à jour partielle: seules les clés présentes dans l'item changent
+                error = _apply_merge(devices, original_ip, dict(item, ip=item.get("ip") or original_ip))
+                if error is None:
+                    updated_ips.append(str(item.get("ip") or original_ip).strip())
+        else:
+            error = "unknown_op"
+
+        if error is None:
+            applied += 1
+        else:
+            errors.append({"index": index, "ip": ip, "error": error})
+
+    if errors and atomic:
+        return {"applied": 0, "errors": errors, "updated_ips": []}
+    cfg["devices"] = devices
+    return {"applied": applied, "errors": errors, "updated_ips": updated_ips}
+
+
+def _commit_batch(cfg: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+    """Une seule écriture de config.json, puis un seul push backend pour les devices modifiés."""
+    if not result["applied"]:
+        result["pushed"] = {}
+        return result
     save_config(CONFIG_PATH, cfg)
+    pushed: Dict[str, bool] = {}
+    if result["updated_ips"]:
+        from src.config_sync import push_devices_config_to_backend
+        pushed = push_devices_config_to_backend(load_config(CONFIG_PATH), result["updated_ips"])
+    result["pushed"] = pushed
+    return result
+
+
+@app.post("/devices/add")
+def add_device(
+    ip: str = Form(...),
+    name: str = Form(""),
+    building: str = Form(""),
+    floor: str = Form(""),
+    room: str = Form(""),
+    device_type: str = Form("unknown"),
+    driver: str = Form("ping"),
+    # SNMP
+    snmp_community: str = Form("public"),
+    snmp_port: str = Form("161"),
+    snmp_timeout_s: str = Form("1"),
+    snmp_retries: str = Form("1"),
+    # PJLINK
+    pjlink_password: str = Form(""),
+    pjlink_port: str = Form("4352"),
+    pjlink_timeout_s: str = Form("2"),
+    # expectations
+    always_on: str = Form(""),
+    alert_after_s: str = Form("300"),
+    sched_days: str = Form("mon,tue,wed,thu,fri"),
+    sched_start: str = Form("07:30"),
+    sched_end: str = Form("19:00"),
+    sched_timezone: str = Form("Europe/Paris"),
+):
+    fields = {k: v for k, v in locals().items() if k in DEVICE_FIELDS}
+    cfg = load_config(CONFIG_PATH)
+    cfg.setdefault("devices", [])
+
+    if _apply_add(cfg["devices"], _device_from_fields(fields)) is None:
+        save_config(CONFIG_PATH, cfg)
     return RedirectResponse("/", status_code=303)
 
 
@@ -361,156 +652,184 @@ def update_device(
     sched_end: str = Form("19:00"),
     sched_timezone: str = Form("Europe/Paris"),
 ):
+    fields = {k: v for k, v in locals().items() if k in DEVICE_FIELDS}
     cfg = load_config(CONFIG_PATH)
-    devices = cfg.get("devices", [])
-
-    original_ip = (original_ip or "").strip()
-    ip = (ip or "").strip()
-    if not original_ip or not ip:
-        return RedirectResponse("/", status_code=303)
+    cfg.setdefault("devices", [])
 
-    # collision si on change l'IP vers une autre déjà existante
-    if ip != original_ip and any((d.get("ip") or "").strip() == ip for d in devices):
+    device = _device_from_fields(fields)
+    if _apply_update(cfg["devices"], original_ip, device) is not None:
         return RedirectResponse("/", status_code=303)
+    save_config(CONFIG_PATH, cfg)
 
-    driver = (driver or "ping").strip().lower()
+    # Push la configuration vers le backend (sync bidirectionnelle)
+    from src.config_sync import push_device_config_to_backend
+    push_device_config_to_backend(cfg, device["ip"])
 
-    snmp_block: Dict[str, Any] = {}
-    if driver == "snmp":
-        try:
-            port = int(snmp_port)
-        except Exception:
-            port = 161
-        try:
-            timeout_i = int(snmp_timeout_s)
-        except Exception:
-            timeout_i = 1
-        try:
-            retries_i = int(snmp_retries)
-        except Exception:
-            retries_i = 1
-        snmp_block = {
-            "community": (snmp_community or "public").strip(),
-            "port": port,
-            "timeout_s": max(1, timeout_i),
-            "retries": max(0, retries_i),
-        }
+    return RedirectResponse("/", status_code=303)
 
-    pj_block: Dict[str, Any] = {}
-    if driver == "pjlink":
-        try:
-            port = int(pjlink_port)
-        except Exception:
-            port = 4352
-        try:
-            timeout_i = int(pjlink_timeout_s)
-        except Exception:
-            timeout_i = 2
-        pj_block = {
-            "password": (pjlink_password or "").strip(),
-            "port": port,
-            "timeout_s": max(1, timeout_i),
-        }
 
-    ao = (always_on or "").strip().lower() in {"1", "true", "on", "yes"}
-    try:
-        a_s = int(alert_after_s)
-    except Exception:
-        a_s = 300
-    a_s = max(15, a_s)
+@app.post("/devices/delete")
+def delete_device(ip: str = Form(...)):
+    cfg = load_config(CONFIG_PATH)
+    cfg["devices"] = list(cfg.get("devices", []))
+    if _apply_delete(cfg["devices"], ip) is None:
+        save_config(CONFIG_PATH, cfg)
+    return RedirectResponse("/", status_code=303)
 
-    days = []
-    for part in (sched_days or "").split(","):
-        p = part.strip().lower()
-        if p in {"mon", "tue", "wed", "thu", "fri", "sat", "sun"}:
-            days.append(p)
 
-    schedule: Dict[str, Any] = {}
-    if days and (sched_start or "").strip() and (sched_end or "").strip():
-        schedule = {
-            "timezone": (sched_timezone or "Europe/Paris").strip() or "Europe/Paris",
-            "rules": [{"days": days, "start": (sched_start or "").strip(), "end": (sched_end or "").strip()}],
-        }
+@app.post("/devices/batch")
+def devices_batch(payload: Dict[str, Any]):
+    """
+    Applique N opérations en une transaction: une écriture de config.json et
+    un seul push backend (PATCH /config/{token}/devices) pour les devices modifiés.
+
+    Payload exemple:
+    {
+        "atomic": true,
+        "ops": [
+            {"op": "add", "device": {"ip": "10.0.0.5", "driver": "pjlink", "pjlink_password": "x"}},
+            {"op": "update", "original_ip": "10.0.0.6", "device": {"ip": "10.0.0.7", "name": "VP salle 2"}},
+            {"op": "upsert", "device": {"ip": "10.0.0.8", "driver": "snmp", "snmp": {"community": "av"}}},
+            {"op": "delete", "ip": "10.0.0.9"}
+        ]
+    }
 
-    for d in devices:
-        if (d.get("ip") or "").strip() == original_ip:
-            # Vérifier si community ou password ont changé pour ajouter timestamps
-            old_snmp = d.get("snmp", {})
-            old_pjlink = d.get("pjlink", {})
-
-            old_community = old_snmp.get("community") if isinstance(old_snmp, dict) else None
-            new_community = snmp_block.get("community")
-
-            print(f"🔍 DEBUG edit device {original_ip}:")
-            print(f"   driver: {driver}")
-            print(f"   old_community: '{old_community}'")
-            print(f"   new_community: '{new_community}'")
-            print(f"   Sont différents? {new_community != old_community}")
-
-            old_password = old_pjlink.get("password") if isinstance(old_pjlink, dict) else None
-            new_password = pj_block.get("password")
-
-            # Ajouter timestamp si valeur modifiée
-            if new_community and new_community != old_community:
-                from datetime import datetime, timezone
-                snmp_block["_community_updated_at"] = datetime.now(timezone.utc).isoformat()
-                print(f"   ✅ Timestamp SNMP ajouté: {snmp_block['_community_updated_at']}")
-            elif old_snmp.get("_community_updated_at"):
-                # Préserver le timestamp existant si pas modifié
-                snmp_block["_community_updated_at"] = old_snmp["_community_updated_at"]
-                print(f"   ♻️  Timestamp SNMP préservé: {snmp_block['_community_updated_at']}")
-            else:
-                print(f"   ⚠️  Pas de timestamp SNMP ajouté (condition non remplie)")
-
-            if new_password != old_password:  # Comparer même si vide (changement volontaire)
-                from datetime import datetime, timezone
-                pj_block["_password_updated_at"] = datetime.now(timezone.utc).isoformat()
-            elif old_pjlink.get("_password_updated_at"):
-                # Préserver le timestamp existant si pas modifié
-                pj_block["_password_updated_at"] = old_pjlink["_password_updated_at"]
-
-            d["ip"] = ip
-            d["name"] = (name or "").strip()
-            d["building"] = (building or "").strip()
-            d["floor"] = (floor or "").strip()
-            d["room"] = (room or "").strip()
-            d["type"] = (device_type or "unknown").strip()
-            d["driver"] = driver
-            d["snmp"] = snmp_block
-            d["pjlink"] = pj_block
-            d["expectations"] = {
-                "always_on": ao,
-                "alert_after_s": a_s,
-                "schedule": schedule,
-            }
-            break
+    update/upsert d'un device existant: seules les clés présentes dans "device" changent.
+    atomic (défaut true): une opération refusée annule tout le lot (HTTP 422).
+    """
+    ops = payload.get("ops")
+    if not isinstance(ops, list):
+        return JSONResponse({"ok": False, "error": "ops must be a list"}, status_code=400)
+    atomic = payload.get("atomic", True) is not False
 
-    cfg["devices"] = devices
-    save_config(CONFIG_PATH, cfg)
+    cfg = load_config(CONFIG_PATH)
+    result = _apply_batch(cfg, ops, atomic)
+    if result["errors"] and atomic:
+        return JSONResponse({"ok": False, **result}, status_code=422)
+    result = _commit_batch(cfg, result)
+    return {"ok": not result["errors"], **result}
+
+
+def _parse_import(raw: bytes, filename: str) -> List[Dict[str, Any]]:
+    """Devices d'un fichier JSON (liste, ou {"devices": [...]}) ou CSV (colonnes = champs du formulaire)."""
+    text = raw.decode("utf-8-sig")
+    if filename.lower().endswith(".json") or text.lstrip()[:1] in ("[", "{"):
+        data = json.loads(text)
+        items = data.get("devices") if isinstance(data, dict) else data
+        return [item for item in items or [] if isinstance(item, dict)]
+    header = text.split("\n", 1)[0]
+    # Excel FR exporte avec ";"
+    delimiter = ";" if header.count(";") > header.count(",") else ","
+    rows = csv.DictReader(io.StringIO(text), delimiter=delimiter)
+    # Cellule vide = champ non renseigné (valeur par défaut à l'ajout, inchangé en upsert)
+    return [{(k or "").strip(): v.strip() for k, v in row.items() if k and v and v.strip()} for row in rows]
+
+
+def _import_items(raw: bytes, filename: str, mode: str) -> Dict[str, Any]:
+    """
+    Parsing, application et écriture d'un import (bloquant: lecture/écriture de
+    config.json, push backend). En mode "add", les IPs déjà configurées sont
+    ignorées (listées dans "skipped"), pas comptées comme erreurs.
+    """
+    try:
+        items = _parse_import(raw, filename)
+    except Exception as e:
+        return {"ok": False, "error": f"invalid file: {e.__class__.__name__}: {e}"}
 
-    # DEBUG: Vérifier le contenu avant push
-    print(f"🔍 DEBUG avant push_device_config_to_backend:")
-    print(f"   ip passé: {ip}")
-    for dev in cfg.get("devices", []):
-        if dev.get("ip") == ip:
-            print(f"   Device trouvé dans cfg:")
-            print(f"   - snmp: {dev.get('snmp')}")
-            print(f"   - pjlink: {dev.get('pjlink')}")
-            break
+    op = "upsert" if (mode or "").strip().lower() == "upsert" else "add"
+    cfg = load_config(CONFIG_PATH)
+    skipped: List[str] = []
+    if op == "add":
+        known = {(d.get("ip") or "").strip() for d in cfg.get("devices") or []}
+        skipped = [str(item.get("ip") or "").strip() for item in items if str(item.get("ip") or "").strip() in known]
+        items = [item for item in items if str(item.get("ip") or "").strip() not in known]
+
+    result = _apply_batch(cfg, [{"op": op, "device": item} for item in items], atomic=False)
+    result = _commit_batch(cfg, result)
+    result["skipped"] = skipped
+    result["ok"] = not result["errors"]
+    log.info("devices import", mode=op, applied=result["applied"], skipped=len(skipped), errors=len(result["errors"]))
+    return result
+
+
+@app.post("/devices/import")
+async def import_devices(request: Request, file: UploadFile = File(...), mode: str = Form("add")):
+    """
+    Import en masse (CSV ou JSON). mode: "add" (IPs existantes ignorées, listées dans
+    "skipped") ou "upsert" (IPs existantes mises à jour). Une seule écriture de config.json.
+    Réponse JSON si le client l'accepte, sinon redirection vers l'accueil.
 
-    # Push la configuration vers le backend (sync bidirectionnelle)
-    from src.config_sync import push_device_config_to_backend
-    push_device_config_to_backend(cfg, ip)
+    Seule la lecture du fichier est faite dans la boucle; config.json et le push
+    backend passent par le threadpool (SSE, /api/status et /metrics restent servis).
+    """
+    raw = await file.read()
+    result = await run_in_threadpool(_import_items, raw, file.filename or "", mode)
 
+    if "application/json" in request.headers.get("accept", ""):
+        return JSONResponse(result, status_code=400 if "error" in result else 200)
     return RedirectResponse("/", status_code=303)
 
 
-@app.post("/devices/delete")
-def delete_device(ip: str = Form(...)):
+# ---------------------------------------------------------------------
+# Découverte réseau (onboarding)
+# ---------------------------------------------------------------------
+@app.post("/discovery/start")
+def discovery_start(
+    targets: str = Form(...),
+    communities: str = Form("public"),
+    pjlink_password: str = Form(""),
+    snmp_port: str = Form("161"),
+    pjlink_port: str = Form("4352"),
+):
+    """Balayage en arrière-plan des plages (CIDR, a.b.c.d-e, IPs); résultat via GET /api/discovery."""
     cfg = load_config(CONFIG_PATH)
-    ip = (ip or "").strip()
-    cfg["devices"] = [d for d in cfg.get("devices", []) if (d.get("ip") or "").strip() != ip]
-    save_config(CONFIG_PATH, cfg)
+    known_ips = {(d.get("ip") or "").strip() for d in cfg.get("devices", [])}
+    error = start_discovery(
+        targets,
+        known_ips=known_ips,
+        communities=(communities or "public").replace(",", " ").split(),
+        pjlink_password=(pjlink_password or "").strip(),
+        snmp_port=_int_field(snmp_port, 161),
+        pjlink_port=_int_field(pjlink_port, 4352),
+    )
+    if error:
+        print(f"⚠️  Découverte refusée: {error}")
+    return RedirectResponse("/#discovery", status_code=303)
+
+
+@app.get("/api/discovery")
+def api_discovery():
+    return get_discovery_state()
+
+
+@app.post("/discovery/add")
+def discovery_add(ip: List[str] = Form([])):
+    """Ajoute les propositions cochées (IPs déjà configurées ignorées), en une écriture."""
+    result = get_discovery_state().get("result") or {}
+    selected = {x.strip() for x in ip}
+    ops = []
+    for proposal in result.get("proposals") or []:
+        if proposal["ip"] not in selected:
+            continue
+        device = proposal["device"]
+        snmp_block = device.get("snmp") or {}
+        pj_block = device.get("pjlink") or {}
+        # Champs du formulaire d'ajout: mêmes valeurs par défaut (attentes, timeouts)
+        ops.append({"op": "add", "device": {
+            "ip": device["ip"],
+            "name": device.get("name", ""),
+            "device_type": device.get("type", "unknown"),
+            "driver": device.get("driver", "ping"),
+            "snmp_community": snmp_block.get("community", "public"),
+            "snmp_port": snmp_block.get("port", 161),
+            "pjlink_password": pj_block.get("password", ""),
+            "pjlink_port": pj_block.get("port", 4352),
+        }})
+
+    if ops:
+        cfg = load_config(CONFIG_PATH)
+        outcome = _commit_batch(cfg, _apply_batch(cfg, ops, atomic=False))
+        print(f"🔎 Découverte: {outcome['applied']} équipement(s) ajouté(s), {len(outcome['errors'])} ignoré(s)")
     return RedirectResponse("/", status_code=303)
 
 
@@ -526,6 +845,12 @@ def stop_collector_route():
     return RedirectResponse("/", status_code=303)
 
 
+@app.post("/collector/collect_now")
+def collect_now_route():
+    request_collect_now()
+    return RedirectResponse("/", status_code=303)
+
+
 @app.post("/sync/trigger")
 def trigger_sync():
     """Force une synchronisation immédiate de la configuration."""
@@ -540,6 +865,187 @@ def trigger_sync():
     return RedirectResponse("/", status_code=303)
 
 
+# ---------------------------------------------------------------------
+# Endpoint métriques (Prometheus texte)
+# ---------------------------------------------------------------------
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """
+    Métriques internes de l'agent au format Prometheus (text/plain; version=0.0.4).
+
+    - agent_probe_duration_seconds{driver}: histogramme durée des probes
+    - agent_probe_timeouts_total / agent_probe_errors_total{driver}
+    - agent_cycle_duration_seconds, agent_cycle_overrun_total
+    - agent_send_payload_bytes, agent_send_duration_seconds
+    - agent_mqtt_messages_total{kind}, agent_mqtt_messages_per_second
+    - agent_config_load_duration_seconds
+    """
+    return PlainTextResponse(
+        agent_metrics.render_prometheus(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@app.get("/metrics.json")
+def metrics_json():
+    """Même contenu que /metrics, en JSON (count/sum pour les histogrammes)."""
+    return agent_metrics.snapshot()
+
+
+# ---------------------------------------------------------------------
+# Statut incrémental (rafraîchissement de l'UI sans recharger la page)
+# ---------------------------------------------------------------------
+@app.get("/api/status")
+def api_status(since: int = 0):
+    """
+    Devices dont le statut/verdict a changé depuis la version since, plus l'état du collector.
+
+    Returns:
+        JSON avec:
+        - version: int (à repasser en since au prochain appel)
+        - full: bool (since inconnu: tous les devices sont renvoyés)
+        - running: bool
+        - status: dict (mêmes clés que last_status de la page)
+        - devices: [{ip, status, verdict, detail}]
+    """
+    version, full, devices = get_results_since(since)
+    return {
+        "version": version,
+        "full": full,
+        "running": collector_running(),
+        "status": _normalize_last_status(get_last_status()),
+        "devices": devices,
+    }
+
+
+# ---------------------------------------------------------------------
+# Push UI (Server-Sent Events)
+# ---------------------------------------------------------------------
+# Sans changement, un commentaire toutes les EVENTS_KEEPALIVE_S (proxies, détection
+# de déconnexion) et relecture de l'état MQTT (débit, cache)
+EVENTS_KEEPALIVE_S = 15.0
+
+# Champs qui bougent en continu: exclus de la comparaison (sinon un événement par tick)
+_STATUS_VOLATILE = ("next_collect_in_s", "next_send_in_s")
+_MQTT_VOLATILE = ("last_message_ts", "parse_queue")
+
+
+class _EventHub:
+    """
+    Réveille les flux SSE ouverts (un asyncio.Event par client) depuis les threads
+    collector / sync / MQTT. Chaque flux relit ensuite l'état et n'envoie que ce qui a changé.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._subs: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+    def subscribe(self) -> Tuple[asyncio.AbstractEventLoop, asyncio.Event]:
+        sub = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Tuple[asyncio.AbstractEventLoop, asyncio.Event]) -> None:
+        with self._lock:
+            self._subs.discard(sub)
+
+    def notify(self, *_: Any) -> None:
+        with self._lock:
+            subs = list(self._subs)
+        for loop, event in subs:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # boucle fermée: le flux sera désabonné à sa sortie
+
+
+_events = _EventHub()
+on_state_change(_events.notify)
+on_sync_status_change(_events.notify)
+try:
+    from src.mqtt_client import on_health_change
+    on_health_change(_events.notify)
+except Exception as e:
+    print(f"⚠️  MQTT health events unavailable: {e}")
+
+
+def _mqtt_health() -> Dict[str, Any]:
+    try:
+        from src.mqtt_client import get_mqtt_manager
+        return get_mqtt_manager().get_health()
+    except Exception as e:
+        return {"connected": False, "last_error": f"Failed to get MQTT health: {e}"}
+
+
+def _sse(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@app.get("/api/events")
+async def api_events(request: Request, since: int = 0):
+    """
+    Flux SSE de l'UI locale. Evénements (envoyés seulement quand ils changent):
+    - results: {version, full, devices} (comme /api/status), id = version
+    - status: {running, status} (compte à rebours: next_collect_in_s, décompté côté client)
+    - sync: get_sync_status()
+    - mqtt: get_health()
+
+    A la reconnexion, EventSource renvoie Last-Event-ID: on reprend à cette version.
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+
+    async def stream() -> AsyncIterator[str]:
+        sub = _events.subscribe()
+        version = since
+        sent: Dict[str, Any] = {}
+
+        def changed(kind: str, payload: Dict[str, Any], volatile: Tuple[str, ...] = ()) -> bool:
+            key = {k: v for k, v in payload.items() if k not in volatile}
+            if sent.get(kind) == key:
+                return False
+            sent[kind] = key
+            return True
+
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                sub[1].clear()
+
+                new_version, full, devices = get_results_since(version)
+                if devices or full:
+                    yield _sse("results", {"version": new_version, "full": full, "devices": devices}, new_version)
+                version = new_version
+
+                status = _normalize_last_status(get_last_status())
+                if changed("status", dict(status, running=collector_running()), _STATUS_VOLATILE):
+                    yield _sse("status", {"running": collector_running(), "status": status})
+
+                sync = get_sync_status()
+                if changed("sync", sync):
+                    yield _sse("sync", sync)
+
+                mqtt = _mqtt_health()
+                if changed("mqtt", mqtt, _MQTT_VOLATILE):
+                    yield _sse("mqtt", mqtt)
+
+                try:
+                    await asyncio.wait_for(sub[1].wait(), timeout=EVENTS_KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            _events.unsubscribe(sub)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # ---------------------------------------------------------------------
 # Endpoint MQTT Health
 # ---------------------------------------------------------------------
@@ -693,12 +1199,7 @@ def zigbee_device_details(request: Request, friendly_name: str):
                 break
 
         # Récupérer les infos depuis bridge/devices
-        bridge_devices = mqtt.get_bridge_devices()
-        device_info = None
-        for dev in bridge_devices:
-            if dev.get("friendly_name") == friendly_name:
-                device_info = dev
-                break
+        device_info = mqtt.get_bridge_device(friendly_name)
 
         return templates.TemplateResponse(
             "zigbee_device.html",
@@ -826,9 +1327,9 @@ def shutdown_event():
     # Arrêter le collector
     if _stop_flag is not None:
         print("🛑 Stopping collector...")
-        _stop_flag["stop"] = True
+        stop_collector()
 
     # Arrêter la sync config
     if _sync_stop_flag is not None:
-        _sync_stop_flag["stop"] = True
+        _sync_stop_flag.set()
         print("🛑 Config sync thread stopped")
\ No newline at end of file
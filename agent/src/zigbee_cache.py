@@ -0,0 +1,371 @@
+# agent/src/zigbee_cache.py
+"""
+Cache d'état des devices Zigbee (alimenté par mqtt_client).
+
+- Borné: LRU (AVMVP_ZIGBEE_CACHE_MAX, défaut 4096 devices) + TTL
+  (AVMVP_ZIGBEE_CACHE_TTL_S, défaut 7 jours sans message)
+- Devices absents de bridge/devices (retirés, renommés) évincés à la réception de la liste
+- Index ieee_address -> friendly_name
+- Un enregistrement compact (__slots__) par device, limité aux champs utiles
+  (STATE_FIELDS, + AVMVP_ZIGBEE_EXTRA_FIELDS) au lieu d'une copie du payload
+- Historique récent des mesures numériques (HISTORY_FIELDS): un anneau (array,
+  AVMVP_ZIGBEE_HISTORY_SIZE lectures au départ, défaut 128) par device et par champ,
+  agrandi tant qu'il ne couvre pas la fenêtre de report (jusqu'à AVMVP_ZIGBEE_HISTORY_MAX,
+  défaut 4096), agrégé (min/max/moyenne/dernière) depuis le report précédent du device
+
+Les enregistrements ne sont jamais modifiés après création (un message = un
+nouvel enregistrement): les lectures partagent les objets sans copie.
+"""
+from __future__ import annotations
+
+import keyword
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Champs lus par le driver (drivers/zigbee.py), l'UI et la détection de changements
+STATE_FIELDS: Tuple[str, ...] = (
+    "last_seen",
+    "battery",
+    "battery_low",
+    "linkquality",
+    "state",
+    "brightness",
+    "color_temp",
+    "temperature",
+    "humidity",
+    "pressure",
+    "co2",
+    "voc",
+    "pm25",
+    "illuminance",
+    "illuminance_lux",
+    "occupancy",
+    "contact",
+    "water_leak",
+    "smoke",
+    "gas",
+    "carbon_monoxide",
+    "tamper",
+    "vibration",
+    "action",
+    "click",
+    "power",
+    "energy",
+    "current",
+    "voltage",
+)
+
+# Mesures à fréquence élevée dont on garde l'historique (le report n'en voit sinon qu'une)
+HISTORY_FIELDS: Tuple[str, ...] = (
+    "temperature",
+    "humidity",
+    "pressure",
+    "co2",
+    "voc",
+    "pm25",
+    "illuminance",
+    "illuminance_lux",
+    "power",
+    "current",
+    "voltage",
+)
+
+_RESERVED = ("friendly_name", "cached_at", "get", "as_dict")
+
+
+def _extra_fields() -> Tuple[str, ...]:
+    raw = os.getenv("AVMVP_ZIGBEE_EXTRA_FIELDS", "")
+    out: List[str] = []
+    for name in raw.split(","):
+        name = name.strip()
+        if (name and name.isidentifier() and not keyword.iskeyword(name)
+                and name not in STATE_FIELDS and name not in _RESERVED and name not in out):
+            out.append(name)
+    return tuple(out)
+
+
+FIELDS: Tuple[str, ...] = STATE_FIELDS + _extra_fields()
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+# Fenêtre du premier report d'un device (les suivants agrègent depuis le report précédent)
+FIRST_REPORT_WINDOW_S = _env_float("AVMVP_ZIGBEE_HISTORY_WINDOW_S", 300)
+
+
+class ZigbeeRecord:
+    """Dernier état connu d'un device (champs absents = None)."""
+
+    __slots__ = ("friendly_name", "cached_at") + FIELDS
+
+    def __init__(self, friendly_name: str, cached_at: float) -> None:
+        self.friendly_name = friendly_name
+        self.cached_at = cached_at
+
+    def get(self, name: str, default: Any = None) -> Any:
+        value = getattr(self, name, None) if name in _SLOTS else None
+        return default if value is None else value
+
+    def as_dict(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for name in FIELDS:
+            value = getattr(self, name, None)
+            if value is not None:
+                out[name] = value
+        out["friendly_name"] = self.friendly_name
+        out["cached_at"] = self.cached_at
+        return out
+
+
+_SLOTS = frozenset(ZigbeeRecord.__slots__)
+
+
+class _Ring:
+    """Dernières lectures (horodatage, valeur) d'un champ, tableaux de taille fixe."""
+
+    __slots__ = ("ts", "values", "pos", "count")
+
+    def __init__(self, size: int) -> None:
+        self.ts = array("d", bytes(8 * size))
+        self.values = array("d", bytes(8 * size))
+        self.pos = 0
+        self.count = 0
+
+    def append(self, ts: float, value: float) -> None:
+        self.ts[self.pos] = ts
+        self.values[self.pos] = value
+        self.pos = (self.pos + 1) % len(self.ts)
+        if self.count < len(self.ts):
+            self.count += 1
+
+    def oldest(self) -> float:
+        return self.ts[(self.pos - self.count) % len(self.ts)] if self.count else 0.0
+
+    def grow(self, size: int) -> None:
+        """Agrandit l'anneau (lectures conservées, dans l'ordre)."""
+        n = len(self.ts)
+        start = (self.pos - self.count) % n
+        order = [(start + k) % n for k in range(self.count)]
+        pad = array("d", bytes(8 * (size - self.count)))
+        self.ts = array("d", (self.ts[i] for i in order)) + pad
+        self.values = array("d", (self.values[i] for i in order)) + pad
+        self.pos = self.count % size
+
+    def aggregate(self, since: float) -> Optional[Dict[str, Any]]:
+        """
+        min/max/avg/last des lectures postérieures à since (None si aucune).
+        truncated: anneau plein sans lecture antérieure à since (les plus anciennes
+        de la fenêtre ont été écrasées).
+        """
+        size = len(self.ts)
+        i = self.pos
+        n = 0
+        lo = hi = total = last = 0.0
+        for _ in range(self.count):
+            i = (i - 1) % size
+            if self.ts[i] < since:
+                break
+            v = self.values[i]
+            if n == 0:
+                lo = hi = last = v
+            elif v < lo:
+                lo = v
+            elif v > hi:
+                hi = v
+            total += v
+            n += 1
+        if n == 0:
+            return None
+        truncated = n == size
+        return {"min": lo, "max": hi, "avg": total / n, "last": last, "samples": n, "truncated": truncated}
+
+
+def _numeric(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+_BridgeView = Tuple[Tuple[Dict[str, Any], ...], Dict[str, Dict[str, Any]], Dict[str, str]]
+
+
+class ZigbeeStateCache:
+    def __init__(
+        self,
+        max_devices: Optional[int] = None,
+        ttl_s: Optional[float] = None,
+        history_size: Optional[int] = None,
+        history_max: Optional[int] = None,
+    ) -> None:
+        self.max_devices = max(1, int(max_devices or _env_float("AVMVP_ZIGBEE_CACHE_MAX", 4096)))
+        self.ttl_s = ttl_s if ttl_s is not None else _env_float("AVMVP_ZIGBEE_CACHE_TTL_S", 7 * 86400)
+        self.history_size = max(0, int(
+            history_size if history_size is not None else _env_float("AVMVP_ZIGBEE_HISTORY_SIZE", 128)
+        ))
+        self.history_max = max(self.history_size, int(
+            history_max if history_max is not None else _env_float("AVMVP_ZIGBEE_HISTORY_MAX", 4096)
+        ))
+        self._lock = threading.Lock()
+        # clé "zigbee:<friendly_name>" -> enregistrement, du moins au plus récemment mis à jour
+        self._records: "OrderedDict[str, ZigbeeRecord]" = OrderedDict()
+        # clé -> champ -> anneau (créé à la première lecture numérique du champ)
+        self._history: Dict[str, Dict[str, _Ring]] = {}
+        # clé -> horodatage du dernier report (début de la fenêtre d'agrégation suivante)
+        self._reported: Dict[str, float] = {}
+        # (liste, index friendly_name, index ieee): remplacé d'un bloc par référence,
+        # lu sans lock (une seule lecture d'attribut => vue cohérente)
+        self._bridge_view: _BridgeView = ((), {}, {})
+        self.evicted = 0
+
+    # -----------------------------------------------------------
+    # Ecriture (thread MQTT)
+    # -----------------------------------------------------------
+    def update(self, friendly_name: str, payload: Dict[str, Any], now: Optional[float] = None) -> Optional[ZigbeeRecord]:
+        """
+        Nouvel état (fusionné avec le précédent: Z2M peut n'envoyer qu'une partie des champs).
+        Retourne l'enregistrement précédent (None si inconnu).
+        """
+        now = time.time() if now is None else now
+        key = f"zigbee:{friendly_name}"
+        rec = ZigbeeRecord(friendly_name, now)
+        with self._lock:
+            prev = self._records.pop(key, None)
+            for name in FIELDS:
+                if name in payload:
+                    value = payload[name]
+                elif prev is not None:
+                    value = getattr(prev, name, None)
+                else:
+                    continue
+                if value is not None:
+                    setattr(rec, name, value)
+            self._records[key] = rec
+            if self.history_size:
+                self._record_history(key, payload, now)
+            while len(self._records) > self.max_devices:
+                old_key, _ = self._records.popitem(last=False)
+                self._drop_history(old_key)
+                self.evicted += 1
+        return prev
+
+    def _record_history(self, key: str, payload: Dict[str, Any], now: float) -> None:
+        rings = self._history.get(key)
+        # Début de la fenêtre en cours: l'anneau doit couvrir les lectures depuis
+        since = self._reported.get(key, now - FIRST_REPORT_WINDOW_S)
+        for name in HISTORY_FIELDS:
+            value = _numeric(payload.get(name))
+            if value is None:
+                continue
+            if rings is None:
+                rings = self._history[key] = {}
+            ring = rings.get(name)
+            if ring is None:
+                ring = rings[name] = _Ring(self.history_size)
+            elif ring.count == len(ring.ts) < self.history_max and ring.oldest() >= since:
+                # Plein alors que la plus ancienne lecture n'est pas encore reportée
+                ring.grow(min(2 * len(ring.ts), self.history_max))
+            ring.append(now, value)
+
+    def _drop_history(self, key: str) -> None:
+        self._history.pop(key, None)
+        self._reported.pop(key, None)
+
+    def set_bridge_devices(self, devices: Iterable[Any]) -> int:
+        """
+        Liste bridge/devices: index ieee, éviction des devices qui n'y sont plus.
+        Retourne le nombre d'entrées évincées.
+        """
+        bridge = tuple(d for d in devices if isinstance(d, dict))
+        by_name = {str(d.get("friendly_name")): d for d in bridge if d.get("friendly_name")}
+        ieee = {str(d["ieee_address"]): name for name, d in by_name.items() if d.get("ieee_address")}
+        self._bridge_view = (bridge, by_name, ieee)
+        if not by_name:
+            return 0
+        with self._lock:
+            gone = [k for k, rec in self._records.items() if rec.friendly_name not in by_name]
+            for k in gone:
+                del self._records[k]
+                self._drop_history(k)
+            self.evicted += len(gone)
+        return len(gone)
+
+    def forget(self, friendly_name: str) -> None:
+        key = f"zigbee:{friendly_name}"
+        with self._lock:
+            self._records.pop(key, None)
+            self._drop_history(key)
+
+    # -----------------------------------------------------------
+    # Lecture
+    # -----------------------------------------------------------
+    def get(self, key: str, now: Optional[float] = None) -> Optional[ZigbeeRecord]:
+        """Enregistrement de "zigbee:<friendly_name>" (None si absent ou expiré)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            rec = self._records.get(key)
+            if rec is not None and self.ttl_s > 0 and now - rec.cached_at > self.ttl_s:
+                del self._records[key]
+                self._drop_history(key)
+                self.evicted += 1
+                return None
+            return rec
+
+    def aggregates(self, key: str, window_s: float, now: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Agrégats par champ numérique des lectures des window_s dernières secondes:
+        {"temperature": {"min", "max", "avg", "last", "samples"}, ...}
+        """
+        now = time.time() if now is None else now
+        since = now - window_s
+        out: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for name, ring in (self._history.get(key) or {}).items():
+                agg = ring.aggregate(since)
+                if agg is not None:
+                    out[name] = agg
+        return out
+
+    def report_aggregates(self, key: str, now: Optional[float] = None) -> Tuple[float, Dict[str, Dict[str, Any]]]:
+        """
+        Agrégats depuis le report précédent du device (FIRST_REPORT_WINDOW_S pour le
+        premier), puis marque le report: (durée de la fenêtre en s, agrégats).
+        Suit l'intervalle réel (ok/ko, micro-rapports) sans recouvrement ni trou.
+        """
+        now = time.time() if now is None else now
+        out: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            since = self._reported.get(key, now - FIRST_REPORT_WINDOW_S)
+            for name, ring in (self._history.get(key) or {}).items():
+                agg = ring.aggregate(since)
+                if agg is not None:
+                    out[name] = agg
+            if key in self._records:
+                self._reported[key] = now
+        return now - since, out
+
+    def snapshot(self) -> Dict[str, ZigbeeRecord]:
+        """Vue de tous les enregistrements (copie du dict seulement, pas des états)."""
+        with self._lock:
+            return dict(self._records)
+
+    def bridge_devices(self) -> Tuple[Dict[str, Any], ...]:
+        """Dernière liste bridge/devices (tuple partagé, ne pas modifier les dicts)."""
+        return self._bridge_view[0]
+
+    def bridge_device(self, friendly_name: str) -> Optional[Dict[str, Any]]:
+        return self._bridge_view[1].get(friendly_name)
+
+    def friendly_name_for_ieee(self, ieee_address: str) -> Optional[str]:
+        return self._bridge_view[2].get(ieee_address)
+
+    def __len__(self) -> int:
+        return len(self._records)
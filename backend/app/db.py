@@ -1,9 +1,151 @@
 import os
-from sqlalchemy import create_engine
+from datetime import datetime, timezone
+
+from sqlalchemy import JSON, DateTime, create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.types import TypeDecorator
 
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://postgres:postgres@db:5432/avmvp")
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# Mode SQLite (petits sites mono-machine, tests, bancs de charge): DATABASE_URL=sqlite:///./avmvp.db
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+# ------------------------------------------------------------
+# Types portables (PostgreSQL <-> SQLite)
+# ------------------------------------------------------------
+# JSONB sur PostgreSQL (schéma inchangé), JSON (texte) ailleurs
+JSONType = JSON().with_variant(postgresql.JSONB(), "postgresql")
+
+
+class UTCDateTime(TypeDecorator):
+    """
+    DateTime(timezone=True) qui renvoie toujours un datetime aware UTC.
+
+    PostgreSQL (timestamptz) le fait nativement; SQLite stocke du texte sans
+    offset et renverrait des datetimes naïfs (comparaisons impossibles avec
+    _now_utc()).
+    """
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if isinstance(value, datetime) and value.tzinfo is not None and dialect.name == "sqlite":
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+    def process_result_value(self, value, dialect):
+        if isinstance(value, datetime) and value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value
+
+
+def dialect_insert(table):
+    """
+    INSERT du dialecte courant (supporte on_conflict_do_nothing / on_conflict_do_update
+    avec la même API sur PostgreSQL et SQLite >= 3.24).
+    """
+    if IS_SQLITE:
+        return sqlite.insert(table)
+    return postgresql.insert(table)
+
+
+# ------------------------------------------------------------
+# Engine
+# ------------------------------------------------------------
+def _sqlite_pragmas(dbapi_conn, _record) -> None:
+    """
+    Réglages par connexion:
+    - WAL: lectures concurrentes pendant les écritures (dashboard vs ingest)
+    - synchronous=NORMAL: fsync au checkpoint seulement (sûr en WAL)
+    - mmap + busy_timeout: lectures sans copie, attente du verrou au lieu d'un échec immédiat
+    """
+    cur = dbapi_conn.cursor()
+    try:
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute(f"PRAGMA synchronous={os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')}")
+        cur.execute(f"PRAGMA mmap_size={_env_int('SQLITE_MMAP_SIZE', 268435456)}")
+        cur.execute(f"PRAGMA busy_timeout={_env_int('SQLITE_BUSY_TIMEOUT_MS', 5000)}")
+        cur.execute("PRAGMA temp_store=MEMORY")
+        cur.execute("PRAGMA foreign_keys=ON")
+    finally:
+        cur.close()
+
+
+# Pool (PostgreSQL): défauts SQLAlchemy = 5 + 10, trop juste face à des milliers d'agents
+DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 10)
+DB_MAX_OVERFLOW = _env_int("DB_MAX_OVERFLOW", 20)
+DB_POOL_TIMEOUT_S = _env_int("DB_POOL_TIMEOUT_S", 30)
+DB_POOL_RECYCLE_S = _env_int("DB_POOL_RECYCLE_S", 1800)
+# statement_timeout PostgreSQL (0 = désactivé)
+DB_STATEMENT_TIMEOUT_MS = _env_int("DB_STATEMENT_TIMEOUT_MS", 0)
+
+
+def async_url(url: str) -> str:
+    """
+    DATABASE_URL -> URL du driver asynchrone:
+      postgresql[+psycopg2]://  -> postgresql+asyncpg://
+      sqlite:///                -> sqlite+aiosqlite:///
+    """
+    scheme, sep, rest = url.partition("://")
+    base = scheme.split("+", 1)[0]
+    if base in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    if base == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    return url
+
+
+def _engine_kwargs(url: str, is_async: bool = False) -> dict:
+    if not url.startswith("sqlite"):
+        kwargs: dict = {
+            "pool_pre_ping": True,
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT_S,
+            "pool_recycle": DB_POOL_RECYCLE_S,
+        }
+        if DB_STATEMENT_TIMEOUT_MS > 0:
+            if is_async:
+                kwargs["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+            else:
+                kwargs["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+        return kwargs
+    kwargs = {"connect_args": {"check_same_thread": False}}
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        # Base en mémoire: une seule connexion partagée, sinon chaque connexion voit une base vide
+        # (non partagée entre engine et async_engine: réservé aux tests sync)
+        kwargs["poolclass"] = StaticPool
+    return kwargs
+
+
+engine = create_engine(DATABASE_URL, **_engine_kwargs(DATABASE_URL))
+if IS_SQLITE:
+    event.listen(engine, "connect", _sqlite_pragmas)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+
+# ------------------------------------------------------------
+# Engine asynchrone (routes chaudes: /ingest, /config, /api/kpis, historique)
+# ------------------------------------------------------------
+# Pool distinct de l'engine sync: les routes async n'occupent pas de thread
+# Starlette pendant les I/O base.
+ASYNC_DATABASE_URL = async_url(DATABASE_URL)
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_kwargs(DATABASE_URL, is_async=True))
+if IS_SQLITE:
+    event.listen(async_engine.sync_engine, "connect", _sqlite_pragmas)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
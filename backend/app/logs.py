@@ -0,0 +1,256 @@
+# backend/app/logs.py
+"""
+Logging structuré, échantillonné et non bloquant.
+
+Remplace les print() du chemin chaud:
+- Niveaux standard (LOG_LEVEL=DEBUG|INFO|WARNING|ERROR, défaut INFO)
+- Format logfmt (défaut) ou JSON (LOG_FORMAT=json), une ligne par événement
+- Limitation de débit par clé (site/device) + échantillonnage des messages répétitifs:
+    LOG_RATE_BURST messages identiques autorisés par fenêtre LOG_RATE_WINDOW_S,
+    puis 1 sur LOG_SAMPLE_EVERY (le nombre de messages supprimés est rapporté)
+- QueueHandler borné: l'appelant ne fait qu'un put_nowait, le formatage
+  (y compris les tracebacks) et l'écriture se font dans un thread dédié.
+  Si la file est pleine, le message est perdu et compté (jamais de blocage).
+
+Usage:
+    from .logs import get_logger
+    log = get_logger(__name__)
+    log.info("event recorded", site=site.name, device_id=dev.id)
+    log.warning("record failed", site=site.name, error=str(e))
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+_SERVICE = "avmonitoring-backend"
+
+_setup_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["_DroppingQueueHandler"] = None
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+# -------------------------------------------------------------------
+# Formatage
+# -------------------------------------------------------------------
+def _logfmt_value(v: Any) -> str:
+    s = v if isinstance(v, str) else json.dumps(v, ensure_ascii=False, default=str)
+    if s == "" or any(c in s for c in ' ="\n\t'):
+        s = '"' + s.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+    return s
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Une ligne par événement: ts, level, logger, msg + champs structurés.
+    """
+
+    def __init__(self, fmt: str = "logfmt") -> None:
+        super().__init__()
+        self._json = fmt == "json"
+
+    def format(self, record: logging.LogRecord) -> str:
+        data: Dict[str, Any] = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if isinstance(fields, dict):
+            for k, v in fields.items():
+                if k not in data:
+                    data[k] = v
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            data["suppressed"] = suppressed
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+
+        if self._json:
+            return json.dumps(data, ensure_ascii=False, default=str)
+        return " ".join(f"{k}={_logfmt_value(v)}" for k, v in data.items())
+
+
+# -------------------------------------------------------------------
+# Limitation de débit + échantillonnage
+# -------------------------------------------------------------------
+class RateLimitFilter(logging.Filter):
+    """
+    Limite les messages répétitifs par (logger, message, rate_key).
+
+    - `rate_key` est fourni par l'appelant (ex: site, ip). À défaut, le champ
+      "site" ou "ip" des champs structurés est utilisé.
+    - ERROR et au-delà ne sont jamais filtrés.
+    """
+
+    def __init__(self, burst: int, window_s: int, sample_every: int, max_keys: int = 10_000) -> None:
+        super().__init__()
+        self._burst = max(1, burst)
+        self._window_s = max(1, window_s)
+        self._sample_every = max(1, sample_every)
+        self._max_keys = max_keys
+        self._lock = threading.Lock()
+        # key -> [window_start, count_in_window, suppressed_since_last_emit]
+        self._state: Dict[Tuple[str, str, str], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR:
+            return True
+
+        fields = getattr(record, "fields", None) or {}
+        rk = getattr(record, "rate_key", None) or fields.get("site") or fields.get("ip") or ""
+        key = (record.name, str(record.msg), str(rk))
+        now = time.monotonic()
+
+        with self._lock:
+            st = self._state.get(key)
+            if st is None:
+                if len(self._state) >= self._max_keys:
+                    self._state.clear()  # protection mémoire (cardinalité imprévue)
+                st = [now, 0, 0]
+                self._state[key] = st
+
+            if now - st[0] >= self._window_s:
+                st[0] = now
+                st[1] = 0
+
+            st[1] += 1
+            if st[1] <= self._burst or (st[1] - self._burst) % self._sample_every == 0:
+                record.suppressed = st[2]
+                st[2] = 0
+                return True
+
+            st[2] += 1
+            return False
+
+
+# -------------------------------------------------------------------
+# Queue handler non bloquant
+# -------------------------------------------------------------------
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, q: "queue.Queue[logging.LogRecord]") -> None:
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Pas de formatage côté appelant: le listener s'en charge
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(service: str = _SERVICE) -> None:
+    """
+    Configure le logger racine du service (idempotent).
+    """
+    global _listener, _queue_handler
+
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        level_name = (os.getenv("LOG_LEVEL") or "INFO").strip().upper()
+        level = getattr(logging, level_name, logging.INFO)
+        fmt = (os.getenv("LOG_FORMAT") or "logfmt").strip().lower()
+
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(StructuredFormatter(fmt))
+
+        q: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=_env_int("LOG_QUEUE_SIZE", 10_000))
+        _queue_handler = _DroppingQueueHandler(q)
+        _queue_handler.addFilter(
+            RateLimitFilter(
+                burst=_env_int("LOG_RATE_BURST", 20),
+                window_s=_env_int("LOG_RATE_WINDOW_S", 60),
+                sample_every=_env_int("LOG_SAMPLE_EVERY", 100),
+            )
+        )
+
+        root = logging.getLogger(service)
+        root.setLevel(level)
+        root.handlers[:] = [_queue_handler]
+        root.propagate = False
+
+        _listener = logging.handlers.QueueListener(q, stream, respect_handler_level=False)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Vide la file et arrête le thread d'écriture."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            try:
+                _listener.stop()
+            except Exception:
+                pass
+            _listener = None
+
+
+def dropped_count() -> int:
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+class StructLogger:
+    """
+    Enveloppe légère: log.info("message", champ=valeur, rate_key=...).
+    """
+
+    __slots__ = ("_logger",)
+
+    def __init__(self, logger: logging.Logger) -> None:
+        self._logger = logger
+
+    def _log(self, level: int, msg: str, exc_info: Any, rate_key: Any, fields: Dict[str, Any]) -> None:
+        if not self._logger.isEnabledFor(level):
+            return
+        extra = {"fields": fields, "rate_key": rate_key}
+        self._logger.log(level, msg, exc_info=exc_info, extra=extra, stacklevel=3)
+
+    def debug(self, msg: str, *, rate_key: Any = None, **fields: Any) -> None:
+        self._log(logging.DEBUG, msg, None, rate_key, fields)
+
+    def info(self, msg: str, *, rate_key: Any = None, **fields: Any) -> None:
+        self._log(logging.INFO, msg, None, rate_key, fields)
+
+    def warning(self, msg: str, *, rate_key: Any = None, **fields: Any) -> None:
+        self._log(logging.WARNING, msg, None, rate_key, fields)
+
+    def error(self, msg: str, *, rate_key: Any = None, **fields: Any) -> None:
+        self._log(logging.ERROR, msg, None, rate_key, fields)
+
+    def exception(self, msg: str, *, rate_key: Any = None, **fields: Any) -> None:
+        self._log(logging.ERROR, msg, True, rate_key, fields)
+
+    def is_enabled_for(self, level: int) -> bool:
+        return self._logger.isEnabledFor(level)
+
+
+def get_logger(name: str, service: str = _SERVICE) -> StructLogger:
+    """
+    Logger enfant du logger de service (configure le logging au premier appel).
+    """
+    setup_logging(service)
+    short = name.rsplit(".", 1)[-1]
+    return StructLogger(logging.getLogger(f"{service}.{short}"))
@@ -8,18 +8,22 @@ import secrets
 import threading
 import time
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from fastapi import Body, Depends, FastAPI, Form, Header, HTTPException, Request
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from starlette.middleware.sessions import SessionMiddleware
 
-from .db import SessionLocal, engine
+from .db import AsyncSessionLocal, SessionLocal, dialect_insert, engine
+from .logs import get_logger
 from .models import Base, Site, Device, DeviceEvent, DeviceAlert
 
 templates = Jinja2Templates(directory="app/templates")
+log = get_logger(__name__)
 
 
 # ------------------------------------------------------------
@@ -161,25 +165,24 @@ def record_event_and_alerts(
         # Enregistrer CHAQUE collecte (plus de seuil de temps)
         should_write_event = True
         if last_event is None:
-            print(f"🆕 Device {device.id} ({device.ip}): First event, will record")
-        else:
-            # Log pour information seulement
-            status_changed = last_event.status != device.status
-            verdict_changed = last_event.verdict != device.verdict
-            detail_changed = last_event.detail != device.detail
-
-            if status_changed or verdict_changed or detail_changed:
-                reasons = []
-                if status_changed:
-                    reasons.append(f"status: {last_event.status} → {device.status}")
-                if verdict_changed:
-                    reasons.append(f"verdict: {last_event.verdict} → {device.verdict}")
-                if detail_changed:
-                    reasons.append(f"detail changed")
-                print(f"🔄 Device {device.id} ({device.ip}): Change detected - {', '.join(reasons)}")
-            else:
-                time_diff = (now - last_event.created_at).total_seconds()
-                print(f"📊 Device {device.id} ({device.ip}): Recording periodic event ({int(time_diff/60)}min since last)")
+            log.debug("first event", site=site.name, device_id=device.id, ip=device.ip)
+        elif (
+            last_event.status != device.status
+            or last_event.verdict != device.verdict
+            or last_event.detail != device.detail
+        ):
+            # Seuls les changements sont loggés en INFO (échantillonnés par site)
+            log.info(
+                "device state changed",
+                site=site.name,
+                device_id=device.id,
+                ip=device.ip,
+                status_from=last_event.status,
+                status_to=device.status,
+                verdict_from=last_event.verdict,
+                verdict_to=device.verdict,
+                detail_changed=last_event.detail != device.detail,
+            )
 
         # Écrire l'event à chaque collecte
         event = DeviceEvent(
@@ -198,7 +201,14 @@ def record_event_and_alerts(
             created_at=now,
         )
         db.add(event)
-        print(f"✅ Event recorded for device {device.id} ({device.ip}): status={device.status}, verdict={device.verdict}")
+        log.debug(
+            "event recorded",
+            site=site.name,
+            device_id=device.id,
+            ip=device.ip,
+            status=device.status,
+            verdict=device.verdict,
+        )
 
         # Gestion des alertes
         # Récupérer l'alerte active (non fermée) pour ce device
@@ -241,13 +251,10 @@ def record_event_and_alerts(
 
         db.commit()
 
-    except Exception as e:
+    except Exception:
         db.rollback()
-        print(f"❌ Error in record_event_and_alerts for device {device.id}: {e}")
-        import traceback
-        traceback.print_exc()
-        # Log l'erreur mais ne pas faire échouer l'ingest
-        print(f"Error recording event/alert for device {device.ip}: {e}")
+        # Log l'erreur (traceback formatée hors du thread de requête) mais ne pas faire échouer l'ingest
+        log.exception("record_event_and_alerts failed", site=site.name, device_id=device.id, ip=device.ip)
 
 
 # ------------------------------------------------------------
@@ -261,6 +268,12 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """Session async (routes chaudes: ingest, config, kpis, historique)."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 # ------------------------------------------------------------
 # App + DB init retry
 # ------------------------------------------------------------
@@ -316,14 +329,19 @@ def purge_old_data() -> None:
             ).delete(synchronize_session=False)
 
             db.commit()
-            print(f"Purge completed: deleted {deleted_events} events and {deleted_alerts} closed alerts older than {retention_days} days")
-        except Exception as e:
+            log.info(
+                "purge completed",
+                deleted_events=deleted_events,
+                deleted_alerts=deleted_alerts,
+                retention_days=retention_days,
+            )
+        except Exception:
             db.rollback()
-            print(f"Error during purge: {e}")
+            log.exception("purge failed")
         finally:
             db.close()
-    except Exception as e:
-        print(f"Error in purge_old_data: {e}")
+    except Exception:
+        log.exception("purge_old_data failed")
 
 
 def run_purge_loop() -> None:
@@ -337,8 +355,8 @@ def run_purge_loop() -> None:
         while True:
             time.sleep(interval_seconds)
             purge_old_data()
-    except Exception as e:
-        print(f"Error in purge loop: {e}")
+    except Exception:
+        log.exception("purge loop crashed")
 
 
 # Démarrer le thread de purge en daemon
@@ -464,10 +482,10 @@ def admin_page(request: Request):
 # Ingest (Agent -> Backend)
 # ------------------------------------------------------------
 @app.post("/ingest")
-def ingest(
+async def ingest(
     payload: Dict[str, Any],
     x_site_token: Optional[str] = Header(default=None, alias="X-Site-Token"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     if not x_site_token:
         raise HTTPException(status_code=401, detail="Missing X-Site-Token")
@@ -478,14 +496,24 @@ def ingest(
     if not site_name or not isinstance(devices, list):
         raise HTTPException(status_code=400, detail="Invalid payload")
 
-    site = db.query(Site).filter(Site.name == site_name).first()
+    site = (await db.execute(select(Site).where(Site.name == site_name))).scalars().first()
     if not site:
         raise HTTPException(status_code=404, detail="Unknown site_name")
 
     if site.token != x_site_token:
         raise HTTPException(status_code=401, detail="Invalid site token")
 
-    now = _now_utc()
+    # Logique ORM partagée (sync) exécutée sur la session async: les I/O base
+    # n'occupent ni thread ni connexion bloquante
+    upserted = await db.run_sync(_ingest_devices, site, devices, _now_utc())
+
+    return {"ok": True, "upserted": upserted}
+
+
+def _ingest_devices(db: Session, site: Site, devices: List[Any], now: datetime) -> int:
+    """
+    Upsert des devices d'un payload agent + events/alertes. Retourne le nombre de devices traités.
+    """
     upserted = 0
 
     for d in devices:
@@ -519,25 +547,33 @@ def ingest(
         # Extraire expectations depuis le payload agent
         incoming_expectations = _as_dict(d.get("expectations") or {})
 
-        dev = (
+        dev_query = (
             db.query(Device)
             .filter(Device.site_id == site.id)
             .filter(Device.ip == ip)
-            .first()
         )
+        dev = dev_query.first()
 
         if dev is None:
             # Création: initialiser driver_config à vide, sera rempli manuellement via UI
-            dev = Device(
-                site_id=site.id,
-                ip=ip,
-                name=incoming_name,
-                device_type=incoming_type,
-                driver=incoming_driver,
-                driver_config={},  # Vide par défaut, sera configuré via UI
-                expectations=incoming_expectations,
+            # INSERT ... ON CONFLICT DO NOTHING (PostgreSQL/SQLite): deux ingests concurrents
+            # du même site ne se heurtent plus à uq_site_ip
+            db.execute(
+                dialect_insert(Device.__table__)
+                .values(
+                    site_id=site.id,
+                    ip=ip,
+                    name=incoming_name,
+                    device_type=incoming_type,
+                    driver=incoming_driver,
+                    driver_config={},  # Vide par défaut, sera configuré via UI
+                    expectations=incoming_expectations,
+                    metrics={},
+                    status="unknown",
+                )
+                .on_conflict_do_nothing(index_elements=["site_id", "ip"])
             )
-            db.add(dev)
+            dev = dev_query.first()
 
         # Champs standard - MAJ à chaque ingestion
         dev.name = incoming_name
@@ -579,7 +615,7 @@ def ingest(
 
         upserted += 1
 
-    return {"ok": True, "upserted": upserted}
+    return upserted
 
 
 # ------------------------------------------------------------
@@ -619,7 +655,7 @@ def _compute_config_hash(site: Site, devices: List[Device]) -> str:
 
 
 @app.get("/config/{site_token}")
-def get_config(site_token: str, db: Session = Depends(get_db)):
+async def get_config(site_token: str, db: AsyncSession = Depends(get_async_db)):
     """
     Endpoint de synchronisation pull pour l'agent.
 
@@ -631,6 +667,10 @@ def get_config(site_token: str, db: Session = Depends(get_db)):
 
     L'agent compare config_hash avec sa version locale et met à jour si nécessaire.
     """
+    return await db.run_sync(_site_config, site_token)
+
+
+def _site_config(db: Session, site_token: str) -> Dict[str, Any]:
     site = db.query(Site).filter(Site.token == site_token).first()
     if not site:
         raise HTTPException(status_code=404, detail="Invalid site token")
@@ -699,6 +739,90 @@ def get_config(site_token: str, db: Session = Depends(get_db)):
     return response
 
 
+# Blocs de driver_config synchronisés avec l'agent -> clé du timestamp de dernière modification
+_DRIVER_SYNC_TS_KEYS = (("snmp", "_community_updated_at"), ("pjlink", "_password_updated_at"))
+
+
+def _parse_agent_timestamp(value: Any) -> datetime:
+    """Timestamp ISO envoyé par l'agent ('Z' accepté). ValueError si invalide."""
+    # Nettoyer le timestamp (enlever 'Z' et remplacer par '+00:00' si nécessaire)
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+
+
+def _merge_driver_config(
+    current_config: Dict[str, Any],
+    incoming_driver_config: Dict[str, Any],
+    device_ip: str,
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Fusion granulaire (last-writer-wins) de la config driver poussée par l'agent:
+    SNMP et PJLink sont comparés séparément sur leur timestamp individuel.
+
+    Returns:
+        (config fusionnée, True si au moins un bloc de l'agent a été retenu)
+    """
+    merged_config = dict(current_config)
+    config_changed = False
+
+    for block, ts_key in _DRIVER_SYNC_TS_KEYS:
+        if block not in incoming_driver_config:
+            continue
+        incoming_block = incoming_driver_config[block]
+        current_block = _as_dict(current_config.get(block) or {})
+
+        incoming_ts = _as_dict(incoming_block).get(ts_key)
+        current_ts = current_block.get(ts_key)
+
+        # Garder le plus récent
+        if incoming_ts and current_ts:
+            if incoming_ts > current_ts:
+                merged_config[block] = incoming_block
+                config_changed = True
+                log.debug(f"{block} merge: agent newer", ip=device_ip, agent_ts=incoming_ts, backend_ts=current_ts)
+            else:
+                log.debug(f"{block} merge: backend newer", ip=device_ip, agent_ts=incoming_ts, backend_ts=current_ts)
+        elif incoming_ts:
+            # Agent a un timestamp, backend n'en a pas
+            merged_config[block] = incoming_block
+            config_changed = True
+            log.debug(f"{block} merge: only agent has timestamp", ip=device_ip)
+        elif current_ts:
+            # Backend a un timestamp, agent non
+            log.debug(f"{block} merge: only backend has timestamp", ip=device_ip)
+        else:
+            # Aucun timestamp, prendre agent par défaut
+            merged_config[block] = incoming_block
+            config_changed = True
+            log.debug(f"{block} merge: no timestamp, taking agent", ip=device_ip)
+
+    return merged_config, config_changed
+
+
+def _apply_agent_driver_config(device: Device, driver_config: Dict[str, Any], updated_at: datetime) -> Dict[str, Any]:
+    """Fusionne la config poussée dans device (sans commit). Retourne le résultat par device."""
+    merged_config, config_changed = _merge_driver_config(
+        _as_dict(device.driver_config or {}), driver_config, device.ip
+    )
+    if not config_changed:
+        return {
+            "ok": True,
+            "updated_at": device.driver_config_updated_at.isoformat() if device.driver_config_updated_at else None,
+            "merged": False,
+            "reason": "backend_already_up_to_date",
+        }
+
+    device.driver_config = merged_config
+    device.driver_config_updated_at = updated_at
+    # IMPORTANT: Flag comme modifié pour persister
+    from sqlalchemy.orm.attributes import flag_modified
+    flag_modified(device, "driver_config")
+    return {
+        "ok": True,
+        "updated_at": updated_at.isoformat(),
+        "merged": True,
+    }
+
+
 @app.patch("/config/{site_token}/device/{device_ip}")
 def update_device_config(
     site_token: str,
@@ -742,96 +866,87 @@ def update_device_config(
 
     # Parser le timestamp
     try:
-        from datetime import datetime
-        # Nettoyer le timestamp (enlever 'Z' et remplacer par '+00:00' si nécessaire)
-        ts_clean = incoming_updated_at_str.replace('Z', '+00:00')
-        incoming_updated_at = datetime.fromisoformat(ts_clean)
+        incoming_updated_at = _parse_agent_timestamp(incoming_updated_at_str)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid timestamp format: {e}")
 
-    # Fusion granulaire : comparer SNMP et PJLink séparément
-    current_config = _as_dict(device.driver_config or {})
-    merged_config = dict(current_config)
-    config_changed = False
+    result = _apply_agent_driver_config(device, incoming_driver_config, incoming_updated_at)
+    if result["merged"]:
+        db.commit()
+        log.info("driver config merged from agent", site=site.name, ip=device_ip, updated_at=incoming_updated_at.isoformat())
+    else:
+        log.info("driver config unchanged (backend up to date)", site=site.name, ip=device_ip)
+    return result
 
-    # SNMP : comparer les timestamps individuels
-    if "snmp" in incoming_driver_config:
-        incoming_snmp = incoming_driver_config["snmp"]
-        current_snmp = current_config.get("snmp", {})
 
-        incoming_snmp_ts = incoming_snmp.get("_community_updated_at")
-        current_snmp_ts = current_snmp.get("_community_updated_at")
+@app.patch("/config/{site_token}/devices")
+def update_devices_config(
+    site_token: str,
+    payload: Dict[str, Any],
+    db: Session = Depends(get_db),
+):
+    """
+    Push groupé depuis l'agent (lot/import): même fusion que
+    PATCH /config/{site_token}/device/{device_ip}, pour N devices en une transaction.
 
-        # Garder le plus récent
-        if incoming_snmp_ts and current_snmp_ts:
-            if incoming_snmp_ts > current_snmp_ts:
-                merged_config["snmp"] = incoming_snmp
-                config_changed = True
-                print(f"  📡 SNMP: agent plus récent ({incoming_snmp_ts} > {current_snmp_ts})")
-            else:
-                print(f"  💾 SNMP: backend plus récent ({current_snmp_ts} >= {incoming_snmp_ts})")
-        elif incoming_snmp_ts:
-            # Agent a un timestamp, backend n'en a pas
-            merged_config["snmp"] = incoming_snmp
-            config_changed = True
-            print(f"  📡 SNMP: agent a un timestamp, backend non")
-        elif current_snmp_ts:
-            # Backend a un timestamp, agent non
-            print(f"  💾 SNMP: backend a un timestamp, agent non")
-        else:
-            # Aucun timestamp, prendre agent par défaut
-            merged_config["snmp"] = incoming_snmp
-            config_changed = True
-            print(f"  📡 SNMP: aucun timestamp, prise agent")
+    Payload exemple:
+    {
+        "devices": [
+            {"ip": "192.168.1.10", "driver_config": {"snmp": {...}}, "updated_at": "2026-02-03T14:31:00Z"},
+            {"ip": "192.168.1.11", "driver_config": {"pjlink": {...}}, "updated_at": "2026-02-03T14:31:00Z"}
+        ]
+    }
 
-    # PJLink : même logique
-    if "pjlink" in incoming_driver_config:
-        incoming_pjlink = incoming_driver_config["pjlink"]
-        current_pjlink = current_config.get("pjlink", {})
+    Réponse: {"ok": true, "merged": n, "results": [{"ip", "ok", "merged", "updated_at", "reason"?}, ...]}
+    Un device invalide ou inconnu n'empêche pas la fusion des autres (ok=false + reason).
+    config_version est recalculé une seule fois, en fin de lot.
+    """
+    site = db.query(Site).filter(Site.token == site_token).first()
+    if not site:
+        raise HTTPException(status_code=404, detail="Invalid site token")
 
-        incoming_pjlink_ts = incoming_pjlink.get("_password_updated_at")
-        current_pjlink_ts = current_pjlink.get("_password_updated_at")
+    items = payload.get("devices")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Missing devices")
 
-        # Garder le plus récent
-        if incoming_pjlink_ts and current_pjlink_ts:
-            if incoming_pjlink_ts > current_pjlink_ts:
-                merged_config["pjlink"] = incoming_pjlink
-                config_changed = True
-                print(f"  📡 PJLink: agent plus récent ({incoming_pjlink_ts} > {current_pjlink_ts})")
-            else:
-                print(f"  💾 PJLink: backend plus récent ({current_pjlink_ts} >= {incoming_pjlink_ts})")
-        elif incoming_pjlink_ts:
-            merged_config["pjlink"] = incoming_pjlink
-            config_changed = True
-            print(f"  📡 PJLink: agent a un timestamp, backend non")
-        elif current_pjlink_ts:
-            print(f"  💾 PJLink: backend a un timestamp, agent non")
-        else:
-            merged_config["pjlink"] = incoming_pjlink
-            config_changed = True
-            print(f"  📡 PJLink: aucun timestamp, prise agent")
+    # Une requête pour tous les devices du site (réutilisée pour le hash)
+    devices = db.query(Device).filter(Device.site_id == site.id).all()
+    by_ip = {d.ip: d for d in devices}
+
+    results: List[Dict[str, Any]] = []
+    merged = 0
+    for item in items:
+        item = _as_dict(item)
+        device_ip = str(item.get("ip") or "").strip()
+        driver_config = item.get("driver_config")
+        updated_at_str = item.get("updated_at")
+
+        device = by_ip.get(device_ip)
+        if not device:
+            results.append({"ip": device_ip, "ok": False, "merged": False, "reason": "device_not_found"})
+            continue
+        if not isinstance(driver_config, dict) or not driver_config or not updated_at_str:
+            results.append({"ip": device_ip, "ok": False, "merged": False, "reason": "missing_driver_config_or_updated_at"})
+            continue
+        try:
+            updated_at = _parse_agent_timestamp(updated_at_str)
+        except Exception:
+            results.append({"ip": device_ip, "ok": False, "merged": False, "reason": "invalid_timestamp"})
+            continue
 
-    if config_changed:
-        device.driver_config = merged_config
-        device.driver_config_updated_at = incoming_updated_at
-        # IMPORTANT: Flag comme modifié pour persister
-        from sqlalchemy.orm.attributes import flag_modified
-        flag_modified(device, "driver_config")
+        result = _apply_agent_driver_config(device, driver_config, updated_at)
+        merged += 1 if result["merged"] else 0
+        results.append({"ip": device_ip, **result})
+
+    if merged:
+        new_hash = _compute_config_hash(site, devices)
+        if site.config_version != new_hash:
+            site.config_version = new_hash
+            site.config_updated_at = _now_utc()
         db.commit()
-        print(f"✅ Config merged from agent for {device_ip} (updated at {incoming_updated_at.isoformat()})")
-        return {
-            "ok": True,
-            "updated_at": incoming_updated_at.isoformat(),
-            "merged": True,
-        }
-    else:
-        print(f"ℹ️  No changes from agent for {device_ip} (backend already up-to-date)")
-        return {
-            "ok": True,
-            "updated_at": device.driver_config_updated_at.isoformat() if device.driver_config_updated_at else None,
-            "merged": False,
-            "reason": "backend_already_up_to_date",
-        }
+
+    log.info("driver configs pushed from agent", site=site.name, devices=len(items), merged=merged)
+    return {"ok": True, "merged": merged, "results": results}
 
 
 # ------------------------------------------------------------
@@ -1180,20 +1295,24 @@ def device_detail(device_id: int, db: Session = Depends(get_db)):
 # API : Device History & Uptime
 # ------------------------------------------------------------
 @app.get("/api/devices/{device_id}/history")
-def api_device_history(device_id: int, days: int = 30, db: Session = Depends(get_db)):
+async def api_device_history(device_id: int, days: int = 30, db: AsyncSession = Depends(get_async_db)):
     """Retourne l'historique d'états d'un équipement sur N jours."""
-    device = db.query(Device).filter(Device.id == device_id).first()
+    device = (
+        await db.execute(select(Device.name, Device.ip).where(Device.id == device_id))
+    ).first()
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
 
     cutoff = _now_utc() - timedelta(days=days)
+    # Colonnes utiles uniquement (pas de metrics_json: plusieurs milliers d'events par device)
     events = (
-        db.query(DeviceEvent)
-        .filter(DeviceEvent.device_id == device_id)
-        .filter(DeviceEvent.created_at >= cutoff)
-        .order_by(DeviceEvent.created_at.asc())
-        .all()
-    )
+        await db.execute(
+            select(DeviceEvent.created_at, DeviceEvent.status, DeviceEvent.verdict, DeviceEvent.detail)
+            .where(DeviceEvent.device_id == device_id)
+            .where(DeviceEvent.created_at >= cutoff)
+            .order_by(DeviceEvent.created_at.asc())
+        )
+    ).all()
 
     return {
         "device_id": device_id,
@@ -1270,7 +1389,7 @@ def api_device_purge_history(device_id: int, db: Session = Depends(get_db)):
     db.query(DeviceEvent).filter(DeviceEvent.device_id == device_id).delete()
     db.commit()
 
-    print(f"🗑️  Purged {count} events for device {device_id} ({device.ip})")
+    log.info("device history purged", device_id=device_id, ip=device.ip, deleted_events=count)
 
     return {
         "device_id": device_id,
@@ -1860,15 +1979,18 @@ def api_regenerate_token(
 
 
 @app.get("/api/kpis")
-def api_kpis(db: Session = Depends(get_db)):
+async def api_kpis(db: AsyncSession = Depends(get_async_db)):
     """KPIs globaux pour la vue d'ensemble."""
-    sites_count = db.query(Site).count()
-    devices = db.query(Device).all()
+    sites_count = (await db.execute(select(func.count(Site.id)))).scalar_one()
+    # Agrégat SQL: pas de chargement de tous les devices (metrics JSON compris)
+    by_status = dict(
+        (await db.execute(select(Device.status, func.count(Device.id)).group_by(Device.status))).all()
+    )
 
-    total_devices = len(devices)
-    online_count = sum(1 for d in devices if d.status == "online")
-    offline_count = sum(1 for d in devices if d.status == "offline")
-    unknown_count = sum(1 for d in devices if d.status not in ["online", "offline"])
+    total_devices = sum(by_status.values())
+    online_count = by_status.get("online", 0)
+    offline_count = by_status.get("offline", 0)
+    unknown_count = total_devices - online_count - offline_count
 
     return {
         "total_sites": sites_count,
@@ -2172,17 +2294,12 @@ def api_update_device(
     """
     Met à jour un équipement existant.
     """
-    # DEBUG: Log du payload reçu
-    print(f"🔍 API PUT /api/devices/{device_id}")
-    print(f"   Payload reçu: {device_data}")
+    log.debug("api update device", device_id=device_id, fields=sorted(device_data.keys()))
 
     device = db.query(Device).filter(Device.id == device_id).first()
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
 
-    print(f"   Device actuel driver: {device.driver}")
-    print(f"   Device actuel driver_config: {device.driver_config}")
-
     # Mettre à jour les champs modifiables
     if "name" in device_data:
         device.name = device_data["name"].strip()
@@ -2203,12 +2320,9 @@ def api_update_device(
     if "driver_config" in device_data:
         incoming_config = device_data["driver_config"]
         current_config = _as_dict(device.driver_config or {})
-        print(f"   📝 driver_config trouvé dans payload: {incoming_config}")
-        print(f"   📋 current_config avant merge: {current_config}")
 
         # Normaliser la structure : {community: "x"} -> {snmp: {community: "x"}}
         if device.driver == "snmp" and "community" in incoming_config:
-            print(f"   🔧 Processing SNMP config...")
             # Structure plate reçue du frontend, normaliser en structure imbriquée
             existing_snmp = current_config.get("snmp", {})
             old_community = existing_snmp.get("community") if isinstance(existing_snmp, dict) else None
@@ -2251,13 +2365,12 @@ def api_update_device(
         # IMPORTANT: Flag le champ JSONB comme modifié pour forcer SQLAlchemy à persister
         from sqlalchemy.orm.attributes import flag_modified
         flag_modified(device, "driver_config")
-        print(f"   ✅ Nouveau driver_config: {device.driver_config}")
+        # Secrets (community/password) jamais loggés: seulement les blocs présents
+        log.debug("api driver_config updated", device_id=device_id, blocks=sorted(current_config.keys()))
     else:
-        print(f"   ⚠️  Pas de driver_config dans le payload!")
+        log.debug("api update without driver_config", device_id=device_id)
 
     db.commit()
-    db.refresh(device)  # Recharger depuis la DB pour vérifier
-    print(f"   💾 Commit effectué, driver_config final en DB: {device.driver_config}")
     return {"success": True}
 
 
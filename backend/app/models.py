@@ -2,14 +2,12 @@ from sqlalchemy import (
     Column,
     Integer,
     String,
-    DateTime,
     ForeignKey,
     UniqueConstraint,
     Index,
 )
-from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
-from .db import Base
+from .db import Base, JSONType, UTCDateTime
 
 
 class Site(Base):
@@ -27,7 +25,7 @@ class Site(Base):
 
     # Versioning de la configuration (pour sync agent)
     config_version = Column(String, nullable=True)  # MD5 hash
-    config_updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    config_updated_at = Column(UTCDateTime(), server_default=func.now(), onupdate=func.now())
 
     # Contact (dashboard / escalade)
     contact_first_name = Column(String, nullable=True)
@@ -58,20 +56,20 @@ class Device(Base):
     room = Column(String, nullable=True)
 
     # Configuration des drivers (SNMP, PJLink, etc.)
-    driver_config = Column(JSONB, nullable=False, default=dict)
-    driver_config_updated_at = Column(DateTime(timezone=True), nullable=True)
+    driver_config = Column(JSONType, nullable=False, default=dict)
+    driver_config_updated_at = Column(UTCDateTime(), nullable=True)
 
     # Expectations et scheduling
-    expectations = Column(JSONB, nullable=False, default=dict)
+    expectations = Column(JSONType, nullable=False, default=dict)
 
-    last_seen = Column(DateTime(timezone=True), nullable=True)
-    last_ok_at = Column(DateTime(timezone=True), nullable=True)
+    last_seen = Column(UTCDateTime(), nullable=True)
+    last_ok_at = Column(UTCDateTime(), nullable=True)
     status = Column(String, nullable=False, default="unknown")
     detail = Column(String, nullable=True)
     verdict = Column(String, nullable=True)
 
     # Metrics SNMP / autres drivers (données collectées)
-    metrics = Column(JSONB, nullable=False, default=dict)
+    metrics = Column(JSONType, nullable=False, default=dict)
 
     __table_args__ = (UniqueConstraint("site_id", "ip", name="uq_site_ip"),)
 
@@ -97,9 +95,9 @@ class DeviceEvent(Base):
     verdict = Column(String, nullable=True)
     detail = Column(String, nullable=True)
 
-    metrics_json = Column(JSONB, nullable=False, default=dict)
+    metrics_json = Column(JSONType, nullable=False, default=dict)
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    created_at = Column(UTCDateTime(), server_default=func.now(), nullable=False)
 
     __table_args__ = (
         Index("ix_device_events_device_created", "device_id", "created_at"),
@@ -118,15 +116,15 @@ class DeviceAlert(Base):
     device_id = Column(Integer, ForeignKey("devices.id"), nullable=False)
 
     severity = Column(String, nullable=False, default="warning")  # critical, warning, info
-    opened_at = Column(DateTime(timezone=True), nullable=False)
-    closed_at = Column(DateTime(timezone=True), nullable=True)
-    last_seen_at = Column(DateTime(timezone=True), nullable=False)
+    opened_at = Column(UTCDateTime(), nullable=False)
+    closed_at = Column(UTCDateTime(), nullable=True)
+    last_seen_at = Column(UTCDateTime(), nullable=False)
 
     status = Column(String, nullable=False)  # offline, unknown, etc.
     verdict = Column(String, nullable=True)  # fault, doubt, etc.
     detail = Column(String, nullable=True)
 
-    acknowledged_at = Column(DateTime(timezone=True), nullable=True)
+    acknowledged_at = Column(UTCDateTime(), nullable=True)
     acknowledged_by = Column(String, nullable=True)
 
     __table_args__ = (
@@ -0,0 +1,7 @@
+# backend/bench/__init__.py
+"""
+Outils de banc de charge du backend (flotte d'agents simulés).
+
+    cd backend
+    python -m bench.ingest_load --help
+"""
@@ -0,0 +1,102 @@
+# backend/bench/fleet.py
+"""
+Génération de payloads /ingest réalistes (forme produite par collector._collect_once
+côté agent + enveloppe de _send_to_backend).
+"""
+from __future__ import annotations
+
+import random
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+DRIVERS = ("ping", "snmp", "pjlink", "zigbee")
+TYPES = {"ping": "display", "snmp": "switch", "pjlink": "projector", "zigbee": "sensor"}
+
+
+def site_name(index: int) -> str:
+    return f"bench-site-{index:04d}"
+
+
+def site_token(index: int) -> str:
+    return f"bench-token-{index:04d}"
+
+
+def _metrics(driver: str, online: bool, rng: random.Random) -> Dict[str, Any]:
+    now = datetime.now(timezone.utc).isoformat()
+    m: Dict[str, Any] = {"ts": now}
+    if driver == "ping":
+        m.update(ping_ok=online, rtt_ms=round(rng.uniform(0.3, 8.0), 3) if online else None)
+    elif driver == "snmp":
+        m.update(
+            snmp_ok=online,
+            snmp_port=161,
+            snmp_timeout_s=1,
+            snmp_retries=1,
+        )
+        if online:
+            m.update(sys_descr="Cisco IOS Software, C2960 Software (C2960-LANBASEK9-M)", sys_uptime=rng.randint(1, 10**9))
+    elif driver == "pjlink":
+        m.update(pjlink_ok=online, pjlink_port=4352, pjlink_timeout_s=2)
+        if online:
+            power = rng.choice((0, 1, 1, 1))
+            m.update(pjlink_auth="none", pjlink_raw_powr=f"%1POWR={power}", pjlink_power=power,
+                     pjlink_power_label={0: "off", 1: "on"}[power])
+    else:
+        m.update(mqtt_connected=True, battery=rng.randint(10, 100), linkquality=rng.randint(20, 255),
+                 temperature=round(rng.uniform(18, 26), 1), last_seen=now, last_seen_minutes_ago=0.5)
+    if online:
+        m["_last_ok_utc"] = now
+    return m
+
+
+class SiteFleet:
+    """
+    Un site simulé: liste stable d'équipements dont l'état évolue à chaque cycle.
+
+    - fault_ratio: part des équipements offline à un instant donné
+    - flip_ratio: probabilité qu'un équipement change d'état entre deux cycles
+      (exerce les chemins "changement d'état" + ouverture/fermeture d'alertes)
+    """
+
+    def __init__(self, index: int, devices: int, fault_ratio: float = 0.05, flip_ratio: float = 0.02, seed: int = 0) -> None:
+        self.index = index
+        self.name = site_name(index)
+        self.token = site_token(index)
+        self._rng = random.Random(seed * 100_003 + index)
+        self._flip_ratio = flip_ratio
+        self._devices: List[Dict[str, Any]] = []
+        for i in range(devices):
+            driver = DRIVERS[i % len(DRIVERS)]
+            ip = f"zigbee:bench-{index}-{i}" if driver == "zigbee" else f"10.{index // 250}.{index % 250}.{i % 250 + 1}"
+            self._devices.append({
+                "ip": ip,
+                "name": f"{TYPES[driver]}-{i:03d}",
+                "building": f"Bât {index % 5}",
+                "room": f"Salle {i // 8:02d}",
+                "type": TYPES[driver],
+                "driver": driver,
+                "expectations": {"always_on": i % 3 == 0, "alert_after_s": 300},
+                "_online": self._rng.random() >= fault_ratio,
+            })
+
+    def payload(self) -> Dict[str, Any]:
+        out = []
+        for d in self._devices:
+            if self._rng.random() < self._flip_ratio:
+                d["_online"] = not d["_online"]
+            online = d["_online"]
+            status = "online" if online else "offline"
+            verdict = "ok" if online else ("fault" if d["expectations"]["always_on"] else "doubt")
+            out.append({
+                "ip": d["ip"],
+                "name": d["name"],
+                "building": d["building"],
+                "room": d["room"],
+                "type": d["type"],
+                "driver": d["driver"],
+                "status": status,
+                "detail": None if online else f"{d['driver']} connect timeout/refused: timed out",
+                "metrics": _metrics(d["driver"], online, self._rng),
+                "verdict": verdict,
+            })
+        return {"site_name": self.name, "devices": out}
@@ -0,0 +1,401 @@
+# backend/bench/ingest_load.py
+"""
+Banc de charge backend: flotte de K agents simulés (POST /ingest + GET /config).
+
+Deux modes:
+- in-process (défaut): TestClient sur app.main (même threadpool Starlette que uvicorn),
+  sur DATABASE_URL ou, à défaut, une base SQLite temporaire
+- --url http://host:8000: backend déjà démarré
+
+Chaque palier de --ramp fixe le nombre d'agents actifs. Un agent envoie un
+payload /ingest (forme collector._collect_once) toutes les --ingest-interval-s
+secondes (0 = en boucle fermée, aussi vite que possible) et interroge /config
+toutes les --config-interval-s secondes.
+
+Rapport par palier: p50/p95/p99 par endpoint, requêtes/s, lignes DB écrites/s
+(comptées en base si accessible, estimées sinon) et point de saturation
+(débit qui ne progresse plus, p95 au-delà du SLO, ou taux d'erreur).
+
+Usage (depuis backend/):
+    python -m bench.ingest_load --ramp 1,4,16,64
+    DATABASE_URL=postgresql://... python -m bench.ingest_load --ramp 1,4,16,64
+    python -m bench.ingest_load --url http://localhost:8000 --sites 200 --devices 40
+    python -m bench.ingest_load --ci --max-p95-ms 250 --min-ingest-rps 20
+
+Codes de sortie: 0 OK, 1 seuil CI dépassé (ou erreur de mise en place), 2 arguments invalides.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from bench.fleet import SiteFleet
+
+# Tables comptées pour le débit d'écriture (device_events: 1 ligne / device / ingest)
+_COUNTED_TABLES = ("device_events", "device_alerts")
+
+
+# ------------------------------------------------------------
+# Statistiques
+# ------------------------------------------------------------
+def percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    """Percentile nearest-rank sur une liste triée."""
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, int(round(p / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+class _Recorder:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {"ingest": [], "config": []}
+        self.errors: Dict[str, int] = {"ingest": 0, "config": 0}
+        self.upserted = 0
+        self.last_error: Optional[str] = None
+
+    def record(self, kind: str, latency_s: float, ok: bool, upserted: int = 0, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.latencies[kind].append(latency_s)
+            if not ok:
+                self.errors[kind] += 1
+                self.last_error = error
+            self.upserted += upserted
+
+    def summary(self, kind: str, duration_s: float) -> Dict[str, Any]:
+        values = sorted(self.latencies[kind])
+        n = len(values)
+
+        def ms(v: Optional[float]) -> Optional[float]:
+            return round(v * 1000.0, 2) if v is not None else None
+
+        return {
+            "requests": n,
+            "errors": self.errors[kind],
+            "error_rate": round(self.errors[kind] / n, 4) if n else 0.0,
+            "rps": round(n / duration_s, 2) if duration_s > 0 else 0.0,
+            "p50_ms": ms(percentile(values, 50)),
+            "p95_ms": ms(percentile(values, 95)),
+            "p99_ms": ms(percentile(values, 99)),
+            "max_ms": ms(values[-1]) if values else None,
+        }
+
+
+# ------------------------------------------------------------
+# Cible HTTP (in-process ou URL)
+# ------------------------------------------------------------
+class _Target:
+    def __init__(self, url: Optional[str], timeout_s: float) -> None:
+        self.url = url
+        self.engine = None
+        if url:
+            try:
+                import httpx
+            except ImportError:
+                raise SystemExit("httpx requis pour --url (pip install httpx)")
+            self.client = httpx.Client(base_url=url.rstrip("/"), timeout=timeout_s,
+                                       limits=httpx.Limits(max_connections=1000, max_keepalive_connections=1000))
+        else:
+            from fastapi.testclient import TestClient
+
+            from app.db import engine
+            from app.main import app
+
+            self.engine = engine
+            self.client = TestClient(app)
+
+    def post(self, path: str, **kwargs: Any) -> Any:
+        return self.client.post(path, **kwargs)
+
+    def get(self, path: str, **kwargs: Any) -> Any:
+        return self.client.get(path, **kwargs)
+
+    def close(self) -> None:
+        self.client.close()
+
+
+def _count_rows(engine: Any) -> Optional[int]:
+    if engine is None:
+        return None
+    from sqlalchemy import text
+
+    try:
+        with engine.connect() as conn:
+            return sum(int(conn.execute(text(f"SELECT COUNT(*) FROM {t}")).scalar() or 0) for t in _COUNTED_TABLES)
+    except Exception:
+        return None
+
+
+# ------------------------------------------------------------
+# Agents
+# ------------------------------------------------------------
+def _agent_loop(target: _Target, fleet: SiteFleet, rec: _Recorder, deadline: float,
+                ingest_interval_s: float, config_interval_s: float) -> None:
+    next_config = time.monotonic()
+    headers = {"X-Site-Token": fleet.token, "Content-Type": "application/json"}
+    while True:
+        start = time.monotonic()
+        if start >= deadline:
+            return
+
+        body = json.dumps(fleet.payload(), ensure_ascii=False).encode("utf-8")
+        t0 = time.perf_counter()
+        try:
+            r = target.post("/ingest", content=body, headers=headers)
+            ok = r.status_code == 200
+            upserted = int(r.json().get("upserted", 0)) if ok else 0
+            rec.record("ingest", time.perf_counter() - t0, ok, upserted, None if ok else f"HTTP {r.status_code}")
+        except Exception as e:
+            rec.record("ingest", time.perf_counter() - t0, False, error=f"{e.__class__.__name__}: {e}")
+
+        if config_interval_s >= 0 and time.monotonic() >= next_config:
+            next_config = time.monotonic() + config_interval_s
+            t0 = time.perf_counter()
+            try:
+                r = target.get(f"/config/{fleet.token}")
+                rec.record("config", time.perf_counter() - t0, r.status_code == 200,
+                           error=None if r.status_code == 200 else f"HTTP {r.status_code}")
+            except Exception as e:
+                rec.record("config", time.perf_counter() - t0, False, error=f"{e.__class__.__name__}: {e}")
+
+        if ingest_interval_s > 0:
+            sleep_s = ingest_interval_s - (time.monotonic() - start)
+            if sleep_s > 0:
+                time.sleep(min(sleep_s, max(0.0, deadline - time.monotonic())))
+
+
+def _ensure_sites(target: _Target, fleets: List[SiteFleet]) -> None:
+    """/admin/create-site est idempotent (renvoie le site existant)."""
+    for f in fleets:
+        r = target.post("/admin/create-site", params={"name": f.name, "token": f.token})
+        if r.status_code != 200:
+            raise SystemExit(f"create-site {f.name} failed: HTTP {r.status_code} {r.text[:200]}")
+        token = r.json().get("token")
+        if token and token != f.token:
+            f.token = token  # site préexistant avec un autre token
+
+
+def run_step(target: _Target, fleets: List[SiteFleet], agents: int, args: argparse.Namespace) -> Dict[str, Any]:
+    rec = _Recorder()
+    rows_before = _count_rows(target.engine)
+    deadline = time.monotonic() + args.duration_s
+    started = time.monotonic()
+
+    threads = [
+        threading.Thread(
+            target=_agent_loop,
+            args=(target, fleets[i % len(fleets)], rec, deadline, args.ingest_interval_s, args.config_interval_s),
+            daemon=True,
+        )
+        for i in range(agents)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duration = time.monotonic() - started
+
+    rows_after = _count_rows(target.engine)
+    if rows_before is not None and rows_after is not None:
+        rows = rows_after - rows_before + rec.upserted  # events/alerts insérés + devices mis à jour
+        rows_source = "db"
+    else:
+        rows = rec.upserted * 2  # 1 update device + 1 event par device
+        rows_source = "estimate"
+
+    ingest = rec.summary("ingest", duration)
+    offered = (agents / args.ingest_interval_s) if args.ingest_interval_s > 0 else None
+    return {
+        "agents": agents,
+        "duration_s": round(duration, 2),
+        "ingest": ingest,
+        "config": rec.summary("config", duration),
+        "offered_ingest_rps": round(offered, 2) if offered else None,
+        "devices_per_s": round(rec.upserted / duration, 1) if duration > 0 else 0.0,
+        "rows_written": rows,
+        "rows_per_s": round(rows / duration, 1) if duration > 0 else 0.0,
+        "rows_source": rows_source,
+        "last_error": rec.last_error,
+    }
+
+
+def find_saturation(steps: List[Dict[str, Any]], args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Premier palier "saturé":
+      - taux d'erreur > --max-error-rate
+      - p95 ingest > --slo-p95-ms
+      - boucle ouverte: débit atteint < 95% du débit offert
+      - boucle fermée: gain de débit < --min-gain vs palier précédent
+    Renvoie le dernier palier sain et le débit crête observé.
+    """
+    last_ok: Optional[Dict[str, Any]] = None
+    saturated_at: Optional[int] = None
+    reason: Optional[str] = None
+    for i, s in enumerate(steps):
+        ing = s["ingest"]
+        if ing["error_rate"] > args.max_error_rate:
+            saturated_at, reason = s["agents"], f"error_rate {ing['error_rate']}"
+        elif args.slo_p95_ms and (ing["p95_ms"] or 0) > args.slo_p95_ms:
+            saturated_at, reason = s["agents"], f"p95 {ing['p95_ms']} ms > {args.slo_p95_ms} ms"
+        elif s["offered_ingest_rps"] and ing["rps"] < 0.95 * s["offered_ingest_rps"]:
+            saturated_at, reason = s["agents"], f"throughput {ing['rps']} < offered {s['offered_ingest_rps']}"
+        elif not s["offered_ingest_rps"] and i > 0 and ing["rps"] < steps[i - 1]["ingest"]["rps"] * (1 + args.min_gain):
+            saturated_at, reason = s["agents"], f"throughput gain < {int(args.min_gain * 100)}%"
+        if saturated_at is not None:
+            break
+        last_ok = s
+
+    peak = max(steps, key=lambda s: s["ingest"]["rps"]) if steps else None
+    peak_rps = peak["ingest"]["rps"] if peak else 0.0
+    return {
+        "saturated_at_agents": saturated_at,
+        "reason": reason,
+        "last_healthy_agents": last_ok["agents"] if last_ok else None,
+        "peak_ingest_rps": peak_rps,
+        "peak_rows_per_s": max((s["rows_per_s"] for s in steps), default=0.0),
+        # Sites absorbables si chaque agent envoie toutes les --site-interval-s secondes
+        "sites_at_interval_estimate": int(peak_rps * args.site_interval_s),
+    }
+
+
+def check_thresholds(steps: List[Dict[str, Any]], args: argparse.Namespace) -> List[str]:
+    failures: List[str] = []
+    for s in steps:
+        ing = s["ingest"]
+        tag = f"agents={s['agents']}"
+        if args.max_p95_ms is not None and (ing["p95_ms"] or 0) > args.max_p95_ms:
+            failures.append(f"{tag}: ingest p95 {ing['p95_ms']} ms > {args.max_p95_ms} ms")
+        if args.max_p99_ms is not None and (ing["p99_ms"] or 0) > args.max_p99_ms:
+            failures.append(f"{tag}: ingest p99 {ing['p99_ms']} ms > {args.max_p99_ms} ms")
+        if ing["error_rate"] > args.max_error_rate or s["config"]["error_rate"] > args.max_error_rate:
+            failures.append(f"{tag}: error rate above {args.max_error_rate} ({s['last_error']})")
+    if args.min_ingest_rps is not None:
+        peak = max((s["ingest"]["rps"] for s in steps), default=0.0)
+        if peak < args.min_ingest_rps:
+            failures.append(f"peak ingest {peak} req/s < {args.min_ingest_rps} req/s")
+    return failures
+
+
+def _print_report(steps: List[Dict[str, Any]], sat: Dict[str, Any]) -> None:
+    header = (f"{'agents':>6} {'ingest/s':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'err':>5} "
+              f"{'config/s':>9} {'c.p95':>8} {'rows/s':>9}")
+    print(header)
+    print("-" * len(header))
+    for s in steps:
+        i, c = s["ingest"], s["config"]
+        print(f"{s['agents']:>6} {i['rps']:>9.1f} {i['p50_ms'] or 0:>8.1f} {i['p95_ms'] or 0:>8.1f} "
+              f"{i['p99_ms'] or 0:>8.1f} {i['errors']:>5} {c['rps']:>9.1f} {c['p95_ms'] or 0:>8.1f} "
+              f"{s['rows_per_s']:>9.1f}{'' if s['rows_source'] == 'db' else '~'}")
+    print()
+    if sat["saturated_at_agents"] is not None:
+        print(f"saturation: {sat['saturated_at_agents']} agents ({sat['reason']}), "
+              f"last healthy: {sat['last_healthy_agents']}")
+    else:
+        print("saturation: not reached")
+    print(f"peak: {sat['peak_ingest_rps']} ingest/s, {sat['peak_rows_per_s']} rows/s "
+          f"=> ~{sat['sites_at_interval_estimate']} sites at one ingest per site-interval")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Banc de charge /ingest + /config (flotte d'agents simulés)")
+    p.add_argument("--url", help="backend cible (défaut: in-process via TestClient)")
+    p.add_argument("--database-url", help="DATABASE_URL pour le mode in-process (et le comptage des lignes)")
+    p.add_argument("--sites", type=int, default=50, help="nombre de sites (un token par site)")
+    p.add_argument("--devices", type=int, default=30, help="équipements par site")
+    p.add_argument("--ramp", default="1,2,4,8,16,32", help="agents actifs par palier")
+    p.add_argument("--duration-s", type=float, default=10.0, help="durée de chaque palier")
+    p.add_argument("--ingest-interval-s", type=float, default=0.0, help="intervalle d'envoi par agent (0 = boucle fermée)")
+    p.add_argument("--config-interval-s", type=float, default=5.0, help="intervalle de poll /config (-1 = désactivé)")
+    p.add_argument("--fault-ratio", type=float, default=0.05)
+    p.add_argument("--flip-ratio", type=float, default=0.02, help="probabilité de changement d'état par cycle")
+    p.add_argument("--timeout-s", type=float, default=30.0, help="timeout HTTP (mode --url)")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--slo-p95-ms", type=float, default=1000.0, help="p95 ingest au-delà duquel un palier est saturé")
+    p.add_argument("--min-gain", type=float, default=0.10, help="gain de débit minimal entre paliers (boucle fermée)")
+    p.add_argument("--site-interval-s", type=float, default=60.0, help="intervalle agent réel pour l'estimation de capacité")
+    # Seuils CI
+    p.add_argument("--ci", action="store_true", help="profil court (ramp 1,4, 5 s/palier, 8 sites x 20 équipements)")
+    p.add_argument("--max-p95-ms", type=float)
+    p.add_argument("--max-p99-ms", type=float)
+    p.add_argument("--min-ingest-rps", type=float)
+    p.add_argument("--max-error-rate", type=float, default=0.0)
+    p.add_argument("--json", action="store_true", help="rapport JSON sur stdout")
+    p.add_argument("--json-out", help="écrit aussi le rapport JSON dans ce fichier")
+    return p
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.ci:
+        args.ramp, args.duration_s, args.sites, args.devices = "1,4", 5.0, 8, 20
+
+    try:
+        ramp = [int(x) for x in args.ramp.split(",") if x.strip()]
+    except ValueError:
+        parser.error(f"invalid --ramp: {args.ramp}")
+    if not ramp or min(ramp) < 1 or args.sites < 1:
+        parser.error("--ramp and --sites must be >= 1")
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    elif not args.url and not os.getenv("DATABASE_URL"):
+        # In-process sans base configurée: SQLite jetable (exécution hermétique, CI)
+        tmp_dir = tempfile.mkdtemp(prefix="avmvp-bench-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+    # Logs backend: warnings uniquement pendant le bench (sauf LOG_LEVEL explicite)
+    if not os.getenv("LOG_LEVEL"):
+        os.environ["LOG_LEVEL"] = "WARNING"
+        logging.getLogger("avmonitoring-backend").setLevel(logging.WARNING)
+
+    target = _Target(args.url, args.timeout_s)
+    if target.engine is None and args.database_url:
+        from sqlalchemy import create_engine
+
+        target.engine = create_engine(args.database_url)
+
+    try:
+        fleets = [
+            SiteFleet(i, args.devices, fault_ratio=args.fault_ratio, flip_ratio=args.flip_ratio, seed=args.seed)
+            for i in range(args.sites)
+        ]
+        _ensure_sites(target, fleets)
+        steps = [run_step(target, fleets, n, args) for n in ramp]
+    finally:
+        target.close()
+
+    sat = find_saturation(steps, args)
+    failures = check_thresholds(steps, args)
+    report = {
+        "mode": "url" if args.url else "in-process",
+        "sites": args.sites,
+        "devices_per_site": args.devices,
+        "steps": steps,
+        "saturation": sat,
+        "failures": failures,
+    }
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        _print_report(steps, sat)
+        for msg in failures:
+            print(f"FAIL {msg}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())